@@ -0,0 +1,190 @@
+"""
+Benchmark /api/video-feed throughput and latency under concurrent clients.
+
+Run against a running camera_server, optionally starting the VIRTUAL camera
+first so no microscope is needed:
+
+    python benchmark_stream.py --clients 4 --duration 20 --start-virtual --fps 30 --width 2448 --height 2048
+
+Latency is measured against the capture timestamp in each part's headers, so
+client and server must share a clock (run the benchmark on the same machine).
+Needs the `requests` package (listed in requirements.txt; the server itself
+doesn't use it).
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StreamClient(threading.Thread):
+    """Reads the MJPEG stream and records per-frame latency and encode time"""
+
+    def __init__(self, url, duration):
+        super().__init__(daemon=True)
+        self.url = url
+        self.duration = duration
+        self.frames = 0
+        self.bytes_received = 0
+        self.latencies_ms = []
+        self.encode_ms = []
+        self.skipped = 0
+        self.error = None
+
+    def run(self):
+        try:
+            with requests.get(self.url, stream=True, timeout=10) as response:
+                response.raise_for_status()
+                self._consume(response.raw)
+        except Exception as e:
+            self.error = str(e)
+
+    def _consume(self, raw):
+        end_time = time.time() + self.duration
+        last_sequence = None
+        while time.time() < end_time:
+            headers = self._read_part_headers(raw)
+            if headers is None:
+                break
+            length = int(headers.get('content-length', 0))
+            body = raw.read(length)
+            raw.read(2)  # trailing CRLF
+            received = time.time()
+
+            self.frames += 1
+            self.bytes_received += len(body)
+            if 'x-frame-timestamp' in headers:
+                self.latencies_ms.append((received - float(headers['x-frame-timestamp'])) * 1000)
+            # Unchanged frames reuse the previous JPEG and carry no encode time
+            if 'x-encode-ms' in headers and headers.get('x-frame-changed', '1') != '0':
+                self.encode_ms.append(float(headers['x-encode-ms']))
+            if 'x-frame-sequence' in headers:
+                sequence = int(headers['x-frame-sequence'])
+                if last_sequence is not None and sequence > last_sequence + 1:
+                    self.skipped += sequence - last_sequence - 1
+                last_sequence = sequence
+
+    def _read_part_headers(self, raw):
+        # Skip to the boundary line, then read headers up to the blank line
+        while True:
+            line = raw.readline()
+            if not line:
+                return None
+            if line.strip() == b'--frame':
+                break
+        headers = {}
+        while True:
+            line = raw.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                return headers
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+
+def start_virtual_camera(base_url, args):
+    payload = {
+        'cameraType': 'VIRTUAL',
+        'deviceId': args.device_id,
+        'virtualCamera': {
+            'source': args.source,
+            'width': args.width,
+            'height': args.height,
+            'fps': args.fps,
+            'pixelFormat': args.pixel_format,
+            'jitterMs': args.jitter_ms,
+            'dropRate': args.drop_rate
+        }
+    }
+    response = requests.post(f'{base_url}/api/start-camera', json=payload, timeout=30)
+    result = response.json()
+    if result.get('status') != 'success':
+        raise RuntimeError(f"Failed to start virtual camera: {result}")
+    # Give the capture thread a moment to publish the first frames
+    time.sleep(1.0)
+
+
+def summarize(clients, duration):
+    print("\n" + "=" * 60)
+    print(f"{'client':>6} {'fps':>8} {'MB/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'skipped':>8}")
+    print("=" * 60)
+    all_latencies = []
+    all_encode = []
+    for i, client in enumerate(clients):
+        if client.error:
+            print(f"{i:>6} error: {client.error}")
+            continue
+        all_latencies.extend(client.latencies_ms)
+        all_encode.extend(client.encode_ms)
+        print(f"{i:>6} {client.frames / duration:>8.2f} {client.bytes_received / duration / 1e6:>8.2f} "
+              f"{percentile(client.latencies_ms, 50) or 0:>8.2f} {percentile(client.latencies_ms, 95) or 0:>8.2f} "
+              f"{client.skipped:>8}")
+
+    print("-" * 60)
+    total_frames = sum(c.frames for c in clients)
+    print(f"Clients: {len(clients)}")
+    print(f"Delivered FPS (mean per client): {total_frames / duration / max(1, len(clients)):.2f}")
+    if all_encode:
+        print(f"Encode ms per frame: mean {statistics.mean(all_encode):.2f}, "
+              f"p95 {percentile(all_encode, 95):.2f}")
+    if all_latencies:
+        print(f"End-to-end latency ms: p50 {percentile(all_latencies, 50):.2f}, "
+              f"p95 {percentile(all_latencies, 95):.2f}, max {max(all_latencies):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the /api/video-feed stream')
+    parser.add_argument('--url', default='http://localhost:5000', help='Backend base URL')
+    parser.add_argument('--clients', type=int, default=1, help='Number of concurrent stream clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to measure per client')
+    parser.add_argument('--start-virtual', action='store_true', help='Start the VIRTUAL camera before measuring')
+    parser.add_argument('--source', default=None, help='Folder of micrographs or a video file (default: synthetic)')
+    parser.add_argument('--width', type=int, default=None)
+    parser.add_argument('--height', type=int, default=None)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--pixel-format', default='BGR8', choices=['BGR8', 'Mono8', 'Mono16'])
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--quality', type=int, default=None, help='Stream tier JPEG quality')
+    parser.add_argument('--max-width', type=int, default=None, help='Stream tier maximum width')
+    parser.add_argument('--stream-fps', type=float, default=None, help='Stream tier target FPS')
+    parser.add_argument('--device-id', default=None, help='Camera device ID (default camera if omitted)')
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    if args.start_virtual:
+        start_virtual_camera(base_url, args)
+
+    tier = ''
+    if args.device_id:
+        tier += f'&deviceId={args.device_id}'
+    if args.quality:
+        tier += f'&quality={args.quality}'
+    if args.max_width:
+        tier += f'&maxWidth={args.max_width}'
+    if args.stream_fps:
+        tier += f'&fps={args.stream_fps}'
+    clients = [StreamClient(f'{base_url}/api/video-feed?client={i}{tier}', args.duration)
+               for i in range(args.clients)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join(args.duration + 15)
+
+    summarize(clients, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+
+class BurstCapture:
+    """
+    Captures a burst or time-lapse sequence from the frame hub.
+
+    Frames are pinned and handed to the shared ImageWriter pool; the capture
+    loop never touches the disk. When the writer queue is full the loop waits
+    up to `backpressure_timeout` seconds and then drops the frame, so a slow
+    disk can never stall the live stream or grow memory without bound.
+    With interval=0 every new frame is taken (burst), otherwise one frame is
+    taken every `interval` seconds (time-lapse).
+    """
+
+    def __init__(self, frame_hub, frame_pool, writer, save_path, count, interval=0.0,
+                 image_format='png', quality=95, prefix='burst', magnification='100x',
+                 backpressure_timeout=0.5):
+        self.frame_hub = frame_hub
+        self.frame_pool = frame_pool
+        self.writer = writer
+        self.save_path = save_path
+        self.count = int(count)
+        self.interval = max(0.0, float(interval or 0.0))
+        self.image_format = image_format
+        self.quality = int(quality)
+        self.prefix = prefix
+        self.magnification = magnification
+        self.backpressure_timeout = backpressure_timeout
+
+        self.state = 'pending'
+        self.error = None
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.files = []
+        self.started_at = None
+        self.finished_at = None
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._session_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    def start(self):
+        os.makedirs(self.save_path, exist_ok=True)
+        self.state = 'running'
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def is_running(self):
+        return self.state == 'running'
+
+    def _write_params(self):
+        if self.image_format in ('jpg', 'jpeg'):
+            return [int(cv2.IMWRITE_JPEG_QUALITY), self.quality]
+        if self.image_format == 'png':
+            return [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        return []
+
+    def _next_path(self, index):
+        # Session timestamp plus a sequence number keeps names unique within a second
+        filename = f"{self.prefix}_{self.magnification}_{self._session_stamp}_{index:04d}.{self.image_format}"
+        return os.path.join(self.save_path, filename)
+
+    def _on_written(self, job, raw, pinned):
+        if pinned:
+            self.frame_pool.unpin(raw)
+        with self._lock:
+            if job.status == 'done':
+                self.written += 1
+                self.files.append(job.path)
+            else:
+                self.failed += 1
+
+    def _run(self):
+        params = self._write_params()
+        last_sequence = self.frame_hub.sequence
+        next_due = time.time()
+        index = 0
+        try:
+            while index < self.count and not self._stop_event.is_set():
+                if self.interval:
+                    # Time-lapse: sleep until the next slot, then take the newest frame
+                    if self._stop_event.wait(max(0.0, next_due - time.time())):
+                        break
+                    next_due += self.interval
+
+                packet = self.frame_hub.wait_for_frame(last_sequence, timeout=1.0)
+                if packet is None:
+                    continue
+                last_sequence = packet.sequence
+
+                index += 1
+                raw = packet.raw
+                pinned = self.frame_pool.pin(raw)
+                job = self.writer.submit(
+                    raw, self._next_path(index), params,
+                    on_complete=lambda job, raw=raw, pinned=pinned: self._on_written(job, raw, pinned),
+                    timeout=self.backpressure_timeout
+                )
+                with self._lock:
+                    if job is None:
+                        self.dropped += 1
+                        if pinned:
+                            self.frame_pool.unpin(raw)
+                    else:
+                        self.captured += 1
+
+            # Let queued frames land before reporting completion
+            while not self._all_settled() and not self._stop_event.wait(0.05):
+                pass
+            self.state = 'stopped' if self._stop_event.is_set() else 'completed'
+        except Exception as e:
+            print(f"Error in burst capture: {str(e)}")
+            self.error = str(e)
+            self.state = 'error'
+        finally:
+            self.finished_at = time.time()
+
+    def _all_settled(self):
+        with self._lock:
+            return self.written + self.failed >= self.captured
+
+    def get_status(self):
+        with self._lock:
+            elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+            return {
+                'state': self.state,
+                'error': self.error,
+                'requested': self.count,
+                'interval': self.interval,
+                'captured': self.captured,
+                'written': self.written,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'pending': self.captured - self.written - self.failed,
+                'progress': round((self.captured + self.dropped) / self.count, 4) if self.count else 1.0,
+                'elapsed': round(elapsed, 3),
+                'files': sorted(self.files)
+            }
@@ -5,9 +5,13 @@ import time
 from datetime import datetime
 import json
 import shutil
+import struct
+from collections import deque
 import tempfile
 import filetype
 from io import BytesIO
+import base64
+import mimetypes
 
 os.makedirs("logs", exist_ok=True)
 logging.basicConfig(
@@ -28,7 +32,8 @@ import numpy as np
 import json
 from porosity_analysis import PorosityAnalyzer
 from MvCameraControl_class import *
-from ctypes import c_float, byref
+import ctypes
+from ctypes import c_float, byref, memmove
 import atexit
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
@@ -36,6 +41,32 @@ from phase_analysis import analyze_phase
 from fpdf import FPDF
 from werkzeug.utils import secure_filename
 from nodularity_analysis import nodularity_analyzer
+from frame_hub import FrameHub, FrameBufferPool, DEFAULT_JPEG_QUALITY
+from virtual_camera import VirtualCamera
+from image_writer import ImageWriter
+from burst_capture import BurstCapture
+from raw_recorder import RawRecorder, RawRecording, frame_pixel_type
+from video_recorder import VIDEO_CODECS, VideoRecorder
+from image_cache import image_cache
+import image_filters
+from edit_session import EditSessions
+from pixel_formats import convert_frame, to_preview, pixel_format_name
+from sensor_roi import SensorROI
+from focus_metric import FocusMeter
+from focus_stack import FocusStacker
+from live_analysis import LiveAnalysis
+from change_detector import ChangeDetector
+from stream_consumers import ConsumerRegistry
+from pipeline_metrics import PipelineMetrics
+from frame_correction import FrameCorrection
+from camera_settings import CameraSettings
+from device_registry import DeviceRegistry, UnknownDeviceError, hikrobot_device_info
+try:
+    # Optional: enables the WebSocket stream (/api/ws/video-feed)
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    Sock = None
 
 
 
@@ -51,6 +82,7 @@ CORS(app, resources={
         "max_age": 3600
     }
 })
+sock = Sock(app) if Sock is not None else None
 
 # Global observer for file system events
 observer = None
@@ -128,8 +160,19 @@ class ConfigurationManager:
 # Initialize configuration manager after class definition
 config_manager = ConfigurationManager()
 
+# Output formats accepted by WebcamManager.take_snapshot
+SNAPSHOT_FORMATS = ('jpg', 'jpeg', 'png', 'tif', 'tiff')
+
+# HIKROBOT image callback: void cb(unsigned char* pData, MV_FRAME_OUT_INFO_EX* pFrameInfo, void* pUser)
+_callback_functype = ctypes.WINFUNCTYPE if sys.platform == 'win32' else ctypes.CFUNCTYPE
+FrameInfoCallBack = _callback_functype(None, POINTER(c_ubyte), POINTER(MV_FRAME_OUT_INFO_EX), c_void_p)
+
 class WebcamManager:
-    def __init__(self):
+    def __init__(self, device_id='default', device=None):
+        # Registry entry this manager drives; None opens the first HIKROBOT camera or webcam 0
+        self.device_id = device_id
+        self.device = device
+        self.device_index = device['index'] if device and device.get('index') is not None else 0
         self.camera = None
         self.is_recording = False
         self.frame = None
@@ -143,6 +186,62 @@ class WebcamManager:
         self.current_resolution = None
         self.current_zoom = 1.0
         self.frame_lock = threading.Lock()
+        # Frames are captured and encoded once here, stream clients read from the hub
+        self.frame_hub = FrameHub()
+        # Reusable buffers for HIKROBOT and corrected frames, large enough for two
+        # buffers per frame without overwriting a frame still in the hub ring
+        self.frame_pool = FrameBufferPool(self.frame_hub.capacity * 3)
+        # Running average and dark/flat-field correction of the full-resolution frame
+        self.frame_correction = FrameCorrection(self.frame_pool)
+        # 'callback' lets the SDK push frames as they arrive, 'polling' uses MV_CC_GetImageBuffer
+        self.capture_mode = 'callback'
+        self.acquisition_frame_rate = 30.0
+        self.exposure_time = None
+        self.last_frame_timestamp = None
+        # Full-resolution frame behind the latest preview, kept for lossless snapshots
+        self.last_raw_frame = None
+        # Native SDK pixel type of the last HIKROBOT frame (None for webcam/virtual)
+        self.current_pixel_type = None
+        # Active region of interest: programmed on the sensor where supported,
+        # otherwise cropped on the host before the display resize
+        self.roi = None
+        self.host_roi = None
+        self.host_binning = 1
+        # Focus score of every captured frame, streamed to the UI over SSE
+        self.focus_meter = FocusMeter()
+        # Skips JPEG encoding while the scene is static
+        self.change_detector = ChangeDetector()
+        # Capture/encode/delivery counters and latency histograms for /api/metrics
+        self.metrics = PipelineMetrics()
+        # Low-rate porosity/phase pass on the live stream, shares the route analyzer's calibration
+        self.live_analysis = LiveAnalysis(self.frame_hub, analyzer)
+        # Shared writer pool for snapshots and burst/time-lapse sequences
+        self.image_writer = ImageWriter(workers=3, max_queue=16)
+        # Cached camera parameters, slider updates are coalesced and applied off-thread
+        self.settings = CameraSettings(self)
+        # Live /api/video-feed and /api/ws/video-feed clients of this camera
+        self.stream_consumers = ConsumerRegistry()
+        self.burst = None
+        # Uncompressed recording at the full sensor rate, preview encoding is throttled meanwhile
+        self.raw_recorder = None
+        self.raw_preview_fps = 10.0
+        # Compressed recording of the live view, encoded off the capture thread
+        self.video_recorder = None
+        self._image_callback = None
+        self._raw_condition = threading.Condition()
+        self._raw_frame = None
+        self._raw_timestamp = None
+        self._raw_sequence = 0
+        self._raw_consumed = 0
+        
+        # Queue depths and buffer occupancy, sampled when /api/metrics is read
+        self.metrics.register_gauge('frame_age_ms', self.get_frame_age_ms)
+        self.metrics.register_gauge('stream_consumers', self.stream_consumers.count)
+        self.metrics.register_gauge('stream_in_flight',
+                                    lambda: sum(c['in_flight'] for c in self.stream_consumers.list()))
+        self.metrics.register_gauge('writer_queue', lambda: self.image_writer.get_stats()['queued'])
+        self.metrics.register_gauge('writer_pending', lambda: self.image_writer.get_stats()['pending'])
+        self.metrics.register_gauge('frame_pool_pinned', lambda: self.frame_pool.get_stats()['pinned'])
         
         # Initialize with default path
         self.set_save_path(self.default_save_path)
@@ -212,12 +311,16 @@ class WebcamManager:
             print(f"Error saving to main directory: {str(e)}")
             return None
 
-    def start_camera(self, camera_type=None):
+    def start_camera(self, camera_type=None, capture_mode=None, virtual_options=None):
         try:
             if self.camera is not None:
                 self.stop_camera()
 
+            if self.device and not camera_type:
+                camera_type = self.device['type']
             print(f"Starting camera with type: {camera_type}")
+            if capture_mode in ('callback', 'polling'):
+                self.capture_mode = capture_mode
 
             if camera_type == "HIKERBOT":
                 # Initialize HIKROBOT camera
@@ -240,8 +343,10 @@ class WebcamManager:
                     print("No HIKROBOT camera found!")
                     return False
 
-                # Select first available device
-                stDeviceList = cast(deviceList.pDeviceInfo[0], POINTER(MV_CC_DEVICE_INFO)).contents
+                stDeviceList = self._select_hikrobot_device(deviceList)
+                if stDeviceList is None:
+                    print(f"HIKROBOT camera {self.device_id} not found!")
+                    return False
 
                 # Create handle
                 ret = self.hikrobot_camera.MV_CC_CreateHandle(stDeviceList)
@@ -255,6 +360,18 @@ class WebcamManager:
                     print("Open Device fail!")
                     return False
 
+                self.acquisition_frame_rate = self._read_acquisition_frame_rate()
+                self.exposure_time = self._read_exposure_time()
+
+                # Callbacks must be registered before grabbing starts
+                if self.capture_mode == 'callback':
+                    self._image_callback = FrameInfoCallBack(self._on_image_callback)
+                    ret = self.hikrobot_camera.MV_CC_RegisterImageCallBackEx(self._image_callback, None)
+                    if ret != 0:
+                        print(f"Register image callback fail (error code: {ret}), falling back to polling")
+                        self._image_callback = None
+                        self.capture_mode = 'polling'
+
                 # Start grabbing
                 ret = self.hikrobot_camera.MV_CC_StartGrabbing()
                 if ret != 0:
@@ -267,11 +384,27 @@ class WebcamManager:
                 # Set initial zoom based on current magnification
                 if hasattr(self, 'current_zoom'):
                     self.set_digital_zoom(f"{int(self.current_zoom * 100)}x")
+            elif camera_type == "VIRTUAL":
+                # Replays micrographs/video for benchmarking without hardware
+                options = virtual_options or {}
+                self.camera = VirtualCamera(
+                    source=options.get('source'),
+                    width=options.get('width'),
+                    height=options.get('height'),
+                    fps=options.get('fps', 30.0),
+                    pixel_format=options.get('pixelFormat', 'BGR8'),
+                    jitter_ms=options.get('jitterMs', 0.0),
+                    drop_rate=options.get('dropRate', 0.0)
+                )
+                self.current_camera_type = 'VIRTUAL'
+                self.acquisition_frame_rate = self.camera.fps
             else:
-                # Default webcam (index 0)
-                print("Using default webcam")
-                self.camera = cv2.VideoCapture(0)
+                # Default webcam (index 0) or the registry's UVC device
+                print(f"Using webcam {self.device_index}")
+                self.camera = cv2.VideoCapture(self.device_index)
                 self.current_camera_type = 'WEBCAM'
+                fps = self.camera.get(cv2.CAP_PROP_FPS)
+                self.acquisition_frame_rate = fps if fps and fps > 0 else 30.0
 
             self.is_recording = True
             self.thread = threading.Thread(target=self.capture_frames)
@@ -283,77 +416,335 @@ class WebcamManager:
             print(f"Error starting camera: {str(e)}")
             return False
 
+    def _select_hikrobot_device(self, deviceList):
+        """Device info matching this manager's serial number, or the first device"""
+        serial = self.device.get('serial') if self.device else None
+        for index in range(deviceList.nDeviceNum):
+            device = cast(deviceList.pDeviceInfo[index], POINTER(MV_CC_DEVICE_INFO)).contents
+            # Serials are stable where enumeration order is not
+            if not serial or hikrobot_device_info(device)['serial'] == serial:
+                return device
+        return None
+
+    def get_frame_age_ms(self):
+        latest = self.frame_hub.latest()
+        return round((time.time() - latest.timestamp) * 1000, 2) if latest else None
+
     def capture_frames(self):
-        """Continuously capture frames from the camera"""
+        """Continuously capture frames from the camera and publish them to the frame hub"""
+        last_timestamp = None
+        last_encoded = 0.0
         while self.is_recording:
             try:
-                if self.current_camera_type == 'HIKERBOT':
-                    frame = self.get_frame()
-                    if frame is not None:
-                        ret, buffer = cv2.imencode('.jpg', frame)
-                        if ret:
-                            self.frame = buffer.tobytes()
-                            self.last_frame = self.frame
-                else:
+                if self.current_camera_type != 'HIKERBOT':
                     if self.camera is None or not self.camera.isOpened():
                         break
 
-                    success, frame = self.camera.read()
-                    if success:
-                        frame = cv2.flip(frame, 1)
-                        ret, buffer = cv2.imencode('.jpg', frame)
-                        if ret:
-                            self.frame = buffer.tobytes()
-                            self.last_frame = self.frame
+                frame = self.get_frame()
+                if frame is None:
+                    time.sleep(0.01)
+                    continue
 
-                time.sleep(0.033)  # ~30 FPS
+                # No fixed sleep: get_frame blocks until the camera delivers
+                # the next frame, so pacing follows the acquisition frame rate
+                process_start = time.perf_counter()
+                timestamp = self.last_frame_timestamp or time.time()
+                self.metrics.increment('frames_grabbed')
+                if last_timestamp is not None:
+                    self.metrics.observe('frame_interval_ms', (timestamp - last_timestamp) * 1000)
+                last_timestamp = timestamp
+                # The focus score also feeds change detection (thumbnails can't see focus)
+                focus = self.focus_meter.update(frame, timestamp)
+                throttled = (self.raw_recorder is not None and self.raw_recorder.active and self.raw_preview_fps
+                             and timestamp - last_encoded < 1.0 / self.raw_preview_fps)
+                if throttled:
+                    # Raw recording takes the full rate, the live preview only needs a few fps.
+                    # The detector isn't asked, so its reference stays the last encoded frame
+                    changed = False
+                else:
+                    changed = self.change_detector.has_changed(frame, timestamp, focus.score if focus else None)
+
+                encode_ms = 0.0
+                if changed or self.frame is None:
+                    encode_start = time.perf_counter()
+                    ret, buffer = cv2.imencode('.jpg', frame)
+                    if not ret:
+                        continue
+                    self.frame = buffer.tobytes()
+                    self.last_frame = self.frame
+                    encode_ms = (time.perf_counter() - encode_start) * 1000
+                    last_encoded = timestamp
+                    self.metrics.increment('frames_encoded')
+                    self.metrics.observe('encode_ms', encode_ms)
+                else:
+                    self.metrics.increment('frames_unchanged')
+                # Unchanged frames are still published with the cached JPEG, since
+                # bursts, focus stacking and live analysis want every raw frame
+                self.frame_hub.publish(frame, self.frame, timestamp, encode_ms,
+                                       raw=self.last_raw_frame, changed=changed,
+                                       focus_score=focus.score if focus else None)
+                self.metrics.observe('process_ms', (time.perf_counter() - process_start) * 1000)
             except Exception as e:
                 print(f"Error capturing frame: {str(e)}")
+                self.metrics.increment('capture_errors')
                 time.sleep(0.1)
 
         self.is_recording = False
 
     def stop_camera(self):
+        if self.burst is not None:
+            self.burst.stop()
+        if self.raw_recorder is not None:
+            self.raw_recorder.stop()
+        if self.video_recorder is not None:
+            self.video_recorder.stop()
+        self.live_analysis.stop()
         self.is_recording = False
+        with self._raw_condition:
+            self._raw_condition.notify_all()
         if self.thread:
             self.thread.join(timeout=1.0)
         
         if self.current_camera_type == 'HIKERBOT':
             if self.camera:
                 self.camera.MV_CC_StopGrabbing()
+                if self.roi and self.roi['mode'] == 'sensor':
+                    # Leave the camera at full-sensor readout for the next session
+                    SensorROI(self.camera).reset(self.roi['binning_mode'])
                 self.camera.MV_CC_CloseDevice()
                 self.camera.MV_CC_DestroyHandle()
+            # Keep the callback alive until grabbing has stopped
+            self._image_callback = None
+            self._raw_frame = None
         else:
             if self.camera:
                 self.camera.release()
         
         self.camera = None
         self.frame = None
+        self.last_raw_frame = None
+        self.current_pixel_type = None
+        self.roi = None
+        self.host_roi = None
+        self.host_binning = 1
         self.current_camera_type = None
+        self.exposure_time = None
+        self.frame_hub.reset()
+        self.focus_meter.reset()
+        self.change_detector.reset()
+        self.frame_correction.reset()
+        self.settings.reset()
+
+    def take_snapshot(self, save_path=None, magnification='100x', image_format='jpg', quality=95, source='raw'):
+        """
+        Save the latest frame on the background writer.
+        source='raw' saves the full-resolution frame (PNG/TIFF lossless, or JPEG at
+        the given quality), source='preview' saves the streamed JPEG bytes.
+        Returns (filepath, job) as soon as the frame is pinned and queued.
+        """
+        try:
+            packet = self.frame_hub.latest()
+            if packet is None:
+                return None, None
 
-    def take_snapshot(self, save_path=None):
-        if self.last_frame:
-            try:
-                # Use provided save path or default
-                if not save_path:
-                    save_path = self.get_current_save_path()
-                
-                # Create directory if it doesn't exist
-                os.makedirs(save_path, exist_ok=True)
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"microscope_{timestamp}.jpg"
-                filepath = os.path.join(save_path, filename)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(self.last_frame)
-                
-                print(f"Snapshot saved to: {filepath}")
-                return filepath
-            except Exception as e:
-                print(f"Error taking snapshot: {str(e)}")
-                return None
-        return None
+            # Use provided save path or default
+            if not save_path:
+                save_path = self.get_current_save_path()
+
+            # Create directory if it doesn't exist
+            os.makedirs(save_path, exist_ok=True)
+
+            image_format = (image_format or 'jpg').lower().lstrip('.')
+            if image_format not in SNAPSHOT_FORMATS:
+                raise ValueError(f"Unsupported snapshot format: {image_format}")
+            if source == 'preview':
+                image_format = 'jpg'
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filepath = self._unique_path(save_path, f"microscope_{magnification}_{timestamp}", image_format)
+
+            if source == 'preview':
+                job = self.image_writer.submit(packet.jpeg, filepath, timeout=5.0)
+            else:
+                raw = packet.raw
+                # Pin the pooled capture buffer until the writer is done with it
+                pinned = self.frame_pool.pin(raw)
+
+                def release(job):
+                    if pinned:
+                        self.frame_pool.unpin(raw)
+
+                if image_format in ('jpg', 'jpeg'):
+                    params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+                elif image_format == 'png':
+                    # Favour write speed, PNG stays lossless at any level
+                    params = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+                else:
+                    params = []
+                job = self.image_writer.submit(raw, filepath, params, on_complete=release, timeout=5.0)
+                if job is None and pinned:
+                    self.frame_pool.unpin(raw)
+
+            if job is None:
+                print("Snapshot writer queue is full")
+                return None, None
+
+            print(f"Snapshot queued for: {filepath}")
+            return filepath, job
+        except Exception as e:
+            print(f"Error taking snapshot: {str(e)}")
+            return None, None
+
+    def _unique_path(self, directory, stem, ext):
+        """Append a counter when a file (or a queued write) with that name already exists"""
+        filepath = os.path.join(directory, f"{stem}.{ext}")
+        counter = 1
+        while os.path.exists(filepath) or self.image_writer.get_pending(filepath):
+            filepath = os.path.join(directory, f"{stem}_{counter}.{ext}")
+            counter += 1
+        return filepath
+
+    def start_burst(self, count, interval=0.0, save_path=None, image_format='png', quality=95,
+                    magnification='100x', prefix='burst'):
+        """Start a burst (interval=0) or time-lapse capture on a background thread"""
+        if not self.is_recording:
+            raise RuntimeError('Camera is not running')
+        if self.burst is not None and self.burst.is_running():
+            raise RuntimeError('A capture sequence is already running')
+
+        image_format = (image_format or 'png').lower().lstrip('.')
+        if image_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        if int(count) <= 0:
+            raise ValueError('Frame count must be positive')
+
+        self.burst = BurstCapture(
+            self.frame_hub, self.frame_pool, self.image_writer,
+            save_path or self.get_current_save_path(), count, interval,
+            image_format, quality, prefix, magnification
+        )
+        self.burst.start()
+        return self.burst.get_status()
+
+    def focus_stack(self, files=None, count=0, save_path=None, image_format='tiff', quality=95,
+                    magnification='100x', window=9, save_depth_map=False):
+        """
+        Fuse a focus sweep into one all-in-focus image.
+        Frames come from image files (e.g. a finished burst) or, with count > 0,
+        straight from the live stream while the operator sweeps the focus.
+        Frames are folded into the stacker one at a time and never held together.
+        Returns a result dict with the queued output path(s) and write job(s).
+        """
+        image_format = (image_format or 'tiff').lower().lstrip('.')
+        if image_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+
+        stacker = FocusStacker(window)
+        start = time.time()
+        if files:
+            for path in files:
+                frame = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+                if frame is None:
+                    raise ValueError(f"Failed to read image: {path}")
+                stacker.add(frame)
+                del frame
+        elif count and int(count) > 0:
+            if not self.is_recording:
+                raise RuntimeError('Camera is not running')
+            last_sequence = self.frame_hub.sequence
+            while stacker.count < int(count):
+                packet = self.frame_hub.wait_for_frame(last_sequence, timeout=2.0)
+                if packet is None:
+                    raise RuntimeError('Timed out waiting for camera frames')
+                last_sequence = packet.sequence
+                # Pinned so the capture thread can't reuse the buffer mid-add
+                pinned = self.frame_pool.pin(packet.raw)
+                try:
+                    stacker.add(packet.raw)
+                finally:
+                    if pinned:
+                        self.frame_pool.unpin(packet.raw)
+        else:
+            raise ValueError('No frames to stack')
+
+        if stacker.count < 2:
+            raise ValueError('Focus stacking needs at least two frames')
+
+        save_path = save_path or self.get_current_save_path()
+        os.makedirs(save_path, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filepath = self._unique_path(save_path, f"stack_{magnification}_{timestamp}", image_format)
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)] if image_format in ('jpg', 'jpeg') else []
+        job = self.image_writer.submit(stacker.result, filepath, params, timeout=5.0)
+        if job is None:
+            raise RuntimeError('Image writer queue is full')
+
+        result = dict(stacker.get_stats(), filepath=filepath, job_id=job.id,
+                      elapsed=round(time.time() - start, 3))
+        if save_depth_map:
+            depth_path = self._unique_path(save_path, f"stack_{magnification}_{timestamp}_depth", 'png')
+            depth_job = self.image_writer.submit(stacker.get_depth_map(), depth_path, timeout=5.0)
+            if depth_job is not None:
+                result['depth_map'] = depth_path
+                result['depth_job_id'] = depth_job.id
+        return result
+
+    def start_raw_recording(self, save_path=None, segment_mb=1024, max_mb=None, preview_fps=10.0):
+        """Record every captured frame uncompressed into memory-mapped segment files"""
+        if not self.is_recording:
+            raise RuntimeError('Camera is not running')
+        if self.raw_recorder is not None and self.raw_recorder.active:
+            raise RuntimeError('A raw recording is already running')
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        directory = self._unique_path(save_path or self.get_current_save_path(), f"raw_{timestamp}", 'rec')
+        self.raw_preview_fps = max(0.0, float(preview_fps or 0.0))
+        self.raw_recorder = RawRecorder(directory, int(float(segment_mb) * (1 << 20)),
+                                        int(float(max_mb) * (1 << 20)) if max_mb else None)
+        return self.raw_recorder.get_status()
+
+    def stop_raw_recording(self):
+        if self.raw_recorder is None:
+            return None
+        self.raw_recorder.stop()
+        return self.raw_recorder.get_status()
+
+    def start_video_recording(self, save_path=None, codec='MJPG', fps=None, scale=1.0, source='preview',
+                              max_queue=32):
+        """Record the live view to a video file, encoded on a dedicated thread"""
+        if not self.is_recording:
+            raise RuntimeError('Camera is not running')
+        if self.video_recorder is not None and self.video_recorder.is_running():
+            raise RuntimeError('A video recording is already running')
+        if codec not in VIDEO_CODECS:
+            raise ValueError(f"Unsupported codec: {codec}")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        save_path = save_path or self.get_current_save_path()
+        os.makedirs(save_path, exist_ok=True)
+        filepath = self._unique_path(save_path, f"video_{timestamp}", VIDEO_CODECS[codec])
+        fps = fps or min(self.acquisition_frame_rate or 30.0, 30.0)
+        self.video_recorder = VideoRecorder(self.frame_hub, self.frame_pool, filepath, codec, fps, scale,
+                                            source, max_queue)
+        self.video_recorder.start()
+        return self.video_recorder.get_status()
+
+    def stop_video_recording(self):
+        if self.video_recorder is None:
+            return None
+        return self.video_recorder.stop()
+
+    def _record_raw(self, data, width, height, pixel_type, timestamp=None, frame_number=None):
+        recorder = self.raw_recorder
+        if recorder is not None and recorder.active:
+            recorder.append(data, width, height, pixel_type,
+                            self.last_frame_timestamp if timestamp is None else timestamp, frame_number)
+
+    def stop_burst(self):
+        if self.burst is None:
+            return None
+        self.burst.stop()
+        return self.burst.get_status()
 
     def set_resolution(self, width, height):
         if self.current_camera_type == 'HIKERBOT' and self.camera:
@@ -445,47 +836,297 @@ class WebcamManager:
             print(f"Error getting zoom: {str(e)}")
             return None
 
+    def set_roi(self, x, y, width, height, binning=1, binning_mode='binning', mode='auto'):
+        """
+        Restrict capture to a region of interest, given in full-resolution pixels.
+        mode='auto' programs OffsetX/OffsetY/Width/Height and binning on a
+        HIKROBOT camera and falls back to a host-side crop when the camera
+        rejects it; 'sensor' never falls back and 'host' always crops on the host.
+        Returns a report with the frame rate before and after, or None on failure.
+        """
+        try:
+            if self.camera is None:
+                print("Camera not started")
+                return None
+            if binning_mode not in SensorROI.BINNING_MODES:
+                print(f"Unsupported binning mode: {binning_mode}")
+                return None
+            x, y, width, height = int(x), int(y), int(width), int(height)
+            binning = max(1, int(binning or 1))
+            if width <= 0 or height <= 0 or x < 0 or y < 0:
+                print(f"Invalid ROI: {x},{y} {width}x{height}")
+                return None
+
+            rate_before = self.acquisition_frame_rate
+            with self.frame_lock:
+                if self.current_camera_type == 'HIKERBOT' and mode != 'host':
+                    report = self._set_sensor_roi(x, y, width, height, binning, binning_mode)
+                    if report is not None:
+                        report['frame_rate_before'] = rate_before
+                        return report
+                    if mode == 'sensor':
+                        return None
+                    print("Sensor ROI not supported, cropping on the host instead")
+                elif mode == 'sensor':
+                    print("Sensor ROI is only available for HIKROBOT cameras")
+                    return None
+
+                self.host_roi = (x, y, width, height)
+                self.host_binning = binning
+                self.roi = {
+                    'mode': 'host',
+                    'region': {'x': x, 'y': y, 'width': width, 'height': height},
+                    'binning': binning,
+                    'binning_mode': binning_mode
+                }
+            # The camera still sends full frames, only the resize work shrinks
+            return dict(self.roi, frame_rate_before=rate_before, frame_rate_after=rate_before,
+                        frame_rate_gain=1.0)
+        except Exception as e:
+            print(f"Error setting ROI: {str(e)}")
+            return None
+
+    def _set_sensor_roi(self, x, y, width, height, binning, binning_mode):
+        """Program the ROI on the HIKROBOT sensor, restarting grabbing around the change"""
+        sensor = SensorROI(self.hikrobot_camera)
+        full = sensor.get_region()
+        if full is None:
+            return None
+
+        self.hikrobot_camera.MV_CC_StopGrabbing()
+        region = sensor.apply(x, y, width, height, binning, binning_mode)
+        if region is None:
+            # Restore full readout so a partial write doesn't leave the camera cropped
+            sensor.reset(binning_mode)
+        ret = self.hikrobot_camera.MV_CC_StartGrabbing()
+        if ret != 0:
+            print(f"Failed to restart grabbing after ROI change (error code: {ret})")
+        if region is None:
+            return None
+
+        rate_after = sensor.get_frame_rate() or self.acquisition_frame_rate
+        rate_before = self.acquisition_frame_rate
+        self.acquisition_frame_rate = rate_after
+        self.host_roi = None
+        self.host_binning = 1
+        self.roi = {
+            'mode': 'sensor',
+            'region': region,
+            'binning': binning,
+            'binning_mode': binning_mode
+        }
+        full_pixels = (full['width_max'] or full['width']) * (full['height_max'] or full['height'])
+        return dict(self.roi,
+                    frame_rate_after=rate_after,
+                    frame_rate_gain=round(rate_after / rate_before, 3) if rate_before else None,
+                    bandwidth_ratio=round(region['width'] * region['height'] / full_pixels, 4))
+
+    def clear_roi(self):
+        """Return to full-frame capture"""
+        try:
+            with self.frame_lock:
+                if self.roi and self.roi['mode'] == 'sensor' and self.hikrobot_camera:
+                    sensor = SensorROI(self.hikrobot_camera)
+                    self.hikrobot_camera.MV_CC_StopGrabbing()
+                    sensor.reset(self.roi['binning_mode'])
+                    self.hikrobot_camera.MV_CC_StartGrabbing()
+                    self.acquisition_frame_rate = sensor.get_frame_rate() or self.acquisition_frame_rate
+                self.roi = None
+                self.host_roi = None
+                self.host_binning = 1
+            return True
+        except Exception as e:
+            print(f"Error clearing ROI: {str(e)}")
+            return False
+
+    def _apply_host_roi(self, frame):
+        """Crop to the host-side ROI (a view, no copy), clamped to the frame"""
+        if self.host_roi is None:
+            return frame
+        x, y, width, height = self.host_roi
+        frame_height, frame_width = frame.shape[:2]
+        x, y = min(x, frame_width - 1), min(y, frame_height - 1)
+        return frame[y:min(y + height, frame_height), x:min(x + width, frame_width)]
+
+    def _host_downscale(self, preview):
+        """Approximate binning on the host by area-averaging the preview"""
+        if self.host_binning <= 1:
+            return preview
+        return cv2.resize(preview, None, fx=1.0 / self.host_binning, fy=1.0 / self.host_binning,
+                          interpolation=cv2.INTER_AREA)
+
+    def set_frame_pool_size(self, size):
+        """Resize the HIKROBOT frame buffer pool"""
+        try:
+            size = int(size)
+            # Frame correction takes a second buffer per frame
+            minimum = (self.frame_hub.capacity + 2) * 2
+            if size < minimum:
+                print(f"Frame pool size {size} too small, using {minimum}")
+                size = minimum
+            with self.frame_lock:
+                self.frame_pool.resize(size)
+            return True
+        except Exception as e:
+            print(f"Error setting frame pool size: {str(e)}")
+            return False
+
+    def _read_acquisition_frame_rate(self):
+        """Read AcquisitionFrameRate from the HIKROBOT camera, defaulting to 30 fps"""
+        try:
+            stFloatValue = MVCC_FLOATVALUE()
+            ret = self.hikrobot_camera.MV_CC_GetFloatValue("AcquisitionFrameRate", stFloatValue)
+            if ret == 0 and stFloatValue.fCurValue > 0:
+                return float(stFloatValue.fCurValue)
+            print(f"Failed to get acquisition frame rate (error code: {ret})")
+        except Exception as e:
+            print(f"Error reading acquisition frame rate: {str(e)}")
+        return 30.0
+
+    def _read_exposure_time(self):
+        """Read ExposureTime (microseconds) from the HIKROBOT camera, None if unavailable"""
+        try:
+            stFloatValue = MVCC_FLOATVALUE()
+            ret = self.hikrobot_camera.MV_CC_GetFloatValue("ExposureTime", stFloatValue)
+            if ret == 0:
+                return float(stFloatValue.fCurValue)
+            print(f"Failed to get exposure time (error code: {ret})")
+        except Exception as e:
+            print(f"Error reading exposure time: {str(e)}")
+        return None
+
+    def _copy_sdk_frame(self, pBufAddr, stFrameInfo):
+        """Copy an SDK image buffer into a pooled array, returns (data, width, height, pixel_type)"""
+        frame_len = int(stFrameInfo.nFrameLen)
+        data = self.frame_pool.acquire(frame_len)
+        memmove(data.ctypes.data, pBufAddr, frame_len)
+        return data, int(stFrameInfo.nWidth), int(stFrameInfo.nHeight), int(stFrameInfo.enPixelType)
+
+    def _convert_sdk_frame(self, sdk_frame):
+        """Decode a copied SDK buffer in its native pixel format, returns the display-sized preview"""
+        data, width, height, pixel_type = sdk_frame
+        if self._image_callback is None:
+            # Recorded before conversion, which shifts unpacked 10/12-bit data in place.
+            # In callback mode the SDK callback records every frame instead
+            self._record_raw(data, width, height, pixel_type)
+        frame, preview = convert_frame(data, width, height, pixel_type)
+        self.current_pixel_type = pixel_type
+        # Crop before resizing so only the region of interest is scaled
+        frame = self._apply_host_roi(frame)
+        corrected = self._correct(frame)
+        if corrected is frame:
+            preview = self._apply_host_roi(preview)
+        else:
+            preview = to_preview(corrected)
+        self.last_raw_frame = corrected
+        return self._scale_to_display(self._host_downscale(preview))
+
+    def _correct(self, frame):
+        corrected = self.frame_correction.apply(frame)
+        if corrected is not frame:
+            self.metrics.observe('correction_ms', self.frame_correction.apply_ms)
+        return corrected
+
+    def _on_image_callback(self, pData, pFrameInfo, pUser):
+        """SDK image callback, runs on the SDK thread and only copies the frame out"""
+        try:
+            info = pFrameInfo.contents
+            frame_len = int(info.nFrameLen)
+            timestamp = time.time()
+            recorder = self.raw_recorder
+            if recorder is not None and recorder.active:
+                # Straight from the SDK buffer, so the recording keeps the full sensor
+                # rate even when conversion and encoding drop frames below
+                sdk_data = np.ctypeslib.as_array(ctypes.cast(pData, ctypes.POINTER(ctypes.c_ubyte)),
+                                                 shape=(frame_len,))
+                self._record_raw(sdk_data, int(info.nWidth), int(info.nHeight), int(info.enPixelType),
+                                 timestamp, int(info.nFrameNum))
+            with self._raw_condition:
+                pending = self._raw_frame if self._raw_sequence != self._raw_consumed else None
+                if pending is not None and pending[0].nbytes == frame_len:
+                    # The capture thread hasn't taken the previous frame yet: overwrite its
+                    # staging buffer rather than advance the pool, which would wrap onto
+                    # buffers still referenced by packets in the hub
+                    memmove(pending[0].ctypes.data, pData, frame_len)
+                    self._raw_frame = (pending[0], int(info.nWidth), int(info.nHeight), int(info.enPixelType))
+                    self._raw_timestamp = timestamp
+                    self._raw_sequence += 1
+                    self.metrics.increment('sdk_frames_dropped')
+                    self._raw_condition.notify_all()
+                    return
+
+            # Pixel conversion happens on the capture thread so the SDK thread stays free
+            frame = self._copy_sdk_frame(pData, info)
+            with self._raw_condition:
+                self._raw_frame = frame
+                self._raw_timestamp = timestamp
+                self._raw_sequence += 1
+                self._raw_condition.notify_all()
+        except Exception as e:
+            print(f"Error in image callback: {str(e)}")
+
+    def _wait_for_callback_frame(self):
+        """Wait for the next frame delivered by the image callback"""
+        # Allow a few frame periods before giving up so stop_camera is noticed
+        timeout = max(0.1, 3.0 / self.acquisition_frame_rate)
+        with self._raw_condition:
+            self._raw_condition.wait_for(
+                lambda: self._raw_sequence != self._raw_consumed or not self.is_recording,
+                timeout
+            )
+            if self._raw_sequence == self._raw_consumed or self._raw_frame is None:
+                return None
+            self._raw_consumed = self._raw_sequence
+            self.last_frame_timestamp = self._raw_timestamp
+            return self._raw_frame
+
+    def _scale_to_display(self, frame):
+        """Resize frame to display resolution while maintaining aspect ratio"""
+        if not self.current_resolution:
+            return frame
+
+        original_height, original_width = frame.shape[:2]
+        display_width, display_height = self.current_resolution
+        aspect_ratio = original_width / original_height
+        target_aspect = display_width / display_height
+
+        if aspect_ratio > target_aspect:
+            # Width limited by display width
+            new_width = display_width
+            new_height = int(display_width / aspect_ratio)
+        else:
+            # Height limited by display height
+            new_height = display_height
+            new_width = int(display_height * aspect_ratio)
+
+        return cv2.resize(frame, (new_width, new_height))
+
     def get_frame(self):
         """Get the current frame from the camera"""
         with self.frame_lock:
             if self.current_camera_type == 'HIKERBOT':
                 if not self.hikrobot_camera:
                     return None
+
+                if self._image_callback is not None:
+                    sdk_frame = self._wait_for_callback_frame()
+                    if sdk_frame is None:
+                        if self.is_recording:
+                            self.metrics.increment('sdk_timeouts')
+                        return None
+                    return self._timed_convert(sdk_frame)
                     
                 stOutFrame = MV_FRAME_OUT()
                 ret = self.hikrobot_camera.MV_CC_GetImageBuffer(stOutFrame, 1000)
                 if ret == 0:
-                    # Get original dimensions
-                    original_width = stOutFrame.stFrameInfo.nWidth
-                    original_height = stOutFrame.stFrameInfo.nHeight
-
-                    # Get current display resolution
-                    display_width, display_height = self.current_resolution if self.current_resolution else (original_width, original_height)
-
-                    pData = (c_ubyte * stOutFrame.stFrameInfo.nFrameLen)()
-                    cdll.msvcrt.memcpy(byref(pData), stOutFrame.pBufAddr, stOutFrame.stFrameInfo.nFrameLen)
-                    data = np.frombuffer(pData, count=int(stOutFrame.stFrameInfo.nFrameLen), dtype=np.uint8)
-                    frame = data.reshape((original_height, original_width, -1))
-                    
-                    # Resize frame to display resolution while maintaining aspect ratio
-                    if self.current_resolution:
-                        aspect_ratio = original_width / original_height
-                        target_aspect = display_width / display_height
-                        
-                        if aspect_ratio > target_aspect:
-                            # Width limited by display width
-                            new_width = display_width
-                            new_height = int(display_width / aspect_ratio)
-                        else:
-                            # Height limited by display height
-                            new_height = display_height
-                            new_width = int(display_height * aspect_ratio)
-                            
-                        frame = cv2.resize(frame, (new_width, new_height))
+                    self.last_frame_timestamp = time.time()
+                    # Copy the SDK buffer straight into a pooled array (no per-frame allocation)
+                    sdk_frame = self._copy_sdk_frame(stOutFrame.pBufAddr, stOutFrame.stFrameInfo)
                     
                     # Release buffer
                     self.hikrobot_camera.MV_CC_FreeImageBuffer(stOutFrame)
-                    return frame
+                    return self._timed_convert(sdk_frame)
+                self.metrics.increment('sdk_timeouts')
                     
             else:
                 # Regular webcam capture
@@ -494,108 +1135,577 @@ class WebcamManager:
 
                 success, frame = self.camera.read()
                 if success:
-                    frame = cv2.flip(frame, 1)
-                    return frame
+                    self.last_frame_timestamp = time.time()
+                    convert_start = time.perf_counter()
+                    if self.current_camera_type == 'WEBCAM':
+                        frame = cv2.flip(frame, 1)
+                    self._record_raw(frame, frame.shape[1], frame.shape[0], frame_pixel_type(frame))
+                    frame = self._correct(self._apply_host_roi(frame))
+                    self.last_raw_frame = frame
+                    # 16-bit virtual frames are streamed as an 8-bit preview
+                    preview = self._host_downscale(to_preview(frame))
+                    self.metrics.observe('convert_ms', (time.perf_counter() - convert_start) * 1000)
+                    return preview
+                self.metrics.increment('read_failures')
                     
             return None
 
-webcam = WebcamManager()
+    def _timed_convert(self, sdk_frame):
+        convert_start = time.perf_counter()
+        preview = self._convert_sdk_frame(sdk_frame)
+        self.metrics.observe('convert_ms', (time.perf_counter() - convert_start) * 1000)
+        return preview
+
+# One WebcamManager per camera; `webcam` is the default device, used when a
+# request doesn't name one
+devices = DeviceRegistry(WebcamManager)
+webcam = devices.default
+
+def _request_camera():
+    """Camera named by the request's deviceId (query string or JSON body), default camera otherwise"""
+    device_id = request.args.get('deviceId')
+    if device_id is None and request.is_json:
+        device_id = (request.get_json(silent=True) or {}).get('deviceId')
+    return devices.get(device_id)
+
+@app.errorhandler(UnknownDeviceError)
+def unknown_device(e):
+    return jsonify({'status': 'error', 'message': f"Unknown camera device: {e.args[0]}"}), 404
+
+@app.route('/api/devices', methods=['GET'])
+def list_devices():
+    """Cameras known to the server; ?refresh=1 enumerates HIKROBOT and UVC devices again"""
+    try:
+        if request.args.get('refresh') in ('1', 'true'):
+            devices.refresh()
+        return jsonify({'status': 'success', 'devices': devices.list()})
+    except Exception as e:
+        print(f"Error listing devices: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @app.route('/api/start-camera', methods=['POST'])
 def start_camera():
     try:
         data = request.get_json()
         camera_type = data.get('cameraType')
+        capture_mode = data.get('captureMode')  # 'callback' (default) or 'polling'
+        virtual_options = data.get('virtualCamera')  # source/width/height/fps/pixelFormat/jitterMs/dropRate
         print(f"Starting camera with type: {camera_type}")  # Debug log
+        device_id = data.get('deviceId')
+        if camera_type == 'VIRTUAL' and device_id:
+            # Virtual cameras can be added under any ID for multi-stream benchmarks
+            camera = devices.add_virtual(device_id)
+        else:
+            camera = devices.get(device_id)
         
-        if webcam.start_camera(camera_type):
+        if camera.start_camera(camera_type, capture_mode, virtual_options):
             return jsonify({'status': 'success'})
         return jsonify({'status': 'error', 'message': 'Failed to start camera'})
+    except UnknownDeviceError:
+        raise
     except Exception as e:
         print(f"Error in start_camera route: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)})
 
 @app.route('/api/stop-camera', methods=['POST'])
 def stop_camera():
-    webcam.stop_camera()
+    camera = _request_camera()
+    camera.stop_camera()
     return jsonify({'status': 'success'})
 
+def _parse_stream_tier(params):
+    """
+    Per-client stream tier, e.g. quality=70&maxWidth=480&fps=10 for thumbnails.
+    Clients asking for the same quality/width share one encoding per frame.
+    """
+    return {
+        'quality': min(max(int(params.get('quality', DEFAULT_JPEG_QUALITY)), 10), 100),
+        'max_width': int(params.get('maxWidth', 0) or 0) or None,
+        'fps': max(0.0, float(params.get('fps', 0) or 0)),
+        # While the scene is static the cached frame is re-sent only this often (seconds)
+        'keepalive': float(params.get('keepalive', 1.0))
+    }
+
+def _paced_frames(camera, tier, consumer, poll_timeout=1.0, idle_timeout=5.0):
+    """
+    Yield (packet, jpeg, encode_ms) for one stream client following its tier.
+    Unchanged frames are held back until the keep-alive interval, the target
+    FPS is paced against an ideal cadence and slow readers always jump to the
+    newest frame, so nothing queues up per client. Yields None when no frame
+    is due so callers can service their connection, and ends once the camera
+    has been stopped for idle_timeout seconds. `tier` is read on every frame
+    and may be changed while streaming.
+    """
+    last_sequence = 0
+    last_sent = 0.0
+    next_due = 0.0
+    dirty = False
+    idle_since = None
+    while True:
+        try:
+            if not camera.is_recording:
+                idle_since = idle_since or time.time()
+                if time.time() - idle_since > idle_timeout:
+                    return
+                time.sleep(0.1)
+                yield None
+                continue
+            idle_since = None
+
+            packet = camera.frame_hub.wait_for_frame(last_sequence, timeout=poll_timeout)
+            if packet is None:
+                yield None
+                continue
+
+            if last_sequence and packet.sequence > last_sequence + 1:
+                # Frames published while this client was still writing the last one
+                dropped = packet.sequence - last_sequence - 1
+                consumer.frames_dropped += dropped
+                camera.metrics.increment('stream_frames_dropped', dropped)
+            last_sequence = packet.sequence
+            dirty = dirty or packet.changed
+            now = time.time()
+            if not dirty and now - last_sent < tier['keepalive']:
+                # Nothing moved: don't make the client decode the same image again
+                continue
+            if now < next_due:
+                # Over the client's target FPS; a skipped change is sent with the next frame
+                continue
+
+            jpeg, encode_ms = packet.get_jpeg(tier['quality'], tier['max_width'])
+            if jpeg is None:
+                continue
+            camera.metrics.observe('delivery_latency_ms', (time.time() - packet.timestamp) * 1000)
+            send_start = time.perf_counter()
+            yield packet, jpeg, encode_ms
+            # The caller has written the frame by the time it asks for the next one
+            camera.metrics.observe('send_ms', (time.perf_counter() - send_start) * 1000)
+            camera.metrics.increment('stream_frames_sent')
+            camera.metrics.increment('stream_bytes_sent', len(jpeg))
+
+            last_sent = now
+            min_interval = 1.0 / tier['fps'] if tier['fps'] > 0 else 0.0
+            # Schedule against the ideal cadence so frame-period rounding doesn't lower the rate
+            next_due = max(next_due + min_interval, now - min_interval / 2) if min_interval else 0.0
+            dirty = False
+
+        except Exception as e:
+            print(f"Error in video feed: {str(e)}")
+            time.sleep(0.1)
+
 @app.route('/api/video-feed')
 def video_feed():
+    camera = _request_camera()
+    tier = _parse_stream_tier(request.args)
+    consumer = camera.stream_consumers.register('mjpeg', request.remote_addr, tier)
+
     def generate():
+        # Stream clients only read encoded frames from the hub, the capture
+        # thread is the sole consumer of the camera
+        try:
+            for item in _paced_frames(camera, tier, consumer):
+                if item is None:
+                    continue
+                packet, jpeg, encode_ms = item
+                # Capture timestamp lets clients measure glass-to-browser latency
+                headers = (f'Content-Length: {len(jpeg)}\r\n'
+                           f'X-Frame-Sequence: {packet.sequence}\r\n'
+                           f'X-Frame-Timestamp: {packet.timestamp:.6f}\r\n'
+                           f'X-Encode-Ms: {encode_ms:.3f}\r\n'
+                           f'X-Frame-Changed: {int(packet.changed)}\r\n').encode('ascii')
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n' + headers + b'\r\n' + jpeg + b'\r\n')
+                consumer.frames_sent += 1
+                consumer.bytes_sent += len(jpeg)
+        finally:
+            # Runs when the client disconnects and the generator is closed
+            camera.stream_consumers.unregister(consumer)
+
+    return Response(generate(),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+def _frame_message(camera, packet, jpeg, encode_ms, tier):
+    """Binary WebSocket frame: 4-byte big-endian header length, JSON header, JPEG bytes"""
+    height, width = packet.frame.shape[:2]
+    if tier['max_width'] and tier['max_width'] < width:
+        height = max(1, int(round(height * tier['max_width'] / width)))
+        width = tier['max_width']
+    header = json.dumps({
+        'sequence': packet.sequence,
+        'timestamp': round(packet.timestamp, 6),
+        'encode_ms': round(encode_ms, 3),
+        'changed': packet.changed,
+        'focus_score': round(packet.focus_score, 3) if packet.focus_score is not None else None,
+        'exposure_us': camera.exposure_time,
+        'width': width,
+        'height': height,
+        'length': len(jpeg)
+    }, separators=(',', ':')).encode('utf-8')
+    return struct.pack('>I', len(header)) + header + jpeg
+
+def _handle_stream_control(message, tier, in_flight, consumer):
+    """Apply an ack or tier change sent by a WebSocket stream client"""
+    try:
+        data = json.loads(message)
+    except (TypeError, ValueError):
+        return
+    if 'ack' in data:
+        ack = int(data['ack'])
+        consumer.last_ack = max(consumer.last_ack, ack)
+        while in_flight and in_flight[0] <= ack:
+            in_flight.popleft()
+    changes = {key: data[key] for key in ('quality', 'maxWidth', 'fps', 'keepalive') if key in data}
+    if changes:
+        current = {'quality': tier['quality'], 'maxWidth': tier['max_width'] or 0,
+                   'fps': tier['fps'], 'keepalive': tier['keepalive']}
+        current.update(changes)
+        tier.update(_parse_stream_tier(current))
+
+if sock is not None:
+    @sock.route('/api/ws/video-feed')
+    def video_feed_ws(ws):
+        """
+        Live stream over a WebSocket with per-frame metadata and backpressure.
+        The client acknowledges each frame with {"ack": sequence}; at most
+        `window` frames (query parameter, default 2, 0 disables acks) are
+        sent unacknowledged, newer frames replace unsent ones meanwhile.
+        Text messages may also change quality/maxWidth/fps/keepalive.
+        """
+        tier = _parse_stream_tier(request.args)
+        window = max(0, int(request.args.get('window', 2)))
+        camera = _request_camera()
+        consumer = camera.stream_consumers.register('websocket', request.remote_addr, tier)
+        in_flight = deque()
+        frames = _paced_frames(camera, tier, consumer, poll_timeout=0.2)
+        blocked_since = None
+        try:
+            while True:
+                # Service acks and tier changes; wait for one while the window is full
+                full = window and len(in_flight) >= window
+                message = ws.receive(timeout=0.5 if full else 0)
+                while message is not None:
+                    _handle_stream_control(message, tier, in_flight, consumer)
+                    message = ws.receive(timeout=0)
+                consumer.in_flight = len(in_flight)
+
+                if window and len(in_flight) >= window:
+                    blocked_since = blocked_since or time.time()
+                    if time.time() - blocked_since > 5.0:
+                        # Acks lost: resynchronise rather than stall forever
+                        in_flight.clear()
+                    continue
+                blocked_since = None
+
+                item = next(frames, False)
+                if item is False:
+                    ws.close(message='Camera stopped')
+                    break
+                if item is None:
+                    continue
+                packet, jpeg, encode_ms = item
+                ws.send(_frame_message(camera, packet, jpeg, encode_ms, tier))
+                consumer.frames_sent += 1
+                consumer.bytes_sent += len(jpeg)
+                if window:
+                    in_flight.append(packet.sequence)
+        except ConnectionClosed:
+            pass
+        finally:
+            frames.close()
+            camera.stream_consumers.unregister(consumer)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Pipeline counters and latency histograms, with a rolling summary (?window=seconds, max 60)"""
+    camera = _request_camera()
+    try:
+        return jsonify(dict(camera.metrics.snapshot(request.args.get('window')),
+                            status='success',
+                            consumers=camera.stream_consumers.list()))
+    except Exception as e:
+        print(f"Error reading metrics: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/metrics/reset', methods=['POST'])
+def reset_metrics():
+    camera = _request_camera()
+    camera.metrics.reset()
+    return jsonify({'status': 'success'})
+
+@app.route('/api/stream-consumers', methods=['GET'])
+def get_stream_consumers():
+    camera = _request_camera()
+    return jsonify({
+        'status': 'success',
+        'websocket_available': sock is not None,
+        'consumers': camera.stream_consumers.list()
+    })
+
+@app.route('/api/focus/stream')
+def focus_stream():
+    camera = _request_camera()
+    def generate():
+        # Server-Sent Events: one small JSON message per scored frame
+        last_sequence = 0
         while True:
             try:
-                if not webcam.is_recording:
-                    time.sleep(0.1)
+                summary = camera.focus_meter.wait_for_sample(last_sequence, timeout=5.0)
+                if summary is None:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
                     continue
-                    
-                if webcam.current_camera_type == 'HIKERBOT':
-                    frame = webcam.get_frame()
-                    if frame is None:
-                        time.sleep(0.033)
-                        continue
-                        
-                    # Convert frame to JPEG
-                    ret, buffer = cv2.imencode('.jpg', frame)
-                    if not ret:
-                        continue
-                        
-                    frame_bytes = buffer.tobytes()
-                    webcam.frame = frame_bytes  # Update the current frame
-                    webcam.last_frame = frame_bytes  # Update last frame
-                    
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                else:
-                    # Regular webcam
-                    success, frame = webcam.camera.read() if webcam.camera else (False, None)
-                    if not success:
-                        time.sleep(0.033)
-                        continue
-                        
-                    frame = cv2.flip(frame, 1)
-                    ret, buffer = cv2.imencode('.jpg', frame)
-                    if not ret:
-                        continue
-                        
-                    frame_bytes = buffer.tobytes()
-                    webcam.frame = frame_bytes  # Update the current frame
-                    webcam.last_frame = frame_bytes  # Update last frame
-                    
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                
-                time.sleep(0.033)  # ~30 FPS
-                
+                last_sequence = summary['sequence']
+                yield f"id: {summary['sequence']}\ndata: {json.dumps(summary)}\n\n"
             except Exception as e:
-                print(f"Error in video feed: {str(e)}")
+                print(f"Error in focus stream: {str(e)}")
                 time.sleep(0.1)
-                continue
 
-    return Response(generate(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/focus/score', methods=['GET'])
+def get_focus_score():
+    camera = _request_camera()
+    include_history = request.args.get('history', 'false').lower() in ('1', 'true', 'yes')
+    return jsonify({
+        'status': 'success',
+        'focus': camera.focus_meter.get_summary(include_history)
+    })
+
+@app.route('/api/focus/settings', methods=['POST'])
+def set_focus_settings():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        camera.focus_meter.configure(
+            method=data.get('method'),
+            sample_width=data.get('sampleWidth'),
+            history=data.get('history'),
+            enabled=data.get('enabled')
+        )
+        return jsonify({
+            'status': 'success',
+            'method': camera.focus_meter.method,
+            'sample_width': camera.focus_meter.sample_width,
+            'enabled': camera.focus_meter.enabled
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error setting focus settings: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/focus/reset', methods=['POST'])
+def reset_focus_peak():
+    camera = _request_camera()
+    camera.focus_meter.reset()
+    return jsonify({'status': 'success'})
+
+@app.route('/api/live-analysis/start', methods=['POST'])
+def start_live_analysis():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        if not camera.is_recording:
+            return jsonify({'status': 'error', 'message': 'Camera is not running'}), 400
+
+        # Same parameter names as /api/porosity/analyze and /api/phase/analyze
+        camera.live_analysis.start(
+            mode=data.get('mode', 'porosity'),
+            rate=data.get('rate', 3.0),
+            max_width=data.get('maxWidth', 640),
+            params=data
+        )
+        return jsonify({'status': 'success', 'live_analysis': camera.live_analysis.get_status()})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error starting live analysis: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/live-analysis/stop', methods=['POST'])
+def stop_live_analysis():
+    camera = _request_camera()
+    camera.live_analysis.stop()
+    return jsonify({'status': 'success'})
+
+@app.route('/api/live-analysis/status', methods=['GET'])
+def get_live_analysis_status():
+    camera = _request_camera()
+    return jsonify({'status': 'success', 'live_analysis': camera.live_analysis.get_status()})
+
+@app.route('/api/live-analysis/stream')
+def live_analysis_stream():
+    camera = _request_camera()
+    def generate():
+        last_sequence = 0
+        while True:
+            try:
+                result = camera.live_analysis.wait_for_result(last_sequence, timeout=5.0)
+                if result is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                last_sequence = result['sequence']
+                yield f"id: {result['sequence']}\ndata: {json.dumps(result, separators=(',', ':'))}\n\n"
+            except Exception as e:
+                print(f"Error in live analysis stream: {str(e)}")
+                time.sleep(0.1)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/capture-info', methods=['GET'])
+def get_capture_info():
+    camera = _request_camera()
+    try:
+        latest = camera.frame_hub.latest()
+        return jsonify({
+            'status': 'success',
+            'camera_type': camera.current_camera_type,
+            'capture_mode': camera.capture_mode if camera.current_camera_type == 'HIKERBOT' else 'polling',
+            'acquisition_frame_rate': camera.acquisition_frame_rate,
+            'pixel_format': pixel_format_name(camera.current_pixel_type) if camera.current_pixel_type is not None else None,
+            'roi': camera.roi,
+            'change_detection': camera.change_detector.get_stats(),
+            'sequence': camera.frame_hub.sequence,
+            'frame_age_ms': round((time.time() - latest.timestamp) * 1000, 2) if latest else None,
+            'virtual_camera': camera.camera.get_stats() if camera.current_camera_type == 'VIRTUAL' else None
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/set-change-detection', methods=['POST'])
+def set_change_detection():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        camera.change_detector.configure(
+            enabled=data.get('enabled'),
+            threshold=data.get('threshold'),  # mean grey-level difference on the thumbnail
+            focus_threshold=data.get('focusThreshold'),  # relative focus score change
+            max_interval=data.get('maxInterval')
+        )
+        return jsonify({'status': 'success', 'change_detection': camera.change_detector.get_stats()})
+    except Exception as e:
+        print(f"Error setting change detection: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/frame-correction', methods=['GET'])
+def get_frame_correction():
+    camera = _request_camera()
+    return jsonify({'status': 'success', 'correction': camera.frame_correction.get_status()})
+
+@app.route('/api/frame-correction/settings', methods=['POST'])
+def set_frame_correction():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        camera.frame_correction.configure(
+            enabled=data.get('enabled'),
+            average_frames=data.get('averageFrames'),  # 1 disables the running average
+            magnification=data.get('magnification')  # selects the stored dark/flat calibration
+        )
+        return jsonify({'status': 'success', 'correction': camera.frame_correction.get_status()})
+    except Exception as e:
+        print(f"Error setting frame correction: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/frame-correction/calibrate', methods=['POST'])
+def calibrate_frame_correction():
+    """Capture a dark frame (light path blocked) or flat field (blank, evenly lit field)"""
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        if not camera.is_recording:
+            return jsonify({'status': 'error', 'message': 'Camera is not running'}), 400
+        frames = int(data.get('frames', 16))
+        calibration = camera.frame_correction.start_calibration(
+            data.get('type', 'dark'), data.get('magnification'), frames
+        )
+        # Allow a few seconds per frame period on top of the frames themselves
+        timeout = 5.0 + frames / max(camera.acquisition_frame_rate, 1.0) * 2
+        result = camera.frame_correction.wait_for_calibration(calibration, timeout)
+        if result is None:
+            return jsonify({'status': 'error', 'message': 'Calibration timed out waiting for frames'}), 504
+        if result['status'] != 'success':
+            return jsonify(result), 500
+        result['correction'] = camera.frame_correction.get_status()
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error calibrating frame correction: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/frame-correction/clear', methods=['POST'])
+def clear_frame_correction():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        magnification = data.get('magnification') or camera.frame_correction.magnification
+        camera.frame_correction.clear(magnification, data.get('type'))
+        return jsonify({'status': 'success', 'correction': camera.frame_correction.get_status()})
+    except Exception as e:
+        print(f"Error clearing frame correction: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/frame-pool-stats', methods=['GET'])
+def get_frame_pool_stats():
+    camera = _request_camera()
+    try:
+        return jsonify({
+            'status': 'success',
+            'pool': camera.frame_pool.get_stats()
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/set-frame-pool-size', methods=['POST'])
+def set_frame_pool_size():
+    camera = _request_camera()
+    try:
+        data = request.get_json()
+        size = data.get('size')
+        if size is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'No pool size provided'
+            }), 400
+
+        if camera.set_frame_pool_size(size):
+            return jsonify({
+                'status': 'success',
+                'pool': camera.frame_pool.get_stats()
+            })
+        return jsonify({
+            'status': 'error',
+            'message': 'Failed to set frame pool size'
+        }), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @app.route('/api/snapshot', methods=['POST'])
 def take_snapshot():
+    camera = _request_camera()
     try:
-        data = request.get_json()
-        save_path = data.get('savePath') if data else None
+        data = request.get_json() or {}
+        save_path = data.get('savePath')
         magnification = data.get('magnification', '100x')  # Get magnification from request
+        image_format = data.get('format', 'jpg')  # 'jpg', 'png' or 'tiff'
+        quality = data.get('quality', 95)  # JPEG quality
+        source = data.get('source', 'raw')  # 'raw' (full resolution) or 'preview'
         
-        filepath = webcam.take_snapshot(save_path)
+        filepath, job = camera.take_snapshot(save_path, magnification, image_format, quality, source)
         if filepath:
-            # Modify the filename to include magnification
-            directory = os.path.dirname(filepath)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            new_filename = f"microscope_{magnification}_{timestamp}.jpg"
-            new_filepath = os.path.join(directory, new_filename)
-            
-            # Rename the file
-            os.rename(filepath, new_filepath)
-            
+            # The write finishes in the background, /api/get-image waits for it
             return jsonify({
                 'status': 'success',
-                'filepath': new_filepath
+                'filepath': filepath,
+                'job_id': job.id
             })
         return jsonify({
             'status': 'error',
@@ -608,14 +1718,274 @@ def take_snapshot():
             'message': str(e)
         }), 500
 
+@app.route('/api/snapshot-status/<int:job_id>', methods=['GET'])
+def get_snapshot_status(job_id):
+    camera = _request_camera()
+    job = camera.image_writer.get_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Snapshot job not found'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict()})
+
+@app.route('/api/burst/start', methods=['POST'])
+def start_burst():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        count = data.get('count')
+        if not count:
+            return jsonify({
+                'status': 'error',
+                'message': 'No frame count provided'
+            }), 400
+
+        status = camera.start_burst(
+            count=count,
+            interval=data.get('interval', 0.0),  # seconds between frames, 0 = burst
+            save_path=data.get('savePath'),
+            image_format=data.get('format', 'png'),
+            quality=data.get('quality', 95),
+            magnification=data.get('magnification', '100x'),
+            prefix=data.get('prefix', 'burst')
+        )
+        return jsonify({'status': 'success', 'sequence': status})
+    except (RuntimeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error starting burst capture: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/raw-recording/start', methods=['POST'])
+def start_raw_recording():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        status = camera.start_raw_recording(
+            save_path=data.get('savePath'),
+            segment_mb=data.get('segmentMb', 1024),  # preallocated size of each segment file
+            max_mb=data.get('maxMb'),  # stop automatically after this much data
+            preview_fps=data.get('previewFps', 10.0)  # live preview encoding rate while recording
+        )
+        return jsonify({'status': 'success', 'recording': status})
+    except (RuntimeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error starting raw recording: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/raw-recording/stop', methods=['POST'])
+def stop_raw_recording():
+    camera = _request_camera()
+    status = camera.stop_raw_recording()
+    if status is None:
+        return jsonify({'status': 'error', 'message': 'No raw recording'}), 404
+    return jsonify({'status': 'success', 'recording': status})
+
+@app.route('/api/raw-recording/status', methods=['GET'])
+def get_raw_recording_status():
+    camera = _request_camera()
+    recorder = camera.raw_recorder
+    return jsonify({'status': 'success', 'recording': recorder.get_status() if recorder else None})
+
+@app.route('/api/video-recording/start', methods=['POST'])
+def start_video_recording():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        status = camera.start_video_recording(
+            save_path=data.get('savePath'),
+            codec=data.get('codec', 'MJPG'),  # MJPG/XVID (.avi), mp4v/avc1/H264 (.mp4)
+            fps=data.get('fps'),  # defaults to the camera rate, capped at 30
+            scale=data.get('scale', 1.0),
+            source=data.get('source', 'preview'),  # 'raw' records the full-resolution frame
+            max_queue=data.get('maxQueue', 32)  # frames buffered before drops
+        )
+        return jsonify({'status': 'success', 'recording': status})
+    except (RuntimeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error starting video recording: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/video-recording/stop', methods=['POST'])
+def stop_video_recording():
+    camera = _request_camera()
+    status = camera.stop_video_recording()
+    if status is None:
+        return jsonify({'status': 'error', 'message': 'No video recording'}), 404
+    return jsonify({'status': 'success', 'recording': status})
+
+@app.route('/api/video-recording/status', methods=['GET'])
+def get_video_recording_status():
+    camera = _request_camera()
+    recorder = camera.video_recorder
+    return jsonify({'status': 'success', 'recording': recorder.get_status() if recorder else None})
+
+@app.route('/api/raw-recording/info', methods=['GET'])
+def get_raw_recording_info():
+    """Frame count, size, format, duration and rate of a recording directory"""
+    try:
+        recording = RawRecording(request.args.get('path', ''))
+        return jsonify({'status': 'success', 'recording': recording.get_info()})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        print(f"Error reading raw recording: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/raw-recording/frame', methods=['GET'])
+def get_raw_recording_frame():
+    """One recorded frame as PNG (16-bit where recorded deeper than 8 bits)"""
+    try:
+        recording = RawRecording(request.args.get('path', ''))
+        index = int(request.args.get('index', 0))
+        if not 0 <= index < len(recording):
+            return jsonify({'status': 'error', 'message': f"Frame {index} out of range"}), 404
+        ret, buffer = cv2.imencode('.png', recording.decode(index), [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if not ret:
+            return jsonify({'status': 'error', 'message': 'Failed to encode frame'}), 500
+        return Response(buffer.tobytes(), mimetype='image/png')
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        print(f"Error reading raw frame: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/raw-recording/export', methods=['POST'])
+def export_raw_recording():
+    """Export frames [start, stop) to an MJPG AVI (`output` file) or PNGs (`output` directory)"""
+    try:
+        data = request.get_json() or {}
+        recording = RawRecording(data.get('path', ''))
+        export_format = data.get('format', 'avi')
+        output = data.get('output')
+        start, stop = data.get('start', 0), data.get('stop')
+        if export_format == 'avi':
+            output = output or os.path.splitext(os.path.normpath(recording.directory))[0] + '.avi'
+            count = recording.export_avi(output, start, stop, data.get('fps'))
+            return jsonify({'status': 'success', 'output': output, 'frames': count})
+        if export_format == 'png':
+            output = output or os.path.splitext(os.path.normpath(recording.directory))[0] + '_png'
+            files = recording.export_png(output, start, stop)
+            return jsonify({'status': 'success', 'output': output, 'frames': len(files)})
+        return jsonify({'status': 'error', 'message': f"Unsupported export format: {export_format}"}), 400
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error exporting raw recording: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/focus-stack', methods=['POST'])
+def focus_stack():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        files = data.get('files')
+        if data.get('source') == 'burst':
+            # Stack the files written by the last burst capture
+            if camera.burst is None or camera.burst.is_running():
+                return jsonify({
+                    'status': 'error',
+                    'message': 'No finished burst capture to stack'
+                }), 400
+            files = camera.burst.get_status()['files']
+
+        result = camera.focus_stack(
+            files=files,
+            count=data.get('count', 0),  # live frames to stack when no files are given
+            save_path=data.get('savePath'),
+            image_format=data.get('format', 'tiff'),
+            quality=data.get('quality', 95),
+            magnification=data.get('magnification', '100x'),
+            window=data.get('window', 9),
+            save_depth_map=data.get('saveDepthMap', False)
+        )
+        return jsonify(dict(result, status='success'))
+    except (RuntimeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error in focus stacking: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/burst/status', methods=['GET'])
+def get_burst_status():
+    camera = _request_camera()
+    if camera.burst is None:
+        return jsonify({'status': 'error', 'message': 'No capture sequence started'}), 404
+    return jsonify({
+        'status': 'success',
+        'sequence': camera.burst.get_status(),
+        'writer': camera.image_writer.get_stats()
+    })
+
+@app.route('/api/burst/stop', methods=['POST'])
+def stop_burst():
+    camera = _request_camera()
+    status = camera.stop_burst()
+    if status is None:
+        return jsonify({'status': 'error', 'message': 'No capture sequence started'}), 404
+    return jsonify({'status': 'success', 'sequence': status})
+
+# Results of the image processing routes are written on their own pool, so a
+# slow PNG encode doesn't hold up the request that produced the image
+output_writer = ImageWriter(workers=2, max_queue=8)
+
+def _write_output(path, image, params=None):
+    """
+    Queue a processed image for writing and return its WriteJob. PNGs get
+    maximum compression and JPEGs quality 100 unless params are given. If the
+    queue stays full the image is written inline and None is returned.
+    """
+    if params is None:
+        if path.lower().endswith('.png'):
+            params = [cv2.IMWRITE_PNG_COMPRESSION, 9]
+        else:
+            params = [int(cv2.IMWRITE_JPEG_QUALITY), 100]
+    job = output_writer.submit(image, path, params, timeout=5.0)
+    if job is None:
+        print(f"Output writer queue full, writing {path} inline")
+        cv2.imwrite(path, image, params)
+    return job
+
+def _wait_for_writes(path, timeout=30.0):
+    """Wait for queued snapshot, sequence and processed image writes to path"""
+    for camera in devices.managers():
+        camera.image_writer.wait_for_path(path, timeout)
+    output_writer.wait_for_path(path, timeout)
+
+def _output_ready(path, timeout=30.0):
+    """True once path exists on disk, after waiting for any queued write to it"""
+    _wait_for_writes(path, timeout)
+    return os.path.exists(path)
+
+@app.route('/api/output-status/<int:job_id>', methods=['GET'])
+def get_output_status(job_id):
+    job = output_writer.get_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Output job not found'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict(), 'writer': output_writer.get_stats()})
+
 @app.route('/api/get-image')
 def get_image():
     try:
         image_path = request.args.get('path')
         if not image_path:
             return jsonify({'error': 'No path provided'}), 400
-        
-        if not os.path.exists(image_path):
+
+        # A processed image that is still queued is served from memory, in the
+        # target's own format so the UI shows what will land on disk
+        job = output_writer.get_pending(image_path)
+        image = job.image if job is not None else None
+        ext = os.path.splitext(image_path)[1].lower()
+        if image is not None and ext in OUTPUT_EXTENSIONS:
+            # Fast PNG compression, the pixels are the same as at level 9
+            params = [cv2.IMWRITE_PNG_COMPRESSION, 1] if ext == '.png' else job.params
+            ret, buffer = cv2.imencode(ext, image, params)
+            if ret:
+                mimetype = mimetypes.guess_type(image_path)[0] or 'application/octet-stream'
+                return Response(buffer.tobytes(), mimetype=mimetype)
+
+        # A snapshot or filter result may still be on its way to disk
+        if not _output_ready(image_path):
             return jsonify({'error': 'Image not found'}), 404
 
         return send_file(image_path, mimetype='image/jpeg')
@@ -697,13 +2067,13 @@ def rotate_image():
         image_path = data.get('imagePath')
         direction = data.get('direction', 'clockwise')
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
@@ -717,11 +2087,12 @@ def rotate_image():
 
         # Save to temp directory
         temp_path = webcam.get_temp_path(image_path, 'rotated')
-        cv2.imwrite(temp_path, rotated_img, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        job = _write_output(temp_path, rotated_img, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
         
         return jsonify({
             'status': 'success',
-            'filepath': temp_path
+            'filepath': temp_path,
+            'job_id': job.id if job else None
         })
         
     except Exception as e:
@@ -742,7 +2113,7 @@ def flip_image():
         
         print(f"Processing flip: {direction} for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
@@ -750,7 +2121,7 @@ def flip_image():
             }), 404
 
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
@@ -772,12 +2143,13 @@ def flip_image():
         
         print(f"Saving flipped image to: {new_path}")
         # Save with original quality
-        cv2.imwrite(new_path, flipped_img, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        job = _write_output(new_path, flipped_img, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
         
         print("Flip completed successfully")
         return jsonify({
             'status': 'success',
-            'filepath': new_path
+            'filepath': new_path,
+            'job_id': job.id if job else None
         })
         
     except Exception as e:
@@ -790,6 +2162,7 @@ def flip_image():
 
 @app.route('/api/set-camera-resolution', methods=['POST'])
 def set_camera_resolution():
+    camera = _request_camera()
     try:
         data = request.get_json()
         resolution = data.get('resolution')  # This will be like "1920x1080"
@@ -802,7 +2175,7 @@ def set_camera_resolution():
 
         width, height = map(int, resolution.split('x'))
         
-        if webcam.set_resolution(width, height):
+        if camera.set_resolution(width, height):
             return jsonify({'status': 'success'})
         else:
             return jsonify({
@@ -816,6 +2189,165 @@ def set_camera_resolution():
             'message': str(e)
         }), 500
 
+@app.route('/api/get-camera-settings', methods=['GET'])
+def get_camera_settings():
+    """Cached camera parameters; ?refresh=1 reads every node from the camera again"""
+    camera = _request_camera()
+    try:
+        if not camera.is_recording:
+            return jsonify({'status': 'error', 'message': 'camera not initialized'}), 400
+        refresh = request.args.get('refresh', 'false').lower() in ('1', 'true', 'yes')
+        return jsonify(dict(camera.settings.get(refresh), status='success'))
+    except Exception as e:
+        print(f"Error reading camera settings: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/update-camera-setting', methods=['POST'])
+def update_camera_setting():
+    """
+    Queue {setting, value} or {settings: {...}}. Returns at once with the
+    version that will contain the change; `wait: true` blocks until it has
+    been applied (up to one second).
+    """
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        if not camera.is_recording:
+            return jsonify({'status': 'error', 'message': 'camera not initialized'}), 400
+        changes = dict(data.get('settings') or {})
+        if data.get('setting'):
+            changes[data['setting']] = data.get('value')
+        if not changes:
+            return jsonify({'status': 'error', 'message': 'No setting provided'}), 400
+
+        version = camera.settings.update(changes)
+        applied = camera.settings.wait_for_version(version) if data.get('wait') else False
+        result = camera.settings.get_snapshot()
+        errors = {key: result['errors'][key] for key in changes if key in result['errors']}
+        if applied and errors:
+            return jsonify(dict(result, status='error', message='; '.join(errors.values()),
+                                update_version=version)), 400
+        return jsonify(dict(result, status='success', update_version=version, applied=applied))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error updating camera setting: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/set-camera-roi', methods=['POST'])
+def set_camera_roi():
+    camera = _request_camera()
+    try:
+        data = request.get_json() or {}
+        missing = [key for key in ('x', 'y', 'width', 'height') if key not in data]
+        if missing:
+            return jsonify({
+                'status': 'error',
+                'message': f"Missing ROI fields: {', '.join(missing)}"
+            }), 400
+
+        mode = data.get('mode', 'auto')
+        if mode not in ('auto', 'sensor', 'host'):
+            return jsonify({'status': 'error', 'message': f'Invalid ROI mode: {mode}'}), 400
+
+        report = camera.set_roi(
+            data['x'], data['y'], data['width'], data['height'],
+            binning=data.get('binning', 1),
+            binning_mode=data.get('binningMode', 'binning'),
+            mode=mode
+        )
+        if report is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Failed to set ROI (camera not started or ROI rejected)'
+            }), 400
+        return jsonify({'status': 'success', 'roi': report})
+    except Exception as e:
+        print(f"Error setting camera ROI: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/camera-roi', methods=['GET'])
+def get_camera_roi():
+    camera = _request_camera()
+    return jsonify({
+        'status': 'success',
+        'roi': camera.roi,
+        'acquisition_frame_rate': camera.acquisition_frame_rate
+    })
+
+@app.route('/api/clear-camera-roi', methods=['POST'])
+def clear_camera_roi():
+    camera = _request_camera()
+    if camera.clear_roi():
+        return jsonify({'status': 'success', 'acquisition_frame_rate': camera.acquisition_frame_rate})
+    return jsonify({'status': 'error', 'message': 'Failed to clear ROI'}), 500
+
+@app.route('/api/image-cache', methods=['GET'])
+def get_image_cache_stats():
+    return jsonify({'status': 'success', 'cache': image_cache.get_stats()})
+
+@app.route('/api/image-cache/settings', methods=['POST'])
+def set_image_cache_settings():
+    try:
+        data = request.get_json() or {}
+        max_mb = data.get('maxMb')
+        if max_mb is None or float(max_mb) < 0:
+            return jsonify({'status': 'error', 'message': 'No valid cache size provided'}), 400
+        image_cache.set_max_bytes(float(max_mb) * (1 << 20))
+        return jsonify({'status': 'success', 'cache': image_cache.get_stats()})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/image-cache/clear', methods=['POST'])
+def clear_image_cache():
+    data = request.get_json(silent=True) or {}
+    image_cache.invalidate(data.get('path'))
+    if data.get('resetStats'):
+        image_cache.reset_stats()
+    return jsonify({'status': 'success', 'cache': image_cache.get_stats()})
+
+# Encoders for filter previews: extension, quality flag, MIME type
+PREVIEW_FORMATS = {
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY, 'image/jpeg'),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY, 'image/webp')
+}
+
+def _filter_preview(data, image_path, op, params):
+    """
+    Interactive preview for the filter routes (`preview: true`).
+    The filter runs on a cached copy of the image that fits the viewport
+    (`maxWidth` x `maxHeight`, rounded up to 128 px so resizes reuse it) with
+    kernel sizes scaled to the copy, and the encoded image is returned in
+    the response; no file is written.
+    """
+    try:
+        start = time.perf_counter()
+        image_format = data.get('previewFormat', 'jpeg')
+        if image_format not in PREVIEW_FORMATS:
+            return jsonify({'status': 'error', 'message': f"Unsupported preview format: {image_format}"}), 400
+        max_width = -(-max(int(data.get('maxWidth', 1280)), 64) // 128) * 128
+        max_height = -(-max(int(data.get('maxHeight', 1280)), 64) // 128) * 128
+        full = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
+        if full is None:
+            return jsonify({'status': 'error', 'message': 'Failed to read image'}), 500
+        image = image_cache.downscaled(image_path, max_width, max_height, cv2.IMREAD_UNCHANGED)
+        scale = image.shape[1] / full.shape[1]
+
+        result = image_filters.apply_filter(image, op, params, scale)
+        ext, quality_flag, mimetype = PREVIEW_FORMATS[image_format]
+        quality = min(max(int(data.get('quality', 80)), 10), 100)
+        ret, buffer = cv2.imencode(ext, result, [int(quality_flag), quality])
+        if not ret:
+            return jsonify({'status': 'error', 'message': 'Failed to encode preview'}), 500
+
+        response = Response(buffer.tobytes(), mimetype=mimetype)
+        response.headers['X-Render-Ms'] = f"{(time.perf_counter() - start) * 1000:.2f}"
+        response.headers['X-Preview-Scale'] = f"{scale:.4f}"
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
 @app.route('/api/lowpass-filter', methods=['POST'])
 def apply_lowpass_filter():
     try:
@@ -829,15 +2361,18 @@ def apply_lowpass_filter():
         
         print(f"Processing low pass filter for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
+        if data.get('preview'):
+            return _filter_preview(data, image_path, 'lowpass', {'kernelSize': kernel_size, 'sigma': sigma})
+
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
@@ -849,10 +2384,7 @@ def apply_lowpass_filter():
             kernel_size += 1
 
         # Apply Gaussian blur (low pass filter)
-        filtered_img = cv2.GaussianBlur(img, (kernel_size, kernel_size), sigma)
-
-        # Determine output format based on original image
-        output_format = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
+        filtered_img = image_filters.lowpass(img, kernel_size, sigma)
 
         # Save with new filename
         directory = os.path.dirname(image_path)
@@ -863,16 +2395,14 @@ def apply_lowpass_filter():
         
         print(f"Saving filtered image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, filtered_img, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, filtered_img, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, filtered_img)
         
         print("Low pass filter completed successfully")
         return jsonify({
             'status': 'success',
             'filepath': new_path,
+            'job_id': job.id if job else None,
             'kernel_size': kernel_size,
             'sigma': sigma
         })
@@ -897,15 +2427,18 @@ def apply_median_filter():
         
         print(f"Processing median filter for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
+        if data.get('preview'):
+            return _filter_preview(data, image_path, 'median', {'kernelSize': kernel_size})
+
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
@@ -917,10 +2450,7 @@ def apply_median_filter():
             kernel_size += 1
 
         # Apply Median blur
-        filtered_img = cv2.medianBlur(img, kernel_size)
-
-        # Determine output format based on original image
-        output_format = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
+        filtered_img = image_filters.median(img, kernel_size)
 
         # Save with new filename
         directory = os.path.dirname(image_path)
@@ -931,16 +2461,14 @@ def apply_median_filter():
         
         print(f"Saving filtered image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, filtered_img, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, filtered_img, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, filtered_img)
         
         print("Median filter completed successfully")
         return jsonify({
             'status': 'success',
             'filepath': new_path,
+            'job_id': job.id if job else None,
             'kernel_size': kernel_size
         })
         
@@ -966,43 +2494,39 @@ def apply_edge_detect():
         
         print(f"Processing edge detection for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
+        if data.get('preview'):
+            return _filter_preview(data, image_path, 'edge-detect', {
+                'lowThreshold': low_threshold,
+                'highThreshold': high_threshold,
+                'blurKernel': blur_kernel
+            })
+
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to read image'
             }), 500
 
-        # Convert to grayscale if image is color
-        if len(img.shape) == 3:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = img
-
         # Ensure blur kernel is odd
         if blur_kernel % 2 == 0:
             blur_kernel += 1
 
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (blur_kernel, blur_kernel), 0)
-        
-        # Apply Canny edge detection
-        edges = cv2.Canny(blurred, low_threshold, high_threshold)
+        # Canny on the blurred grey image (grey version comes from the cache)
+        edges = image_filters.edge_detect(image_cache.gray(image_path, cv2.IMREAD_UNCHANGED),
+                                          low_threshold, high_threshold, blur_kernel)
         
         # Convert back to BGR for saving
         edges_bgr = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
 
-        # Determine output format based on original image
-        output_format = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
-
         # Save with new filename
         directory = os.path.dirname(image_path)
         filename = os.path.basename(image_path)
@@ -1012,16 +2536,14 @@ def apply_edge_detect():
         
         print(f"Saving edge detected image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, edges_bgr, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, edges_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, edges_bgr)
         
         print("Edge detection completed successfully")
         return jsonify({
             'status': 'success',
             'filepath': new_path,
+            'job_id': job.id if job else None,
             'low_threshold': low_threshold,
             'high_threshold': high_threshold,
             'blur_kernel': blur_kernel
@@ -1047,44 +2569,27 @@ def apply_edge_emphasis():
         
         print(f"Processing edge emphasis for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
+        if data.get('preview'):
+            return _filter_preview(data, image_path, 'edge-emphasis', {'strength': strength})
+
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to read image'
             }), 500
 
-        # Convert to float32 for processing
-        img_float = img.astype(np.float32) / 255.0
-
-        # Create Laplacian kernel for edge detection
-        kernel = np.array([[0, -1, 0],
-                          [-1, 4, -1],
-                          [0, -1, 0]], dtype=np.float32)
-
-        # Apply edge detection
-        edges = cv2.filter2D(img_float, -1, kernel)
-        
-        # Add edges to original image with controlled strength
-        emphasized = img_float + (edges * strength)
-        
-        # Ensure values stay within valid range
-        emphasized = np.clip(emphasized, 0, 1)
-        
-        # Convert back to uint8
-        emphasized = (emphasized * 255).astype(np.uint8)
+        # Add the Laplacian edges to the image with controlled strength
+        emphasized = image_filters.edge_emphasis(img, strength)
 
-        # Determine output format based on original image
-        output_format = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
-        
         # Save with new filename
         directory = os.path.dirname(image_path)
         filename = os.path.basename(image_path)
@@ -1094,16 +2599,14 @@ def apply_edge_emphasis():
         
         print(f"Saving edge emphasized image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, emphasized, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, emphasized, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, emphasized)
         
         print("Edge emphasis completed successfully")
         return jsonify({
             'status': 'success',
-            'filepath': new_path
+            'filepath': new_path,
+            'job_id': job.id if job else None
         })
         
     except Exception as e:
@@ -1125,15 +2628,18 @@ def apply_grayscale():
         
         print(f"Processing grayscale for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
+        if data.get('preview'):
+            return _filter_preview(data, image_path, 'grayscale', {})
+
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
@@ -1141,14 +2647,11 @@ def apply_grayscale():
             }), 500
 
         # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = image_cache.gray(image_path, cv2.IMREAD_UNCHANGED)
 
         # Convert back to BGR for saving
         gray_bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
 
-        # Determine output format based on original image
-        output_format = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
-
         # Save with new filename
         directory = os.path.dirname(image_path)
         filename = os.path.basename(image_path)
@@ -1158,16 +2661,14 @@ def apply_grayscale():
         
         print(f"Saving grayscale image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, gray_bgr, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, gray_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, gray_bgr)
         
         print("Grayscale completed successfully")
         return jsonify({
             'status': 'success',
-            'filepath': new_path
+            'filepath': new_path,
+            'job_id': job.id if job else None
         })
         
     except Exception as e:
@@ -1189,15 +2690,18 @@ def apply_invert():
         
         print(f"Processing invert for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
+        if data.get('preview'):
+            return _filter_preview(data, image_path, 'invert', {})
+
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
@@ -1205,10 +2709,7 @@ def apply_invert():
             }), 500
 
         # Invert the image
-        inverted = cv2.bitwise_not(img)
-
-        # Determine output format based on original image
-        output_format = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
+        inverted = image_filters.invert(img)
 
         # Save with new filename
         directory = os.path.dirname(image_path)
@@ -1219,16 +2720,14 @@ def apply_invert():
         
         print(f"Saving inverted image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, inverted, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, inverted, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, inverted)
         
         print("Invert completed successfully")
         return jsonify({
             'status': 'success',
-            'filepath': new_path
+            'filepath': new_path,
+            'job_id': job.id if job else None
         })
         
     except Exception as e:
@@ -1251,59 +2750,30 @@ def apply_thin():
         
         print(f"Processing thin for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
+        if data.get('preview'):
+            return _filter_preview(data, image_path, 'thin', {'method': method})
+
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to read image'
             }), 500
 
-        # Convert to grayscale if image is color
-        if len(img.shape) == 3:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = img
-
-        # Apply Otsu's thresholding to get binary image
-        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        if method == 'skeleton':
-            # True skeletonization using morphological operations
-            skeleton = np.zeros(binary.shape, dtype=np.uint8)
-            element = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
-            
-            while True:
-                eroded = cv2.erode(binary, element)
-                temp = cv2.dilate(eroded, element)
-                temp = cv2.subtract(binary, temp)
-                skeleton = cv2.bitwise_or(skeleton, temp)
-                binary = eroded.copy()
-                
-                if cv2.countNonZero(binary) == 0:
-                    break
-                    
-            thinned = skeleton
-        else:
-            # Morphological opening (original behavior)
-            kernel = np.ones((3, 3), np.uint8)
-            eroded = cv2.erode(binary, kernel, iterations=1)
-            dilated = cv2.dilate(eroded, kernel, iterations=1)
-            thinned = dilated
+        # Skeleton (or morphological opening) of the Otsu-thresholded grey image
+        thinned = image_filters.thin(image_cache.gray(image_path, cv2.IMREAD_UNCHANGED), method)
 
         # Convert back to BGR for saving
         thinned_bgr = cv2.cvtColor(thinned, cv2.COLOR_GRAY2BGR)
 
-        # Determine output format based on original image
-        output_format = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
-
         # Save with new filename
         directory = os.path.dirname(image_path)
         filename = os.path.basename(image_path)
@@ -1313,16 +2783,14 @@ def apply_thin():
         
         print(f"Saving thinned image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, thinned_bgr, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, thinned_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, thinned_bgr)
         
         print("Thin completed successfully")
         return jsonify({
             'status': 'success',
             'filepath': new_path,
+            'job_id': job.id if job else None,
             'method_used': method
         })
         
@@ -1334,6 +2802,225 @@ def apply_thin():
             'message': str(e)
         }), 500
 
+# Extensions cv2.imwrite is asked to produce for processed images
+OUTPUT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+
+def _check_output_path(path):
+    """Error message for a requested outputPath that can't be written, None if it is usable"""
+    if os.path.splitext(path)[1].lower() not in OUTPUT_EXTENSIONS:
+        return f"Unsupported output format: {os.path.basename(path)}. Use: {', '.join(OUTPUT_EXTENSIONS)}"
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        return f"Output directory not found: {directory}"
+    return None
+
+@app.route('/api/pipeline', methods=['POST'])
+def apply_pipeline():
+    """
+    Run an ordered list of filters on one decode of the image, in memory.
+    Only the final result is written (or returned inline with previewOnly),
+    instead of one round-trip and one intermediate file per filter.
+    """
+    try:
+        start = time.perf_counter()
+        data = request.get_json() or {}
+        image_path = data.get('imagePath')
+        steps = data.get('steps') or []
+        preview_only = bool(data.get('previewOnly', False))
+
+        if not image_path or not _output_ready(image_path):
+            return jsonify({'status': 'error', 'message': 'Image not found'}), 404
+        if not steps:
+            return jsonify({'status': 'error', 'message': 'No pipeline steps provided'}), 400
+        if not isinstance(steps, list):
+            return jsonify({'status': 'error', 'message': 'steps must be a list of operations'}), 400
+        for step in steps:
+            if not isinstance(step, dict):
+                return jsonify({
+                    'status': 'error',
+                    'message': f"Each step must be an object with an 'op', got: {step!r}"
+                }), 400
+            if step.get('op') not in image_filters.FILTERS:
+                return jsonify({
+                    'status': 'error',
+                    'message': f"Unknown operation: {step.get('op')}. Use: {', '.join(image_filters.FILTERS)}"
+                }), 400
+        output_path = data.get('outputPath')
+        if output_path and not preview_only:
+            message = _check_output_path(output_path)
+            if message:
+                return jsonify({'status': 'error', 'message': message}), 400
+
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
+        if img is None:
+            return jsonify({'status': 'error', 'message': 'Failed to read image'}), 500
+        read_ms = (time.perf_counter() - start) * 1000
+
+        timings = []
+        for step in steps:
+            step_start = time.perf_counter()
+            try:
+                img = image_filters.apply_filter(img, step['op'], {k: v for k, v in step.items() if k != 'op'})
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e), 'steps': timings}), 400
+            timings.append({'op': step['op'], 'ms': round((time.perf_counter() - step_start) * 1000, 2)})
+
+        result = {
+            'status': 'success',
+            'filepath': None,
+            'width': img.shape[1],
+            'height': img.shape[0],
+            'steps': timings,
+            'read_ms': round(read_ms, 2)
+        }
+        write_start = time.perf_counter()
+        if preview_only:
+            ret, buffer = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), int(data.get('quality', 90))])
+            if not ret:
+                return jsonify({'status': 'error', 'message': 'Failed to encode result'}), 500
+            result['image'] = base64.b64encode(buffer).decode('utf-8')
+        else:
+            name, ext = os.path.splitext(os.path.basename(image_path))
+            suffix = '_'.join(step['op'].replace('-', '') for step in steps)
+            new_path = output_path or os.path.join(os.path.dirname(image_path), f"{name}_{suffix}{ext}")
+            job = _write_output(new_path, img)
+            result['filepath'] = new_path
+            result['job_id'] = job.id if job else None
+        result['write_ms'] = round((time.perf_counter() - write_start) * 1000, 2)
+        result['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Error during pipeline: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+# Non-destructive edit stacks for images opened in the editor
+edit_sessions = EditSessions(image_cache)
+
+def _edit_session_response(session, status=200):
+    return jsonify({'status': 'success', 'session': session.get_state()}), status
+
+@app.route('/api/edit-session', methods=['POST'])
+def open_edit_session():
+    try:
+        data = request.get_json() or {}
+        image_path = data.get('imagePath')
+        if not image_path or not _output_ready(image_path):
+            return jsonify({'status': 'error', 'message': 'Image not found'}), 404
+        session = edit_sessions.open(image_path)
+        return _edit_session_response(session)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        print(f"Error opening edit session: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/edit-session/<int:session_id>', methods=['GET'])
+def get_edit_session(session_id):
+    session = edit_sessions.get(session_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Edit session not found'}), 404
+    return _edit_session_response(session)
+
+@app.route('/api/edit-session/<int:session_id>/apply', methods=['POST'])
+def apply_edit(session_id):
+    """Push one operation ({op, ...params} as in /api/pipeline) onto the stack"""
+    session = edit_sessions.get(session_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Edit session not found'}), 404
+    try:
+        data = request.get_json() or {}
+        session.push(data.get('op'), {k: v for k, v in data.items() if k != 'op'})
+        return _edit_session_response(session)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+@app.route('/api/edit-session/<int:session_id>/undo', methods=['POST'])
+def undo_edit(session_id):
+    session = edit_sessions.get(session_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Edit session not found'}), 404
+    session.undo()
+    return _edit_session_response(session)
+
+@app.route('/api/edit-session/<int:session_id>/redo', methods=['POST'])
+def redo_edit(session_id):
+    session = edit_sessions.get(session_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Edit session not found'}), 404
+    session.redo()
+    return _edit_session_response(session)
+
+@app.route('/api/edit-session/<int:session_id>/preview', methods=['GET'])
+def get_edit_preview(session_id):
+    """Current state as a JPEG no larger than maxSize pixels on the long side"""
+    session = edit_sessions.get(session_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Edit session not found'}), 404
+    try:
+        start = time.perf_counter()
+        image = session.render_preview(max(64, int(request.args.get('maxSize', 1280))))
+        quality = min(max(int(request.args.get('quality', 85)), 10), 100)
+        ret, buffer = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not ret:
+            return jsonify({'status': 'error', 'message': 'Failed to encode preview'}), 500
+        response = Response(buffer.tobytes(), mimetype='image/jpeg')
+        response.headers['X-Render-Ms'] = f"{(time.perf_counter() - start) * 1000:.2f}"
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error rendering edit preview: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/edit-session/<int:session_id>/save', methods=['POST'])
+def save_edit_session(session_id):
+    """Render the stack at full resolution once and write it to the main directory"""
+    session = edit_sessions.get(session_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': 'Edit session not found'}), 404
+    try:
+        data = request.get_json(silent=True) or {}
+        if data.get('outputPath'):
+            message = _check_output_path(data['outputPath'])
+            if message:
+                return jsonify({'status': 'error', 'message': message}), 400
+        start = time.perf_counter()
+        image = session.render_full()
+        render_ms = (time.perf_counter() - start) * 1000
+
+        new_path = data.get('outputPath')
+        if not new_path:
+            name, ext = os.path.splitext(os.path.basename(session.image_path))
+            save_path = webcam.get_current_save_path()
+            os.makedirs(save_path, exist_ok=True)
+            new_path = os.path.join(save_path, f"{name}_edited{ext}")
+        job = _write_output(new_path, image)
+        session.saved_path = new_path
+        return jsonify({
+            'status': 'success',
+            'filepath': new_path,
+            'job_id': job.id if job else None,
+            'render_ms': round(render_ms, 2),
+            'total_ms': round((time.perf_counter() - start) * 1000, 2),
+            'session': session.get_state()
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error saving edit session: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/edit-session/<int:session_id>/close', methods=['POST'])
+def close_edit_session(session_id):
+    if not edit_sessions.close(session_id):
+        return jsonify({'status': 'error', 'message': 'Edit session not found'}), 404
+    return jsonify({'status': 'success'})
+
 @app.route('/api/image-splice', methods=['POST'])
 def apply_image_splice():
     try:
@@ -1357,13 +3044,13 @@ def apply_image_splice():
         # Read all images
         images = []
         for path in image_paths:
-            if not os.path.exists(path):
+            if not _output_ready(path):
                 return jsonify({
                     'status': 'error',
                     'message': f'Image not found: {path}'
                 }), 404
 
-            img = cv2.imread(path)
+            img = image_cache.read(path)
             if img is None:
                 return jsonify({
                     'status': 'error',
@@ -1438,9 +3125,6 @@ def apply_image_splice():
                 'message': 'Invalid method. Use: concatenate, blend, or seamless'
             }), 400
 
-        # Determine output format based on first image
-        output_format = 'PNG' if image_paths[0].lower().endswith('.png') else 'JPEG'
-
         # Save with new filename
         directory = os.path.dirname(image_paths[0])
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -1449,16 +3133,14 @@ def apply_image_splice():
         
         print(f"Saving spliced image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, result, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, result, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, result)
         
         print("Image splice completed successfully")
         return jsonify({
             'status': 'success',
             'filepath': new_path,
+            'job_id': job.id if job else None,
             'method_used': method,
             'direction': direction
         })
@@ -1484,56 +3166,33 @@ def apply_image_sharpen():
         
         print(f"Processing image sharpen for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
+        if data.get('preview'):
+            return _filter_preview(data, image_path, 'sharpen', {'strength': strength, 'method': method})
+
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to read image'
             }), 500
 
-        # Convert to float32 for processing
-        img_float = img.astype(np.float32) / 255.0
-
-        if method == 'unsharp':
-            # Unsharp mask method
-            blurred = cv2.GaussianBlur(img_float, (0, 0), 2.0)
-            mask = img_float - blurred
-            sharpened = img_float + (mask * strength)
-        elif method == 'laplacian':
-            # Laplacian sharpening
-            kernel = np.array([[0, -1, 0],
-                              [-1, 4, -1],
-                              [0, -1, 0]], dtype=np.float32)
-            laplacian = cv2.filter2D(img_float, -1, kernel)
-            sharpened = img_float + (laplacian * strength)
-        elif method == 'gaussian':
-            # Gaussian high-pass filter
-            blurred = cv2.GaussianBlur(img_float, (0, 0), 1.0)
-            high_pass = img_float - blurred
-            sharpened = img_float + (high_pass * strength)
-        else:
+        # Unsharp mask, Laplacian or Gaussian high-pass sharpening
+        try:
+            sharpened = image_filters.sharpen(img, strength, method)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'Invalid method. Use: unsharp, laplacian, or gaussian'
+                'message': str(e)
             }), 400
 
-        # Ensure values stay within valid range
-        sharpened = np.clip(sharpened, 0, 1)
-        
-        # Convert back to uint8
-        sharpened = (sharpened * 255).astype(np.uint8)
-
-        # Determine output format based on original image
-        output_format = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
-
         # Save with new filename
         directory = os.path.dirname(image_path)
         filename = os.path.basename(image_path)
@@ -1543,16 +3202,14 @@ def apply_image_sharpen():
         
         print(f"Saving sharpened image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, sharpened, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, sharpened, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, sharpened)
         
         print("Image sharpen completed successfully")
         return jsonify({
             'status': 'success',
             'filepath': new_path,
+            'job_id': job.id if job else None,
             'method_used': method,
             'strength_used': strength
         })
@@ -1586,13 +3243,13 @@ def apply_image_stitch():
         # Read images with OpenCV
         images = []
         for img_path in image_paths:
-            if not os.path.exists(img_path):
+            if not _output_ready(img_path):
                 return jsonify({
                     'status': 'error',
                     'message': f'Image not found: {img_path}'
                 }), 404
                 
-            img = cv2.imread(img_path, cv2.IMREAD_UNCHANGED)
+            img = image_cache.read(img_path, cv2.IMREAD_UNCHANGED)
             if img is None:
                 return jsonify({
                     'status': 'error',
@@ -1691,9 +3348,6 @@ def apply_image_stitch():
             for i in range(1, len(resized_images)):
                 stitched_img = cv2.addWeighted(stitched_img, 0.5, resized_images[i], 0.5, 0)
 
-        # Determine output format based on first image
-        output_format = 'PNG' if image_paths[0].lower().endswith('.png') else 'JPEG'
-
         # Save with new filename
         directory = os.path.dirname(image_paths[0])
         filename = os.path.basename(image_paths[0])
@@ -1703,16 +3357,14 @@ def apply_image_stitch():
         
         print(f"Saving stitched image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, stitched_img, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, stitched_img, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, stitched_img)
         
         print("Image stitch completed successfully")
         return jsonify({
             'status': 'success',
             'filepath': new_path,
+            'job_id': job.id if job else None,
             'method_used': method
         })
         
@@ -1778,53 +3430,41 @@ def apply_threshold():
         
         print(f"Processing threshold for image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found at path: {image_path}")
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
             }), 404
 
+        if data.get('preview'):
+            return _filter_preview(data, image_path, 'threshold',
+                                   {'type': threshold_type, 'threshold': threshold_value})
+
         # Read image with OpenCV
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        img = image_cache.read(image_path, cv2.IMREAD_UNCHANGED)
         if img is None:
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to read image'
             }), 500
 
-        # Convert to grayscale if image is color
-        if len(img.shape) == 3:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = img
-
-        # Apply thresholding based on type
-        if threshold_type == 'otsu':
-            # Apply Gaussian blur to reduce noise
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-            _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        elif threshold_type == 'binary':
-            if threshold_value is None:
-                threshold_value = 127  # Default threshold
-            _, thresh = cv2.threshold(gray, threshold_value, 255, cv2.THRESH_BINARY)
-        elif threshold_type == 'adaptive':
-            # Apply Gaussian blur to reduce noise
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-            thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                         cv2.THRESH_BINARY, 11, 2)
-        else:
+        if threshold_type == 'binary' and threshold_value is None:
+            threshold_value = 127  # Default threshold
+
+        # Apply thresholding based on type to the cached grey image
+        try:
+            thresh = image_filters.threshold(image_cache.gray(image_path, cv2.IMREAD_UNCHANGED),
+                                             threshold_type, threshold_value)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'Invalid threshold type. Use: otsu, binary, or adaptive'
+                'message': str(e)
             }), 400
         
         # Convert back to BGR for saving
         thresh_bgr = cv2.cvtColor(thresh, cv2.COLOR_GRAY2BGR)
 
-        # Determine output format based on original image
-        output_format = 'PNG' if image_path.lower().endswith('.png') else 'JPEG'
-
         # Save with new filename
         directory = os.path.dirname(image_path)
         filename = os.path.basename(image_path)
@@ -1834,16 +3474,14 @@ def apply_threshold():
         
         print(f"Saving thresholded image to: {new_path}")
         
-        # Save with appropriate format and quality
-        if output_format == 'PNG':
-            cv2.imwrite(new_path, thresh_bgr, [cv2.IMWRITE_PNG_COMPRESSION, 9])
-        else:
-            cv2.imwrite(new_path, thresh_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 100])
+        # Written in the background; the image is served from memory until it lands
+        job = _write_output(new_path, thresh_bgr)
         
         print("Thresholding completed successfully")
         return jsonify({
             'status': 'success',
             'filepath': new_path,
+            'job_id': job.id if job else None,
             'threshold_used': threshold_value if threshold_type == 'binary' else 'otsu/adaptive'
         })
         
@@ -1860,6 +3498,8 @@ def analyze_porosity():
     try:
         data = request.get_json()
         image_path = data.get('image_path')
+        # A snapshot or filter result may still be queued for writing
+        _wait_for_writes(image_path)
         unit = data.get('unit', 'microns')
         features = data.get('features', 'dark')
         filter_settings = data.get('filter_settings')
@@ -1972,8 +3612,8 @@ def export_porosity_report():
 
         # Add image if available
         try:
-            if image_path and os.path.exists(image_path):
-                img = cv2.imread(image_path)
+            if image_path and _output_ready(image_path):
+                img = image_cache.read(image_path)
                 if img is not None:
                     # Calculate dimensions while preserving aspect ratio
                     height, width = img.shape[:2]
@@ -2288,7 +3928,7 @@ def delete_image():
         
         print(f"Attempting to delete image: {image_path}")
         
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             print(f"Image not found: {image_path}")
             return jsonify({
                 'status': 'error',
@@ -2304,6 +3944,7 @@ def delete_image():
 
         # Delete the file
         os.remove(image_path)
+        image_cache.invalidate(image_path)
         
         print(f"Successfully deleted image: {image_path}")
         return jsonify({
@@ -2322,7 +3963,7 @@ def delete_image():
 def get_thumbnail():
     try:
         image_path = request.args.get('path')
-        if not image_path or not os.path.exists(image_path):
+        if not image_path or not _output_ready(image_path):
             return jsonify({
                 'status': 'error',
                 'message': 'Image not found'
@@ -2343,6 +3984,8 @@ def analyze_phase_route():
     try:
         data = request.get_json()
         image_path = data.get('image_path')
+        # A snapshot or filter result may still be queued for writing
+        _wait_for_writes(image_path)
         method = data.get('method', 'area_fraction')
         configuration = data.get('configuration')
 
@@ -2454,6 +4097,8 @@ def analyze_inclusion():
     try:
         data = request.get_json()
         image_path = data.get('image_path')
+        # A snapshot or filter result may still be queued for writing
+        _wait_for_writes(image_path)
         method = data.get('method', 'default')
         specimen_number = data.get('specimen_number', 1)
         field_area = data.get('field_area', 0.512)
@@ -2512,6 +4157,8 @@ def analyze_nodularity():
     try:
         data = request.get_json()
         image_path = data.get('image_path')
+        # A snapshot or filter result may still be queued for writing
+        _wait_for_writes(image_path)
         threshold = data.get('threshold', 128)
         circularity_cutoff = data.get('circularity_cutoff', 0.5)
         prep_option = data.get('prep_option') # New parameter
@@ -2721,6 +4368,7 @@ def get_porosity_histogram():
     try:
         data = request.get_json()
         image_path = data.get('image_path')
+        _wait_for_writes(image_path)
         if not image_path:
             return jsonify({'status': 'error', 'message': 'No image path provided'}), 400
         
@@ -2734,6 +4382,7 @@ def apply_porosity_intensity_threshold():
     try:
         data = request.get_json()
         image_path = data.get('image_path')
+        _wait_for_writes(image_path)
         min_threshold = data.get('min_threshold', 0)
         max_threshold = data.get('max_threshold', 255)
         features = data.get('features', 'dark')
@@ -2808,5 +4457,9 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+# Flush queued snapshot and processed image writes on shutdown
+atexit.register(devices.shutdown)
+atexit.register(output_writer.shutdown)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, threaded=True) 
\ No newline at end of file
@@ -0,0 +1,299 @@
+import threading
+import time
+
+import cv2
+
+from MvCameraControl_class import *
+
+
+# UI setting -> (GenICam node, node type) on HIKROBOT cameras
+HIKROBOT_NODES = {
+    'exposure': ('ExposureTime', 'float'),
+    'exposureAuto': ('ExposureAuto', 'enum'),
+    'gain': ('Gain', 'float'),
+    'digitalShift': ('DigitalShift', 'float'),
+    'acquisitionFrameRate': ('AcquisitionFrameRate', 'float'),
+    'resultingFrameRate': ('ResultingFrameRate', 'float'),
+    'pixelFormat': ('PixelFormat', 'enum'),
+    'testPattern': ('TestPattern', 'enum'),
+    'width': ('Width', 'int'),
+    'height': ('Height', 'int')
+}
+# Nodes that are locked while grabbing, written between StopGrabbing/StartGrabbing
+HIKROBOT_RESTART_NODES = ('pixelFormat', 'width', 'height')
+
+# UI labels for enum entries whose GenICam symbolic differs; other values pass through
+ENUM_LABELS = {
+    'pixelFormat': {
+        'Mono 8': 'Mono8',
+        'Mono 10': 'Mono10',
+        'Mono 12': 'Mono12',
+        'Mono 16': 'Mono16',
+        'RGB 8': 'RGB8Packed',
+        'BGR 8': 'BGR8Packed'
+    },
+    'testPattern': {
+        'Horizontal Ramp': 'GreyHorizontalRamp',
+        'Vertical Ramp': 'GreyVerticalRamp',
+        'Diagonal Ramp': 'GreyDiagonalRamp',
+        'Gray Ramp': 'GreyHorizontalRampMoving'
+    }
+}
+
+UVC_PROPERTIES = {
+    'exposure': cv2.CAP_PROP_EXPOSURE,
+    'gain': cv2.CAP_PROP_GAIN,
+    'brightness': cv2.CAP_PROP_BRIGHTNESS,
+    'contrast': cv2.CAP_PROP_CONTRAST,
+    'saturation': cv2.CAP_PROP_SATURATION,
+    'hue': cv2.CAP_PROP_HUE,
+    'acquisitionFrameRate': cv2.CAP_PROP_FPS,
+    'width': cv2.CAP_PROP_FRAME_WIDTH,
+    'height': cv2.CAP_PROP_FRAME_HEIGHT
+}
+
+READ_ONLY = ('resultingFrameRate',)
+
+
+class CameraSettings:
+    """
+    Cached camera parameters with coalesced, off-thread writes.
+
+    All nodes are read in one batch into a cached snapshot, so the settings
+    panel costs one round of SDK reads rather than one request per control.
+    Updates only record the requested value and return a version number; a
+    worker thread applies them at most every `interval` seconds, so a slider
+    drag that sends a hundred values for ExposureTime results in a handful of
+    SDK writes of the latest one. After each batch the nodes are read back
+    (a write may be clamped, or change other nodes such as the resulting
+    frame rate) and the applied version advances, which is how the UI knows
+    a value has taken effect.
+    """
+
+    def __init__(self, manager, interval=0.05):
+        self.manager = manager
+        self.interval = float(interval)
+        self._condition = threading.Condition()
+        # Serialises SDK/VideoCapture access between readers and the writer
+        self._device_lock = threading.Lock()
+        self._values = {}
+        self._errors = {}
+        self._pending = {}
+        self._version = 0
+        self._applied_version = 0
+        self._read_at = None
+        self._last_apply = 0.0
+        self.writes = 0
+        self.coalesced = 0
+        self._thread = None
+
+    def _supported_keys(self):
+        camera_type = self.manager.current_camera_type
+        if camera_type == 'HIKERBOT':
+            return HIKROBOT_NODES
+        if camera_type == 'WEBCAM':
+            return UVC_PROPERTIES
+        return {}
+
+    # HIKROBOT node access
+
+    def _read_node(self, camera, key):
+        node, kind = HIKROBOT_NODES[key]
+        if kind == 'float':
+            value = MVCC_FLOATVALUE()
+            if camera.MV_CC_GetFloatValue(node, value) == 0:
+                return round(float(value.fCurValue), 4)
+        elif kind == 'int':
+            value = MVCC_INTVALUE()
+            if camera.MV_CC_GetIntValue(node, value) == 0:
+                return int(value.nCurValue)
+        else:
+            value = MVCC_ENUMVALUE()
+            if camera.MV_CC_GetEnumValue(node, value) == 0:
+                entry = MVCC_ENUMENTRY()
+                entry.nValue = value.nCurValue
+                if camera.MV_CC_GetEnumEntrySymbolic(node, entry) != 0:
+                    return int(value.nCurValue)
+                symbolic = entry.chSymbolic.decode('ascii', errors='replace')
+                labels = {v: k for k, v in ENUM_LABELS.get(key, {}).items()}
+                return labels.get(symbolic, symbolic)
+        return None
+
+    def _write_node(self, camera, key, value):
+        node, kind = HIKROBOT_NODES[key]
+        if key == 'acquisitionFrameRate':
+            # 0 switches the frame-rate limit off
+            enabled = float(value) > 0
+            camera.MV_CC_SetBoolValue('AcquisitionFrameRateEnable', enabled)
+            if not enabled:
+                return 0
+        if kind == 'float':
+            return camera.MV_CC_SetFloatValue(node, float(value))
+        if kind == 'int':
+            return camera.MV_CC_SetIntValue(node, int(value))
+        symbolic = ENUM_LABELS.get(key, {}).get(value, value)
+        return camera.MV_CC_SetEnumValueByString(node, str(symbolic))
+
+    def _read_hikrobot(self):
+        camera = self.manager.hikrobot_camera
+        return {key: self._read_node(camera, key) for key in HIKROBOT_NODES}
+
+    def _apply_hikrobot(self, changes):
+        camera = self.manager.hikrobot_camera
+        errors = {}
+        restart = [key for key in changes if key in HIKROBOT_RESTART_NODES]
+        if restart:
+            camera.MV_CC_StopGrabbing()
+        try:
+            # Format before size: the size limits depend on the pixel format
+            for key in sorted(changes, key=lambda k: (k not in restart, k != 'pixelFormat')):
+                ret = self._write_node(camera, key, changes[key])
+                self.writes += 1
+                if ret != 0:
+                    errors[key] = f"Failed to set {HIKROBOT_NODES[key][0]} (error code: {ret})"
+        finally:
+            if restart:
+                ret = camera.MV_CC_StartGrabbing()
+                if ret != 0:
+                    print(f"Failed to restart grabbing after settings change (error code: {ret})")
+        return errors
+
+    # UVC access, under the manager's frame lock since VideoCapture is not thread-safe
+
+    def _read_uvc(self):
+        with self.manager.frame_lock:
+            camera = self.manager.camera
+            return {key: round(float(camera.get(prop)), 4) for key, prop in UVC_PROPERTIES.items()}
+
+    def _apply_uvc(self, changes):
+        errors = {}
+        with self.manager.frame_lock:
+            camera = self.manager.camera
+            for key, value in changes.items():
+                self.writes += 1
+                if not camera.set(UVC_PROPERTIES[key], float(value)):
+                    errors[key] = f"Camera rejected {key}={value}"
+        return errors
+
+    def _read_all(self):
+        camera_type = self.manager.current_camera_type
+        if camera_type == 'HIKERBOT':
+            values = self._read_hikrobot()
+        elif camera_type == 'WEBCAM':
+            values = self._read_uvc()
+        else:
+            camera = self.manager.camera
+            values = {
+                'width': int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'acquisitionFrameRate': float(camera.get(cv2.CAP_PROP_FPS))
+            }
+        values['cameraType'] = camera_type
+        return values
+
+    def _sync_manager(self, values):
+        """Keep the capture loop's exposure and frame-rate view in step with the camera"""
+        if values.get('exposure') is not None and self.manager.current_camera_type == 'HIKERBOT':
+            self.manager.exposure_time = values['exposure']
+        rate = values.get('resultingFrameRate') or values.get('acquisitionFrameRate')
+        if rate and rate > 0:
+            self.manager.acquisition_frame_rate = float(rate)
+
+    def refresh(self):
+        """Read every node in one batch into the cached snapshot"""
+        with self._device_lock:
+            values = self._read_all()
+        self._sync_manager(values)
+        with self._condition:
+            self._values = values
+            self._read_at = time.time()
+
+    def get(self, refresh=False):
+        if refresh or not self._values:
+            self.refresh()
+        return self.get_snapshot()
+
+    def get_snapshot(self):
+        with self._condition:
+            return {
+                'settings': dict(self._values),
+                'version': self._applied_version,
+                'requested_version': self._version,
+                'pending': sorted(self._pending),
+                'errors': dict(self._errors),
+                'read_at': self._read_at
+            }
+
+    def update(self, changes):
+        """Queue new values (latest wins per node), returns the version that will include them"""
+        supported = self._supported_keys()
+        for key in changes:
+            if key not in supported or key in READ_ONLY:
+                raise ValueError(f"Setting {key} is not writable on a {self.manager.current_camera_type} camera")
+        with self._condition:
+            self.coalesced += sum(1 for key in changes if key in self._pending)
+            self._pending.update(changes)
+            self._version += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='camera-settings', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+            return self._version
+
+    def wait_for_version(self, version, timeout=1.0):
+        """Block until `version` has been applied, returns True if it was"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._applied_version >= version, timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+            # Let a burst of slider updates collapse into one write per node
+            delay = self._last_apply + self.interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            with self._condition:
+                changes = self._pending
+                self._pending = {}
+                version = self._version
+
+            errors = {}
+            try:
+                if not self.manager.is_recording:
+                    raise RuntimeError('camera not initialized')
+                with self._device_lock:
+                    if self.manager.current_camera_type == 'HIKERBOT':
+                        errors = self._apply_hikrobot(changes)
+                    else:
+                        errors = self._apply_uvc(changes)
+                    values = self._read_all()
+                self._sync_manager(values)
+            except Exception as e:
+                print(f"Error applying camera settings: {str(e)}")
+                errors = {key: str(e) for key in changes}
+                values = None
+            self._last_apply = time.time()
+
+            with self._condition:
+                if values is not None:
+                    self._values = values
+                    self._read_at = self._last_apply
+                for key in changes:
+                    self._errors.pop(key, None)
+                self._errors.update(errors)
+                self._applied_version = version
+                self._condition.notify_all()
+
+    def reset(self):
+        """Forget cached values when the camera stops; queued writes are dropped"""
+        with self._condition:
+            self._values = {}
+            self._errors = {}
+            self._pending = {}
+            self._applied_version = self._version
+            self._condition.notify_all()
+
+    def get_stats(self):
+        with self._condition:
+            return {'writes': self.writes, 'coalesced': self.coalesced, 'interval': self.interval}
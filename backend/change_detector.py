@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+
+
+class ChangeDetector:
+    """
+    Cheap per-frame scene-change test for the live stream.
+
+    Each frame is reduced to a small grey thumbnail and compared (mean
+    absolute difference) with the thumbnail of the last frame that was
+    actually encoded. Comparing against the last emitted frame rather than
+    the previous one means slow drift still triggers a re-encode once it
+    adds up. A thumbnail cannot see focus changes, so a relative change in
+    the focus score counts as a scene change too.
+    """
+
+    def __init__(self, threshold=1.5, focus_threshold=0.03, size=64, max_interval=5.0):
+        self.enabled = True
+        self.threshold = float(threshold)
+        self.focus_threshold = float(focus_threshold)
+        self.size = int(size)
+        # Re-encode at least this often (seconds) so the preview never goes stale
+        self.max_interval = float(max_interval)
+        self.encoded = 0
+        self.skipped = 0
+        self.last_difference = 0.0
+        self._thumbnail = None
+        self._scratch = None
+        self._focus_score = None
+        self._emitted_at = 0.0
+
+    def configure(self, enabled=None, threshold=None, focus_threshold=None, max_interval=None):
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if threshold is not None:
+            self.threshold = max(0.0, float(threshold))
+        if focus_threshold is not None:
+            self.focus_threshold = max(0.0, float(focus_threshold))
+        if max_interval is not None:
+            self.max_interval = max(0.0, float(max_interval))
+
+    def _make_thumbnail(self, frame):
+        if frame.ndim == 3:
+            thumbnail = cv2.resize(frame, (self.size, self.size), interpolation=cv2.INTER_AREA)
+            return cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(frame, (self.size, self.size), interpolation=cv2.INTER_AREA)
+
+    def has_changed(self, frame, timestamp, focus_score=None):
+        """
+        Return True if the frame differs enough from the last emitted one to
+        be worth encoding. A True result makes this frame the new reference.
+        """
+        thumbnail = self._make_thumbnail(frame)
+        changed = (not self.enabled or self._thumbnail is None
+                   or self._thumbnail.shape != thumbnail.shape
+                   or timestamp - self._emitted_at >= self.max_interval)
+
+        if not changed:
+            if self._scratch is None or self._scratch.shape != thumbnail.shape:
+                self._scratch = np.empty_like(thumbnail)
+            cv2.absdiff(thumbnail, self._thumbnail, dst=self._scratch)
+            self.last_difference = cv2.mean(self._scratch)[0]
+            changed = self.last_difference >= self.threshold
+            if not changed and focus_score is not None and self._focus_score:
+                changed = abs(focus_score - self._focus_score) >= self.focus_threshold * self._focus_score
+
+        if changed:
+            self._thumbnail = thumbnail
+            self._focus_score = focus_score
+            self._emitted_at = timestamp
+            self.encoded += 1
+        else:
+            self.skipped += 1
+        return changed
+
+    def reset(self):
+        self._thumbnail = None
+        self._focus_score = None
+        self._emitted_at = 0.0
+
+    def get_stats(self):
+        total = self.encoded + self.skipped
+        return {
+            'enabled': self.enabled,
+            'threshold': self.threshold,
+            'focus_threshold': self.focus_threshold,
+            'max_interval': self.max_interval,
+            'encoded': self.encoded,
+            'skipped': self.skipped,
+            'skip_rate': round(self.skipped / total, 4) if total else 0.0,
+            'last_difference': round(self.last_difference, 3)
+        }
@@ -0,0 +1,168 @@
+import threading
+
+import cv2
+
+
+DEFAULT_DEVICE_ID = 'default'
+
+
+class UnknownDeviceError(KeyError):
+    """Raised when a request names a camera device the registry does not know"""
+
+
+def _c_string(chars):
+    return bytes(chars).split(b'\x00', 1)[0].decode('utf-8', errors='replace')
+
+
+def hikrobot_device_info(device):
+    """Serial number, model and user-defined name of an MV_CC_DEVICE_INFO"""
+    from MvCameraControl_class import MV_GIGE_DEVICE
+    if device.nTLayerType == MV_GIGE_DEVICE:
+        info, transport = device.SpecialInfo.stGigEInfo, 'GigE'
+    else:
+        info, transport = device.SpecialInfo.stUsb3VInfo, 'USB3'
+    return {
+        'serial': _c_string(info.chSerialNumber),
+        'model': _c_string(info.chModelName),
+        'name': _c_string(info.chUserDefinedName),
+        'transport': transport
+    }
+
+
+def enumerate_hikrobot_devices():
+    """List the HIKROBOT GigE/USB3 cameras visible to the SDK"""
+    devices = []
+    try:
+        from ctypes import cast, POINTER
+        from MvCameraControl_class import (MvCamera, MV_CC_DEVICE_INFO, MV_CC_DEVICE_INFO_LIST,
+                                           MV_GIGE_DEVICE, MV_USB_DEVICE)
+        MvCamera.MV_CC_Initialize()
+        device_list = MV_CC_DEVICE_INFO_LIST()
+        ret = MvCamera.MV_CC_EnumDevices(MV_GIGE_DEVICE | MV_USB_DEVICE, device_list)
+        if ret != 0:
+            print(f"Enum Devices fail! (error code: {ret})")
+            return devices
+        for index in range(device_list.nDeviceNum):
+            device = cast(device_list.pDeviceInfo[index], POINTER(MV_CC_DEVICE_INFO)).contents
+            info = hikrobot_device_info(device)
+            info.update({
+                'id': f"hik-{info['serial'] or index}",
+                'type': 'HIKERBOT',
+                'index': index
+            })
+            devices.append(info)
+    except Exception as e:
+        print(f"Error enumerating HIKROBOT devices: {str(e)}")
+    return devices
+
+
+def enumerate_uvc_devices(max_index=4, skip=()):
+    """Probe UVC (DirectShow/V4L2) indices; indices already open in this process are skipped"""
+    devices = []
+    for index in range(max_index):
+        if index in skip:
+            devices.append({'id': f"uvc-{index}", 'type': 'WEBCAM', 'index': index})
+            continue
+        capture = cv2.VideoCapture(index)
+        try:
+            if capture.isOpened():
+                devices.append({
+                    'id': f"uvc-{index}",
+                    'type': 'WEBCAM',
+                    'index': index,
+                    'width': int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                    'height': int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                })
+        finally:
+            capture.release()
+    return devices
+
+
+class DeviceRegistry:
+    """
+    Cameras driven by this server, one WebcamManager per device.
+
+    Each manager owns its capture thread, frame hub, buffer pool, writer and
+    metrics, so streams from different microscopes never share a queue. The
+    'default' device keeps the historic behaviour (first HIKROBOT camera or
+    webcam 0) for clients that don't pass a device ID. Managers for
+    enumerated devices are created on first use; VIRTUAL devices can be
+    added under any ID for benchmarking.
+    """
+
+    def __init__(self, factory, max_uvc_index=4):
+        # factory(device_id, device_info) -> WebcamManager
+        self._factory = factory
+        self.max_uvc_index = int(max_uvc_index)
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._managers = {DEFAULT_DEVICE_ID: factory(DEFAULT_DEVICE_ID, None)}
+
+    @property
+    def default(self):
+        return self._managers[DEFAULT_DEVICE_ID]
+
+    def refresh(self):
+        """Enumerate HIKROBOT and UVC devices, returns the device list"""
+        with self._lock:
+            managers = list(self._managers.values())
+        # Probing an index that is already streaming would steal or fail to open it
+        open_indices = {m.device_index for m in managers
+                        if m.is_recording and m.current_camera_type == 'WEBCAM'}
+        found = enumerate_hikrobot_devices() + enumerate_uvc_devices(self.max_uvc_index, open_indices)
+        with self._lock:
+            for device in found:
+                self._devices[device['id']] = device
+            return list(self._devices.values())
+
+    def get(self, device_id=None):
+        device_id = device_id or DEFAULT_DEVICE_ID
+        with self._lock:
+            manager = self._managers.get(device_id)
+            if manager is None:
+                device = self._devices.get(device_id)
+                if device is None:
+                    raise UnknownDeviceError(device_id)
+                manager = self._managers[device_id] = self._factory(device_id, device)
+            return manager
+
+    def add_virtual(self, device_id):
+        """Manager for a virtual camera under a caller-chosen ID"""
+        with self._lock:
+            manager = self._managers.get(device_id)
+            if manager is None:
+                device = self._devices[device_id] = {'id': device_id, 'type': 'VIRTUAL', 'index': None}
+                manager = self._managers[device_id] = self._factory(device_id, device)
+            return manager
+
+    def managers(self):
+        with self._lock:
+            return list(self._managers.values())
+
+    def list(self):
+        """Known devices merged with the state of their managers"""
+        with self._lock:
+            devices = dict(self._devices)
+            managers = dict(self._managers)
+        result = []
+        for device_id in [DEFAULT_DEVICE_ID] + sorted(set(devices) | set(managers) - {DEFAULT_DEVICE_ID}):
+            entry = dict(devices.get(device_id) or {'id': device_id, 'type': None, 'index': None})
+            manager = managers.get(device_id)
+            entry.update({
+                'running': bool(manager and manager.is_recording),
+                'camera_type': manager.current_camera_type if manager else None,
+                'sequence': manager.frame_hub.sequence if manager else 0,
+                'consumers': manager.stream_consumers.count() if manager else 0
+            })
+            result.append(entry)
+        return result
+
+    def shutdown(self):
+        """Stop every running camera and flush the image writers"""
+        for manager in self.managers():
+            try:
+                if manager.is_recording:
+                    manager.stop_camera()
+                manager.image_writer.shutdown()
+            except Exception as e:
+                print(f"Error shutting down camera {manager.device_id}: {str(e)}")
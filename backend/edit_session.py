@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+import image_filters
+
+
+class EditSession:
+    """
+    Non-destructive edits of one image.
+
+    The image keeps an ordered stack of operations and a position in it;
+    undo and redo only move the position, and a new operation drops the
+    undone tail. Previews are rendered from a pyramid level just above the
+    requested size, with kernel sizes scaled to that level, and the rendered
+    state at each position is kept, so stepping through the stack or adding
+    one operation costs at most one filter on a small image. The full
+    resolution image is rendered once, when the result is saved.
+    """
+
+    def __init__(self, session_id, image_path, image_cache, max_previews=16):
+        self.id = session_id
+        self.image_path = image_path
+        self.image_cache = image_cache
+        self.max_previews = max_previews
+        self.stack = []
+        self.position = 0
+        self.created_at = time.time()
+        self.saved_path = None
+        self._lock = threading.Lock()
+        self._levels = None
+        # (level, position) -> rendered preview, least recently used first
+        self._previews = OrderedDict()
+
+        image = self._read()
+        self.width, self.height = image.shape[1], image.shape[0]
+
+    def _read(self):
+        image = self.image_cache.read(self.image_path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError(f"Failed to read image: {self.image_path}")
+        return image
+
+    def _pyramid(self):
+        # Halvings of the image down to about a thumbnail, built once per session
+        if self._levels is None:
+            levels = [self._read()]
+            while max(levels[-1].shape[:2]) > 256:
+                levels.append(cv2.pyrDown(levels[-1]))
+            self._levels = levels
+        return self._levels
+
+    def push(self, op, params=None):
+        """Add an operation after the current position, discarding any redo history"""
+        params = dict(params or {})
+        image_filters.check_filter(op, params)
+        with self._lock:
+            if self.position < len(self.stack):
+                del self.stack[self.position:]
+                for key in [k for k in self._previews if k[1] > self.position]:
+                    del self._previews[key]
+            self.stack.append({'op': op, 'params': params})
+            self.position += 1
+            return self.position
+
+    def undo(self):
+        with self._lock:
+            if self.position == 0:
+                return False
+            self.position -= 1
+            return True
+
+    def redo(self):
+        with self._lock:
+            if self.position == len(self.stack):
+                return False
+            self.position += 1
+            return True
+
+    def render_preview(self, max_size=1280):
+        """Current state on the smallest pyramid level at least max_size on its long side"""
+        with self._lock:
+            levels = self._pyramid()
+            level = 0
+            while level + 1 < len(levels) and max(levels[level + 1].shape[:2]) >= max_size:
+                level += 1
+            scale = levels[level].shape[1] / self.width
+
+            # Start from the latest rendered state at or before the position
+            start, image = 0, levels[level]
+            for position in range(self.position, 0, -1):
+                cached = self._previews.get((level, position))
+                if cached is not None:
+                    self._previews.move_to_end((level, position))
+                    start, image = position, cached
+                    break
+            for position in range(start, self.position):
+                step = self.stack[position]
+                image = image_filters.apply_filter(image, step['op'], step['params'], scale)
+                self._previews[(level, position + 1)] = image
+                while len(self._previews) > self.max_previews:
+                    self._previews.popitem(last=False)
+
+            if max(image.shape[:2]) > max_size:
+                factor = max_size / max(image.shape[:2])
+                image = cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+            return image
+
+    def render_full(self):
+        """Apply the active operations to the full-resolution image"""
+        with self._lock:
+            steps = self.stack[:self.position]
+        image = self._read()
+        for step in steps:
+            image = image_filters.apply_filter(image, step['op'], step['params'])
+        return image
+
+    def get_state(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'image_path': self.image_path,
+                'width': self.width,
+                'height': self.height,
+                'stack': list(self.stack),
+                'position': self.position,
+                'can_undo': self.position > 0,
+                'can_redo': self.position < len(self.stack),
+                'saved_path': self.saved_path
+            }
+
+
+class EditSessions:
+    """Open edit sessions by ID; the least recently used is closed beyond max_sessions"""
+
+    def __init__(self, image_cache, max_sessions=8):
+        self.image_cache = image_cache
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def open(self, image_path):
+        if not image_path or not os.path.exists(image_path):
+            raise ValueError('Image not found')
+        with self._lock:
+            self._next_id += 1
+            session_id = self._next_id
+        session = EditSession(session_id, image_path, self.image_cache)
+        with self._lock:
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def close(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
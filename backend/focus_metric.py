@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class FocusSample:
+    """Focus score of one captured frame"""
+
+    def __init__(self, sequence, timestamp, score, compute_ms):
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.score = score
+        self.compute_ms = compute_ms
+
+
+class FocusMeter:
+    """
+    Live focus-quality metric for the capture thread.
+
+    Each frame is shrunk to a small grey buffer (nearest-neighbour, so only
+    the sampled pixels are read) and scored with the variance of the
+    Laplacian or the Tenengrad gradient energy; both rise as the image gets
+    sharper. A short history is kept so clients can show how close the
+    current score is to the best one seen while turning the focus knob.
+    """
+
+    METHODS = ('laplacian', 'tenengrad')
+
+    def __init__(self, method='laplacian', sample_width=256, history=150):
+        if method not in self.METHODS:
+            raise ValueError(f"Unsupported focus method: {method}. Use: {', '.join(self.METHODS)}")
+        self.method = method
+        self.sample_width = max(32, int(sample_width))
+        self.enabled = True
+        self._history = deque(maxlen=max(2, int(history)))
+        self._condition = threading.Condition()
+        self._sequence = 0
+
+    def configure(self, method=None, sample_width=None, history=None, enabled=None):
+        with self._condition:
+            if method is not None:
+                if method not in self.METHODS:
+                    raise ValueError(f"Unsupported focus method: {method}")
+                if method != self.method:
+                    # Scores of different methods are not comparable
+                    self._history.clear()
+                self.method = method
+            if sample_width is not None:
+                self.sample_width = max(32, int(sample_width))
+                self._history.clear()
+            if history is not None:
+                self._history = deque(self._history, maxlen=max(2, int(history)))
+            if enabled is not None:
+                self.enabled = bool(enabled)
+
+    def _sample(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.sample_width:
+            size = (self.sample_width, max(1, int(height * self.sample_width / width)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_NEAREST)
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def score(self, frame):
+        """Focus score of a single frame (higher is sharper)"""
+        gray = self._sample(frame)
+        # 16-bit derivatives and OpenCV reductions avoid float temporaries
+        if self.method == 'tenengrad':
+            gx = cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3)
+            gy = cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3)
+            return (cv2.norm(gx, cv2.NORM_L2SQR) + cv2.norm(gy, cv2.NORM_L2SQR)) / gray.size
+        _, stddev = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+        return float(stddev[0, 0] ** 2)
+
+    def update(self, frame, timestamp=None):
+        """Score a frame and publish it to waiting clients"""
+        if not self.enabled or frame is None:
+            return None
+        start = time.perf_counter()
+        value = self.score(frame)
+        compute_ms = (time.perf_counter() - start) * 1000
+        with self._condition:
+            self._sequence += 1
+            sample = FocusSample(self._sequence, timestamp or time.time(), value, compute_ms)
+            self._history.append(sample)
+            self._condition.notify_all()
+            return sample
+
+    def wait_for_sample(self, last_sequence=0, timeout=1.0):
+        """Block until a sample newer than last_sequence exists, returns its summary or None"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._sequence > last_sequence, timeout):
+                return None
+            return self._summary()
+
+    def _summary(self):
+        # Caller holds the condition
+        if not self._history:
+            return None
+        latest = self._history[-1]
+        peak = max(self._history, key=lambda s: s.score)
+        return {
+            'sequence': latest.sequence,
+            'timestamp': round(latest.timestamp, 6),
+            'score': round(latest.score, 3),
+            'method': self.method,
+            'compute_ms': round(latest.compute_ms, 3),
+            'peak_score': round(peak.score, 3),
+            'peak_sequence': peak.sequence,
+            'relative': round(latest.score / peak.score, 4) if peak.score > 0 else 0.0,
+            # Scores closer than 5% to the peak are treated as in focus
+            'at_peak': peak.score > 0 and latest.score >= 0.95 * peak.score
+        }
+
+    def get_summary(self, include_history=False):
+        with self._condition:
+            summary = self._summary()
+            if summary is not None and include_history:
+                summary['history'] = [[s.sequence, round(s.score, 3)] for s in self._history]
+            return summary
+
+    def reset(self):
+        """Forget the history, e.g. after moving to a new field of view"""
+        with self._condition:
+            self._history.clear()
@@ -0,0 +1,286 @@
+import os
+import re
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+CALIBRATION_TYPES = ('dark', 'flat')
+# Gains above this only amplify noise in the darkest corners; it also keeps the
+# 8-bit fixed-point gain map at better than 1% resolution
+MAX_GAIN = 2.0
+
+
+class FrameCorrection:
+    """
+    Capture-time running average and dark/flat-field correction.
+
+    Runs on the capture thread on every full-resolution frame before the
+    preview is derived, so streaming, snapshots and analyses all see the
+    corrected image.
+
+    The running average is an exponential average over roughly N frames held
+    in a single float32 accumulator updated in place, so no stack of frames
+    is kept. Dark frames and flat-field gain maps are stored per
+    magnification and captured from the live stream. The correction
+    (frame - dark) * gain uses the dark frame converted to the frame dtype
+    and the gain map precomputed as fixed point (8-bit for 8-bit frames,
+    16-bit otherwise) with one shared scale, so a frame costs a saturating
+    subtract plus a scaled integer multiply with no float temporaries.
+    Corrected frames are written into buffers from the capture frame pool.
+    """
+
+    def __init__(self, frame_pool, calibration_dir=os.path.join('calibration_data', 'flat_field')):
+        self.frame_pool = frame_pool
+        self.calibration_dir = calibration_dir
+        self.enabled = False
+        self.average_frames = 1
+        self.magnification = '100x'
+        self.apply_ms = 0.0
+        self.message = None
+        self._lock = threading.Lock()
+        self._calibrations = {}
+        self._prepared = None
+        self._accumulator = None
+        self._accumulator_dtype = None
+        self._averaged = 0
+        self._calibration = None
+        self._calibration_done = threading.Condition(self._lock)
+
+    def configure(self, enabled=None, average_frames=None, magnification=None):
+        with self._lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if average_frames is not None:
+                average_frames = min(max(1, int(average_frames)), 256)
+                if average_frames != self.average_frames:
+                    # Restart the average over the new length
+                    self.average_frames = average_frames
+                    self._accumulator = None
+            if magnification is not None and magnification != self.magnification:
+                self.magnification = str(magnification)
+                self._prepared = None
+
+    def _path(self, magnification, kind):
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', magnification)
+        return os.path.join(self.calibration_dir, f"{name}_{kind}.npy")
+
+    def _get_calibration(self, magnification):
+        """Dark frame and gain map for a magnification, loaded from disk on first use"""
+        calibration = self._calibrations.get(magnification)
+        if calibration is None:
+            calibration = {}
+            for kind in CALIBRATION_TYPES:
+                path = self._path(magnification, kind)
+                if os.path.exists(path):
+                    try:
+                        calibration[kind] = np.load(path)
+                    except Exception as e:
+                        print(f"Error loading {kind} calibration for {magnification}: {str(e)}")
+            self._calibrations[magnification] = calibration
+        return calibration
+
+    def _prepare(self, frame):
+        """Convert the stored calibration to the fixed-point form for this frame shape/dtype"""
+        calibration = self._get_calibration(self.magnification)
+        dark = calibration.get('dark')
+        gain = calibration.get('flat')
+        prepared = {'shape': frame.shape, 'dtype': frame.dtype, 'dark': None, 'gain': None, 'scale': 1.0}
+        self.message = None
+        for name, data in (('dark', dark), ('flat', gain)):
+            if data is not None and data.shape != frame.shape:
+                self.message = (f"{name} calibration for {self.magnification} is {data.shape}, "
+                                f"frame is {frame.shape}; recalibrate for this ROI/resolution")
+                self._prepared = prepared
+                return prepared
+
+        limit = np.iinfo(frame.dtype).max
+        if dark is not None:
+            prepared['dark'] = np.clip(np.rint(dark), 0, limit).astype(frame.dtype)
+        if gain is not None:
+            # One shared scale so the largest gain uses the full integer range
+            top = max(float(gain.max()), 1e-6)
+            prepared['gain'] = np.rint(gain * (limit / top)).astype(frame.dtype)
+            prepared['scale'] = top / limit
+        self._prepared = prepared
+        return prepared
+
+    def _output(self, frame):
+        return self.frame_pool.acquire(frame.nbytes).view(frame.dtype).reshape(frame.shape)
+
+    def _average(self, frame):
+        """Exponential running average; the first N frames form a plain mean"""
+        if (self._accumulator is None or self._accumulator.shape != frame.shape
+                or self._accumulator_dtype != frame.dtype):
+            self._accumulator = frame.astype(np.float32)
+            self._accumulator_dtype = frame.dtype
+            self._averaged = 1
+        else:
+            self._averaged = min(self._averaged + 1, self.average_frames)
+            cv2.accumulateWeighted(frame, self._accumulator, 1.0 / self._averaged)
+        out = self._output(frame)
+        if frame.dtype == np.uint8:
+            cv2.convertScaleAbs(self._accumulator, dst=out)
+        else:
+            np.copyto(out, self._accumulator, casting='unsafe')
+        return out
+
+    def apply(self, frame):
+        """Return the corrected frame (a pooled buffer) or the frame itself when there is nothing to do"""
+        with self._lock:
+            if self._calibration is not None:
+                # Calibration frames are collected uncorrected
+                self._collect(frame)
+                return frame
+            if not self.enabled or frame.dtype not in (np.uint8, np.uint16):
+                return frame
+
+            start = time.perf_counter()
+            if self.average_frames > 1:
+                frame = self._average(frame)
+
+            prepared = self._prepared
+            if prepared is None or prepared['shape'] != frame.shape or prepared['dtype'] != frame.dtype:
+                prepared = self._prepare(frame)
+            if prepared['dark'] is not None or prepared['gain'] is not None:
+                # Averaging already produced a pooled buffer, correct it in place
+                out = frame if self.average_frames > 1 else self._output(frame)
+                if prepared['dark'] is not None:
+                    cv2.subtract(frame, prepared['dark'], dst=out)
+                    frame = out
+                if prepared['gain'] is not None:
+                    cv2.multiply(frame, prepared['gain'], dst=out, scale=prepared['scale'])
+                frame = out
+            self.apply_ms = (time.perf_counter() - start) * 1000
+            return frame
+
+    def start_calibration(self, kind, magnification=None, frames=16):
+        """Average the next `frames` live frames into a dark frame or flat-field gain map"""
+        if kind not in CALIBRATION_TYPES:
+            raise ValueError(f"Unsupported calibration type: {kind}. Use: {', '.join(CALIBRATION_TYPES)}")
+        with self._lock:
+            if self._calibration is not None:
+                raise ValueError('A calibration is already running')
+            self._calibration = {
+                'kind': kind,
+                'magnification': str(magnification or self.magnification),
+                'frames': min(max(1, int(frames)), 256),
+                'count': 0,
+                'sum': None,
+                'result': None
+            }
+            return self._calibration
+
+    def _collect(self, frame):
+        calibration = self._calibration
+        if calibration['sum'] is None or calibration['sum'].shape != frame.shape:
+            calibration['sum'] = np.zeros(frame.shape, dtype=np.float32)
+            calibration['count'] = 0
+        cv2.accumulate(frame, calibration['sum'])
+        calibration['count'] += 1
+        if calibration['count'] >= calibration['frames']:
+            # Enough frames: the gain map and the full-resolution .npy write run on
+            # their own thread so the capture thread isn't held up
+            self._calibration = None
+            calibration['dark'] = self._get_calibration(calibration['magnification']).get('dark')
+            threading.Thread(target=self._finish, args=(calibration,), name='calibration-writer',
+                             daemon=True).start()
+
+    def _finish(self, calibration):
+        try:
+            result = self._save_calibration(calibration)
+        except Exception as e:
+            print(f"Error finishing {calibration['kind']} calibration: {str(e)}")
+            result = {'status': 'error', 'message': str(e)}
+        with self._lock:
+            calibration['result'] = result
+            self._calibration_done.notify_all()
+
+    def _save_calibration(self, calibration):
+        magnification = calibration['magnification']
+        mean = calibration['sum'] / calibration['count']
+        if calibration['kind'] == 'dark':
+            data = mean
+        else:
+            dark = calibration['dark']
+            if dark is not None and dark.shape == mean.shape:
+                mean -= dark
+            np.maximum(mean, 1.0, out=mean)
+            # Normalise each channel to its own mean so colour balance is kept
+            target = np.array(cv2.mean(mean)[:mean.shape[2] if mean.ndim == 3 else 1], dtype=np.float32)
+            data = np.clip(target / mean, 0.0, MAX_GAIN).astype(np.float32)
+
+        os.makedirs(self.calibration_dir, exist_ok=True)
+        np.save(self._path(magnification, calibration['kind']), data)
+        with self._lock:
+            self._get_calibration(magnification)[calibration['kind']] = data
+            if magnification == self.magnification:
+                self._prepared = None
+        return {
+            'status': 'success',
+            'type': calibration['kind'],
+            'magnification': magnification,
+            'frames': calibration['count'],
+            'shape': list(data.shape),
+            'min': round(float(data.min()), 4),
+            'max': round(float(data.max()), 4)
+        }
+
+    def wait_for_calibration(self, calibration, timeout):
+        """Block until the calibration has collected its frames, None on timeout"""
+        with self._lock:
+            self._calibration_done.wait_for(lambda: calibration['result'] is not None, timeout)
+            if calibration['result'] is None and self._calibration is calibration:
+                self._calibration = None
+            return calibration['result']
+
+    def clear(self, magnification, kind=None):
+        """Delete the stored dark frame and/or gain map for a magnification"""
+        with self._lock:
+            stored = self._get_calibration(magnification)
+            for name in ([kind] if kind else CALIBRATION_TYPES):
+                stored.pop(name, None)
+                path = self._path(magnification, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            if magnification == self.magnification:
+                self._prepared = None
+
+    def list_calibrations(self):
+        """Magnifications with stored calibration files and which parts they have"""
+        calibrations = {}
+        if os.path.isdir(self.calibration_dir):
+            for filename in sorted(os.listdir(self.calibration_dir)):
+                stem, ext = os.path.splitext(filename)
+                magnification, _, kind = stem.rpartition('_')
+                if ext == '.npy' and kind in CALIBRATION_TYPES:
+                    calibrations.setdefault(magnification, []).append(kind)
+        return calibrations
+
+    def reset(self):
+        with self._lock:
+            self._accumulator = None
+            self._prepared = None
+
+    def get_status(self):
+        with self._lock:
+            calibration = self._get_calibration(self.magnification)
+            running = self._calibration
+            return {
+                'enabled': self.enabled,
+                'average_frames': self.average_frames,
+                'magnification': self.magnification,
+                'dark': 'dark' in calibration,
+                'flat': 'flat' in calibration,
+                'message': self.message,
+                'apply_ms': round(self.apply_ms, 3),
+                'calibrating': {
+                    'type': running['kind'],
+                    'magnification': running['magnification'],
+                    'frames': running['frames'],
+                    'collected': running['count']
+                } if running else None,
+                'calibrations': self.list_calibrations()
+            }
@@ -0,0 +1,255 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# cv2.imencode's default JPEG quality, used for the frame encoded by the capture thread
+DEFAULT_JPEG_QUALITY = 95
+
+
+class FramePacket:
+    """
+    A single captured frame as published by the capture thread.
+    `frame` is the display-sized preview, `raw` the full-resolution frame.
+    `changed` is False when the scene did not change and `jpeg` is the
+    previous encoding reused. Other quality/width tiers are encoded on
+    first request and cached on the packet, so each tier is encoded once
+    per frame however many clients use it.
+    """
+
+    def __init__(self, sequence, frame, jpeg, timestamp=None, encode_ms=0.0, raw=None, changed=True,
+                 focus_score=None):
+        self.sequence = sequence
+        self.frame = frame
+        self.raw = raw if raw is not None else frame
+        self.jpeg = jpeg
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.encode_ms = encode_ms
+        self.changed = changed
+        self.focus_score = focus_score
+        self._tiers = {}
+        self._tier_lock = threading.Lock()
+
+    def get_jpeg(self, quality=DEFAULT_JPEG_QUALITY, max_width=None):
+        """Return (jpeg bytes, encode ms) for a quality/max width tier"""
+        width = self.frame.shape[1]
+        if max_width and max_width >= width:
+            max_width = None
+        if quality == DEFAULT_JPEG_QUALITY and max_width is None:
+            return self.jpeg, self.encode_ms
+
+        key = (quality, max_width)
+        with self._tier_lock:
+            entry = self._tiers.get(key)
+            owner = entry is None
+            if owner:
+                # First client of this tier encodes, the others wait for it
+                entry = self._tiers[key] = [threading.Event(), None, 0.0]
+        if not owner:
+            entry[0].wait(5.0)
+            return entry[1], entry[2]
+
+        try:
+            start = time.perf_counter()
+            frame = self.frame
+            if max_width is not None:
+                height = max(1, int(round(frame.shape[0] * max_width / width)))
+                frame = cv2.resize(frame, (max_width, height), interpolation=cv2.INTER_AREA)
+            ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+            entry[1] = buffer.tobytes() if ret else None
+            entry[2] = (time.perf_counter() - start) * 1000
+        finally:
+            entry[0].set()
+        return entry[1], entry[2]
+
+
+class FrameHub:
+    """
+    Single-producer broadcast buffer for live camera frames.
+
+    The capture thread publishes every frame exactly once into a small ring
+    of slots tagged with a monotonically increasing sequence number. Stream
+    clients wait for a sequence newer than the one they last sent and read
+    the already-encoded frame, so they never touch the camera themselves.
+    """
+
+    def __init__(self, capacity=4):
+        self.capacity = max(1, int(capacity))
+        self._slots = [None] * self.capacity
+        self._sequence = 0
+        self._condition = threading.Condition()
+
+    @property
+    def sequence(self):
+        """Sequence number of the most recently published frame"""
+        return self._sequence
+
+    def publish(self, frame, jpeg, timestamp=None, encode_ms=0.0, raw=None, changed=True, focus_score=None):
+        """Store a new frame in the ring and wake up all waiting clients"""
+        with self._condition:
+            self._sequence += 1
+            packet = FramePacket(self._sequence, frame, jpeg, timestamp, encode_ms, raw, changed, focus_score)
+            self._slots[self._sequence % self.capacity] = packet
+            self._condition.notify_all()
+            return packet
+
+    def latest(self):
+        """Return the most recent packet, or None if nothing was published"""
+        with self._condition:
+            if self._sequence == 0:
+                return None
+            return self._slots[self._sequence % self.capacity]
+
+    def get(self, sequence):
+        """Return the packet with the given sequence if it is still buffered"""
+        with self._condition:
+            packet = self._slots[sequence % self.capacity]
+            if packet is not None and packet.sequence == sequence:
+                return packet
+            return None
+
+    def wait_for_frame(self, last_sequence=0, timeout=1.0):
+        """
+        Block until a frame newer than last_sequence is available.
+        Returns the latest packet, or None if the timeout expired.
+        Slow readers skip straight to the newest frame instead of queueing.
+        """
+        with self._condition:
+            if self._sequence <= last_sequence:
+                self._condition.wait_for(lambda: self._sequence > last_sequence, timeout)
+            if self._sequence <= last_sequence:
+                return None
+            return self._slots[self._sequence % self.capacity]
+
+    def reset(self):
+        """Drop all buffered frames and wake up waiting clients"""
+        with self._condition:
+            self._slots = [None] * self.capacity
+            self._condition.notify_all()
+
+
+class FrameBufferPool:
+    """
+    Preallocated pool of NumPy frame buffers reused round-robin.
+
+    The capture path copies each SDK image buffer straight into the next
+    pooled array, so steady-state capture does not allocate. A buffer is
+    handed out again after `size` acquisitions, which means anything that
+    keeps a frame longer than that (e.g. the frame hub ring) must either fit
+    inside the pool or pin it. Pins are counted, so several consumers (a
+    snapshot, a burst, the video recorder) can hold the same buffer; while
+    any pin remains the buffer is detached from the pool when its slot comes
+    round again, so it is never overwritten.
+    """
+
+    def __init__(self, size=8):
+        self._lock = threading.Lock()
+        self.size = max(1, int(size))
+        self._buffers = [None] * self.size
+        # buffer address -> number of outstanding pins
+        self._pinned = {}
+        self._pinned_bytes = {}
+        self._index = 0
+        self.hits = 0
+        self.misses = 0
+        self.pin_evictions = 0
+
+    def acquire(self, nbytes):
+        """Return the next flat uint8 buffer holding at least nbytes"""
+        with self._lock:
+            slot = self._index
+            self._index = (self._index + 1) % self.size
+            buffer = self._buffers[slot]
+            if buffer is not None and self._pinned.get(buffer.ctypes.data, 0) > 0:
+                # Still pinned by a consumer: hand the buffer over and replace the
+                # slot; the pin count stays until the last consumer unpins it
+                self.pin_evictions += 1
+                buffer = None
+            if buffer is not None and buffer.nbytes >= nbytes:
+                self.hits += 1
+                return buffer[:nbytes]
+
+            # First use of this slot or the frame grew (e.g. resolution change)
+            self.misses += 1
+            buffer = np.empty(nbytes, dtype=np.uint8)
+            self._buffers[slot] = buffer
+            return buffer
+
+    def _find_slot(self, array):
+        """
+        (address, size) of the pooled buffer array points into. Host ROI crops
+        are strided views that start inside the buffer, so the match is on
+        the address range, not the start address.
+        """
+        address = array.ctypes.data
+        for buffer in self._buffers:
+            if buffer is not None and buffer.ctypes.data <= address < buffer.ctypes.data + buffer.nbytes:
+                return buffer.ctypes.data, buffer.nbytes
+        return self._find_pinned(address)
+
+    def _find_pinned(self, address):
+        # Also covers pinned buffers that have since been detached from the pool
+        for base, nbytes in self._pinned_bytes.items():
+            if base <= address < base + nbytes:
+                return base, nbytes
+        return None
+
+    def pin(self, array):
+        """
+        Protect the pooled buffer behind array from being reused.
+        Returns False if the array is not backed by this pool (nothing to pin).
+        """
+        with self._lock:
+            slot = self._find_slot(array)
+            if slot is None:
+                return False
+            address, nbytes = slot
+            self._pinned[address] = self._pinned.get(address, 0) + 1
+            self._pinned_bytes[address] = nbytes
+            return True
+
+    def unpin(self, array):
+        """Release one pin; the buffer is reusable once every pin is released"""
+        with self._lock:
+            slot = self._find_pinned(array.ctypes.data)
+            if slot is None:
+                return
+            address = slot[0]
+            count = self._pinned[address] - 1
+            if count > 0:
+                self._pinned[address] = count
+            else:
+                del self._pinned[address]
+                del self._pinned_bytes[address]
+
+    def resize(self, size):
+        """
+        Change the number of pooled buffers, dropping the existing ones.
+        Outstanding pins stay counted until released; the dropped buffers are
+        never handed out again, so their consumers keep valid data.
+        """
+        with self._lock:
+            self.size = max(1, int(size))
+            self._buffers = [None] * self.size
+            self._index = 0
+
+    def get_stats(self):
+        """Return pool size, allocated bytes and hit/miss counters"""
+        with self._lock:
+            allocated = sum(b.nbytes for b in self._buffers if b is not None)
+            total = self.hits + self.misses
+            return {
+                'size': self.size,
+                'allocated_bytes': allocated,
+                'hits': self.hits,
+                'misses': self.misses,
+                'pinned': len(self._pinned),
+                'pin_evictions': self.pin_evictions,
+                'hit_rate': round(self.hits / total, 4) if total else None
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+
+class ImageCache:
+    """
+    LRU cache of decoded images shared by the filter and analysis routes.
+
+    Entries are keyed by (path, mtime, size, read flags), so a file that is
+    overwritten is decoded again and IMREAD_UNCHANGED/IMREAD_COLOR reads of
+    the same file don't mix. Grey, HSV and downscaled preview versions are
+    derived on first use and stored with the entry; everything counts
+    towards `max_bytes` and the least recently used entries are evicted
+    first. Cached arrays are read-only, so a caller that edits in place must
+    work on a copy.
+    """
+
+    def __init__(self, max_bytes=1 << 30):
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        # key -> {'image', 'decode_ms', 'derived': {kind: (array, ms)}, 'nbytes'}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.derived_hits = 0
+        self.derived_misses = 0
+        self.evictions = 0
+        self.decode_ms = 0.0
+        self.saved_ms = 0.0
+
+    def _key(self, path, flags):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size, int(flags))
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry['nbytes']
+            self.evictions += 1
+
+    def _store(self, key, image, decode_ms):
+        if image.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            # A rewritten file leaves its old decode behind, drop it now
+            for stale in [k for k in self._entries if k[0] == key[0] and k[3] == key[3] and k != key]:
+                self._bytes -= self._entries.pop(stale)['nbytes']
+            if key in self._entries:
+                return
+            self._entries[key] = {'image': image, 'decode_ms': decode_ms, 'derived': {}, 'nbytes': image.nbytes}
+            self._bytes += image.nbytes
+            self._evict()
+
+    def _decode(self, key, path, flags):
+        """Decode a file and store it; the caller counts the lookup"""
+        start = time.perf_counter()
+        image = cv2.imread(path, flags)
+        decode_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.decode_ms += decode_ms
+        if image is None:
+            return None
+        image.setflags(write=False)
+        self._store(key, image, decode_ms)
+        return image
+
+    def read(self, path, flags=cv2.IMREAD_COLOR):
+        """cv2.imread through the cache; None if the file is missing or can't be decoded"""
+        try:
+            key = self._key(path, flags)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_ms += entry['decode_ms']
+                return entry['image']
+            self.misses += 1
+        return self._decode(key, path, flags)
+
+    def _derived(self, path, flags, kind, convert):
+        try:
+            key = self._key(path, flags)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            image = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if kind in entry['derived']:
+                    result, ms = entry['derived'][kind]
+                    self.derived_hits += 1
+                    self.saved_ms += entry['decode_ms'] + ms
+                    return result
+                # Reuse the decoded base image without counting a read hit
+                image = entry['image']
+
+        if image is None:
+            image = self._decode(key, path, flags)
+            if image is None:
+                return None
+        start = time.perf_counter()
+        result = convert(image)
+        ms = (time.perf_counter() - start) * 1000
+        if result is image:
+            return result
+        result.setflags(write=False)
+        with self._lock:
+            self.derived_misses += 1
+            entry = self._entries.get(key)
+            if entry is not None and kind not in entry['derived']:
+                entry['derived'][kind] = (result, ms)
+                entry['nbytes'] += result.nbytes
+                self._bytes += result.nbytes
+                self._evict()
+        return result
+
+    def gray(self, path, flags=cv2.IMREAD_COLOR):
+        """Single-channel version of the image (the image itself if it is already grey)"""
+        def convert(image):
+            if image.ndim == 2:
+                return image
+            code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            return cv2.cvtColor(image, code)
+        return self._derived(path, flags, 'gray', convert)
+
+    def hsv(self, path, flags=cv2.IMREAD_COLOR):
+        """HSV version of an 8-bit image"""
+        def convert(image):
+            if image.ndim == 2:
+                image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            elif image.shape[2] == 4:
+                image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+            return cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        return self._derived(path, flags, 'hsv', convert)
+
+    def downscaled(self, path, max_width, max_height, flags=cv2.IMREAD_COLOR):
+        """Copy that fits in max_width x max_height (the image itself if it already fits)"""
+        def convert(image):
+            factor = min(max_width / image.shape[1], max_height / image.shape[0])
+            if factor >= 1.0:
+                return image
+            return cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+        return self._derived(path, flags, f"fit-{int(max_width)}x{int(max_height)}", convert)
+
+    def invalidate(self, path=None):
+        """Forget one file (all flags) or, without a path, everything"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            path = os.path.abspath(path)
+            for key in [k for k in self._entries if k[0] == path]:
+                self._bytes -= self._entries.pop(key)['nbytes']
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self._evict()
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'derived_hits': self.derived_hits,
+                'derived_misses': self.derived_misses,
+                'evictions': self.evictions,
+                'decode_ms': round(self.decode_ms, 1),
+                'saved_ms': round(self.saved_ms, 1)
+            }
+
+
+# Shared by the Flask routes and the analysis modules
+image_cache = ImageCache()
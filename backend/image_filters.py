@@ -0,0 +1,149 @@
+import inspect
+
+import cv2
+import numpy as np
+
+
+def _odd(size):
+    size = max(1, int(round(size)))
+    return size + 1 if size % 2 == 0 else size
+
+
+def _gray(img):
+    if img.ndim == 2:
+        return img
+    code = cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(img, code)
+
+
+def lowpass(img, kernel_size=25, sigma=0):
+    """Gaussian blur"""
+    kernel_size = _odd(kernel_size)
+    return cv2.GaussianBlur(img, (kernel_size, kernel_size), sigma)
+
+
+def median(img, kernel_size=15):
+    return cv2.medianBlur(img, _odd(kernel_size))
+
+
+def edge_detect(img, low_threshold=100, high_threshold=200, blur_kernel=5):
+    """Canny edges of the blurred grey image"""
+    blur_kernel = _odd(blur_kernel)
+    blurred = cv2.GaussianBlur(_gray(img), (blur_kernel, blur_kernel), 0)
+    return cv2.Canny(blurred, low_threshold, high_threshold)
+
+
+# Laplacian used by edge emphasis and Laplacian sharpening
+LAPLACIAN_KERNEL = np.array([[0, -1, 0],
+                             [-1, 4, -1],
+                             [0, -1, 0]], dtype=np.float32)
+
+
+def edge_emphasis(img, strength=1.0):
+    """Add the Laplacian back onto the image"""
+    img_float = img.astype(np.float32) / 255.0
+    edges = cv2.filter2D(img_float, -1, LAPLACIAN_KERNEL)
+    emphasized = np.clip(img_float + edges * strength, 0, 1)
+    return (emphasized * 255).astype(np.uint8)
+
+
+def grayscale(img):
+    return _gray(img)
+
+
+def invert(img):
+    return cv2.bitwise_not(img)
+
+
+def thin(img, method='skeleton'):
+    """Skeleton of the Otsu-thresholded image, or a morphological opening"""
+    _, binary = cv2.threshold(_gray(img), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if method == 'skeleton':
+        skeleton = np.zeros(binary.shape, dtype=np.uint8)
+        element = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+        while True:
+            eroded = cv2.erode(binary, element)
+            temp = cv2.dilate(eroded, element)
+            temp = cv2.subtract(binary, temp)
+            skeleton = cv2.bitwise_or(skeleton, temp)
+            binary = eroded
+            if cv2.countNonZero(binary) == 0:
+                return skeleton
+    kernel = np.ones((3, 3), np.uint8)
+    return cv2.dilate(cv2.erode(binary, kernel, iterations=1), kernel, iterations=1)
+
+
+def threshold(img, threshold_type='otsu', value=None, scale=1.0):
+    gray = _gray(img)
+    blur = _odd(5 * scale)
+    if threshold_type == 'otsu':
+        blurred = cv2.GaussianBlur(gray, (blur, blur), 0)
+        return cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    if threshold_type == 'binary':
+        return cv2.threshold(gray, 127 if value is None else value, 255, cv2.THRESH_BINARY)[1]
+    if threshold_type == 'adaptive':
+        blurred = cv2.GaussianBlur(gray, (blur, blur), 0)
+        return cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                     max(3, _odd(11 * scale)), 2)
+    raise ValueError('Invalid threshold type. Use: otsu, binary, or adaptive')
+
+
+def sharpen(img, strength=1.0, method='unsharp', scale=1.0):
+    img_float = img.astype(np.float32) / 255.0
+    if method == 'unsharp':
+        detail = img_float - cv2.GaussianBlur(img_float, (0, 0), 2.0 * scale)
+    elif method == 'laplacian':
+        detail = cv2.filter2D(img_float, -1, LAPLACIAN_KERNEL)
+    elif method == 'gaussian':
+        detail = img_float - cv2.GaussianBlur(img_float, (0, 0), 1.0 * scale)
+    else:
+        raise ValueError('Invalid method. Use: unsharp, laplacian, or gaussian')
+    sharpened = np.clip(img_float + detail * strength, 0, 1)
+    return (sharpened * 255).astype(np.uint8)
+
+
+# Operation name -> (function, request parameter -> keyword argument, lengths in pixels).
+# Parameter names match the single-filter routes. The pixel lengths are
+# multiplied by the scale when an operation runs on a downscaled copy, so a
+# preview looks like the full-resolution result; 'scale' is passed through
+# to functions with fixed internal kernel sizes.
+FILTERS = {
+    'lowpass': (lowpass, {'kernelSize': 'kernel_size', 'sigma': 'sigma'}, ('kernel_size', 'sigma')),
+    'median': (median, {'kernelSize': 'kernel_size'}, ('kernel_size',)),
+    'edge-detect': (edge_detect, {'lowThreshold': 'low_threshold', 'highThreshold': 'high_threshold',
+                                  'blurKernel': 'blur_kernel'}, ('blur_kernel',)),
+    'edge-emphasis': (edge_emphasis, {'strength': 'strength'}, ()),
+    'grayscale': (grayscale, {}, ()),
+    'invert': (invert, {}, ()),
+    'thin': (thin, {'method': 'method'}, ()),
+    'threshold': (threshold, {'type': 'threshold_type', 'threshold': 'value'}, ('scale',)),
+    'sharpen': (sharpen, {'strength': 'strength', 'method': 'method'}, ('scale',))
+}
+
+
+def check_filter(op, params=None):
+    """Raise ValueError for an unknown operation or parameter"""
+    if op not in FILTERS:
+        raise ValueError(f"Unknown operation: {op}. Use: {', '.join(FILTERS)}")
+    unknown = set(params or {}) - set(FILTERS[op][1]) - {'op'}
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) for {op}: {', '.join(sorted(unknown))}")
+
+
+def apply_filter(img, op, params=None, scale=1.0):
+    """
+    Run one named operation with request-style (camelCase) parameters.
+    scale is the size of `img` relative to the image the parameters were
+    chosen for (e.g. 0.25 for a quarter-size preview).
+    """
+    check_filter(op, params)
+    func, names, lengths = FILTERS[op]
+    kwargs = {names[key]: value for key, value in (params or {}).items() if key in names}
+    if scale != 1.0:
+        defaults = inspect.signature(func).parameters
+        for name in lengths:
+            if name == 'scale':
+                kwargs['scale'] = scale
+            else:
+                kwargs[name] = float(kwargs.get(name, defaults[name].default)) * scale
+    return func(img, **kwargs)
@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class WriteJob:
+    """A single image queued for writing to disk"""
+
+    def __init__(self, job_id, image, path, params=None, on_complete=None):
+        self.id = job_id
+        self.image = image
+        self.path = path
+        self.params = params or []
+        self.on_complete = on_complete
+        self.status = 'queued'
+        self.error = None
+        self.submitted_at = time.time()
+        self.completed_at = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'path': self.path,
+            'status': self.status,
+            'error': self.error,
+            'write_ms': round((self.completed_at - self.submitted_at) * 1000, 2) if self.completed_at else None
+        }
+
+
+class ImageWriter:
+    """
+    Background image writer with a bounded queue.
+
+    Images are encoded and written on worker threads so request handlers can
+    return as soon as a frame is queued. Each file is written to a temporary
+    name and renamed into place, so readers never see a half-written image.
+    """
+
+    def __init__(self, workers=1, max_queue=8, max_history=256):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.max_history = max_history
+        self._jobs = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f'image-writer-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, image, path, params=None, on_complete=None, timeout=None):
+        """
+        Queue an image (ndarray, or already-encoded bytes) for writing.
+        Blocks up to timeout seconds when the queue is full and returns None
+        if it is still full; returns the queued WriteJob otherwise.
+        """
+        with self._lock:
+            self._next_id += 1
+            job = WriteJob(self._next_id, image, path, params, on_complete)
+            self._jobs[job.id] = job
+            self._pending[job.path] = job
+            self._prune_history()
+        try:
+            self._queue.put(job, block=timeout is not None and timeout > 0, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+                if self._pending.get(job.path) is job:
+                    del self._pending[job.path]
+            return None
+        return job
+
+    def _prune_history(self):
+        # Forget the oldest finished jobs so the status table stays bounded
+        excess = len(self._jobs) - self.max_history
+        if excess <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.done.is_set()][:excess]:
+            del self._jobs[job_id]
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_pending(self, path):
+        """Return the unfinished job writing to path, if any"""
+        with self._lock:
+            return self._pending.get(path)
+
+    def wait_for_path(self, path, timeout=10.0):
+        """Wait until any queued write to path has landed on disk"""
+        job = self.get_pending(path)
+        if job is None:
+            return True
+        return job.done.wait(timeout)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                break
+            try:
+                job.status = 'writing'
+                self._write(job)
+                job.status = 'done'
+            except Exception as e:
+                print(f"Error writing image {job.path}: {str(e)}")
+                job.status = 'error'
+                job.error = str(e)
+            finally:
+                job.completed_at = time.time()
+                job.image = None
+                with self._lock:
+                    if self._pending.get(job.path) is job:
+                        del self._pending[job.path]
+                job.done.set()
+                if job.on_complete:
+                    try:
+                        job.on_complete(job)
+                    except Exception as e:
+                        print(f"Error in write completion callback: {str(e)}")
+                self._queue.task_done()
+
+    def _write(self, job):
+        directory = os.path.dirname(job.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        name, ext = os.path.splitext(job.path)
+        temp_path = f"{name}.part{ext}"
+        try:
+            if isinstance(job.image, (bytes, bytearray)):
+                with open(temp_path, 'wb') as f:
+                    f.write(job.image)
+            else:
+                image = job.image
+                if ext.lower() in ('.jpg', '.jpeg') and image.dtype != np.uint8:
+                    # JPEG has no 16-bit mode
+                    image = cv2.convertScaleAbs(image, alpha=255.0 / np.iinfo(image.dtype).max)
+                if not cv2.imwrite(temp_path, image, job.params):
+                    raise IOError(f"cv2.imwrite failed for {job.path}")
+            os.replace(temp_path, job.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'pending': len(self._pending),
+                'max_queue': self._queue.maxsize
+            }
+
+    def shutdown(self, timeout=30.0):
+        """Flush queued writes and stop the worker threads"""
+        deadline = time.time() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.time()))
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.time()))
@@ -3,6 +3,7 @@ import numpy as np
 from flask import jsonify
 import os
 import urllib.parse
+from image_cache import image_cache
 
 class InclusionAnalyzer:
     def __init__(self):
@@ -48,7 +49,7 @@ class InclusionAnalyzer:
             abs_path = self._get_absolute_path(image_path)
             
             # Read image
-            img = cv2.imread(abs_path)
+            img = image_cache.read(abs_path)
             if img is None:
                 return {
                     'status': 'error',
@@ -56,7 +57,7 @@ class InclusionAnalyzer:
                 }
 
             # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = image_cache.gray(abs_path)
 
             # Create result structure
             results = {
@@ -0,0 +1,163 @@
+import threading
+import time
+
+import cv2
+
+from phase_analysis import measure_phases
+
+
+class LiveAnalysis:
+    """
+    Low-rate porosity/phase analysis of the live stream.
+
+    A background thread takes the newest frame from the frame hub a few
+    times per second, shrinks it to `max_width` and runs the same
+    threshold/contour pass as /api/porosity/analyze (or the intensity ranges
+    of /api/phase/analyze). Results are kept as compact JSON for SSE clients,
+    so the operator sees area fractions while moving the stage and only the
+    final field needs a full-resolution analysis.
+    """
+
+    MODES = ('porosity', 'phase')
+
+    def __init__(self, frame_hub, porosity_analyzer):
+        self.frame_hub = frame_hub
+        self.porosity_analyzer = porosity_analyzer
+        self.mode = 'porosity'
+        self.rate = 3.0
+        self.max_width = 640
+        self.params = {}
+        self.analysis_ms = 0.0
+        self._result = None
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, mode='porosity', rate=3.0, max_width=640, params=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported live analysis mode: {mode}. Use: {', '.join(self.MODES)}")
+        params = params or {}
+        if mode == 'phase' and not (params.get('configuration') or {}).get('phases'):
+            raise ValueError('Phase live analysis needs a configuration with phases')
+
+        self.stop()
+        self.mode = mode
+        # 0.5-10 Hz: enough for feedback while moving the stage without competing with capture
+        self.rate = min(max(float(rate or 3.0), 0.5), 10.0)
+        self.max_width = max(64, int(max_width or 640))
+        self.params = params
+        with self._condition:
+            self._result = None
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='live-analysis', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def _run(self):
+        period = 1.0 / self.rate
+        last_frame = 0
+        while not self._stop_event.is_set():
+            started = time.perf_counter()
+            packet = self.frame_hub.latest()
+            if packet is not None and packet.sequence != last_frame:
+                last_frame = packet.sequence
+                try:
+                    self._publish(self._analyze(packet))
+                except Exception as e:
+                    print(f"Error in live analysis: {str(e)}")
+            # Fixed rate regardless of how long the pass took
+            self._stop_event.wait(max(0.0, period - (time.perf_counter() - started)))
+
+    def _downscale(self, frame, full_width):
+        """Fit frame to max_width; scale is full-resolution pixels per pixel of the result"""
+        height, width = frame.shape[:2]
+        if width > self.max_width:
+            size = (self.max_width, max(1, int(round(height * self.max_width / width))))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return frame, full_width / frame.shape[1]
+
+    def _analyze(self, packet):
+        start = time.perf_counter()
+        # The preview is already display-sized (and host-binned), so the scale
+        # is taken against the full-resolution frame behind it
+        image, scale = self._downscale(packet.frame, packet.raw.shape[1])
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        height, width = image.shape[:2]
+        result = {
+            'mode': self.mode,
+            'frame_sequence': packet.sequence,
+            'timestamp': round(packet.timestamp, 6),
+            'size': [width, height]
+        }
+
+        if self.mode == 'porosity':
+            params = self.params
+            pores = self.porosity_analyzer.detect_pores(
+                image,
+                unit=params.get('unit', 'microns'),
+                features=params.get('features', 'dark'),
+                filter_settings=params.get('filter_settings'),
+                min_threshold=params.get('min_threshold', 0),
+                max_threshold=params.get('max_threshold', 255),
+                prep_method=params.get('prep_method'),
+                # Keep the full-resolution 50 px minimum pore size
+                min_area=50 / (scale * scale),
+                pixel_scale=scale
+            )
+            pore_pixels = sum(p['area'] for p in pores) / (scale * scale)
+            if params.get('unit', 'microns') == 'microns':
+                pore_pixels /= self.porosity_analyzer.calibration_factor ** 2
+            result.update({
+                'count': len(pores),
+                'area_fraction': round(100.0 * pore_pixels / (width * height), 3),
+                # Normalised [x, y, w, h] so the UI can overlay at any display size
+                'boxes': [[round(b[0] / width, 4), round(b[1] / height, 4),
+                           round(b[2] / width, 4), round(b[3] / height, 4)]
+                          for b in (p['bbox'] for p in pores)]
+            })
+        else:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            result['phases'] = measure_phases(
+                gray, self.params['configuration'],
+                self.params.get('min_intensity', 0), self.params.get('max_intensity', 255)
+            )
+
+        self.analysis_ms = (time.perf_counter() - start) * 1000
+        result['analysis_ms'] = round(self.analysis_ms, 2)
+        return result
+
+    def _publish(self, result):
+        with self._condition:
+            self._sequence += 1
+            result['sequence'] = self._sequence
+            self._result = result
+            self._condition.notify_all()
+
+    def wait_for_result(self, last_sequence=0, timeout=1.0):
+        """Block until a result newer than last_sequence exists"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._sequence > last_sequence, timeout):
+                return None
+            return self._result
+
+    def get_status(self):
+        with self._condition:
+            return {
+                'running': self.is_running(),
+                'mode': self.mode,
+                'rate': self.rate,
+                'max_width': self.max_width,
+                'latest': self._result
+            }
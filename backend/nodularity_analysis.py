@@ -8,6 +8,7 @@ import matplotlib.pyplot as plt
 from io import BytesIO
 import base64
 from porosity_analysis import PorosityAnalyzer
+from image_cache import image_cache
 from fpdf import FPDF
 from datetime import datetime
 
@@ -42,9 +43,10 @@ class NodularityAnalyzer(PorosityAnalyzer):
                 if prep_result['status'] == 'error':
                     return prep_result # Return error from prepare_image
                 # Use the prepared image for analysis
-                img = cv2.imread(prep_result['filepath'])
+                source_path = prep_result['filepath']
             else:
-                img = cv2.imread(abs_path)
+                source_path = abs_path
+            img = image_cache.read(source_path)
             
             if img is None:
                 return {
@@ -54,7 +56,7 @@ class NodularityAnalyzer(PorosityAnalyzer):
 
             # Create copies for processing and display
             display_img = img.copy()
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = image_cache.gray(source_path)
             height, width = gray.shape[:2] # Get dimensions for border filtering
 
             # Apply threshold
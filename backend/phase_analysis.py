@@ -4,6 +4,7 @@ from flask import jsonify
 import os
 from sklearn.cluster import KMeans
 from scipy import ndimage
+from image_cache import image_cache
 
 def analyze_phase(image_path, method='area_fraction', configuration=None, min_intensity=0, max_intensity=255):
     """
@@ -22,7 +23,7 @@ def analyze_phase(image_path, method='area_fraction', configuration=None, min_in
         print(f"Intensity thresholds: {min_intensity}-{max_intensity}")
 
         # Read image
-        img = cv2.imread(image_path)
+        img = image_cache.read(image_path)
         if img is None:
             print(f"Failed to read image at path: {image_path}")
             return {
@@ -31,9 +32,8 @@ def analyze_phase(image_path, method='area_fraction', configuration=None, min_in
             }
 
         # Convert to grayscale for intensity-based segmentation
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = image_cache.gray(image_path)
         height, width = gray.shape[:2]
-        total_pixels = height * width
         print(f"Image dimensions: {width}x{height}")
 
         if not configuration or 'phases' not in configuration:
@@ -43,46 +43,9 @@ def analyze_phase(image_path, method='area_fraction', configuration=None, min_in
                 'message': 'No valid configuration provided'
             }
 
-        results = {}
-        for phase in configuration['phases']:
-            try:
-                phase_name = phase.get('name')
-                if not phase_name:
-                    continue
-                print(f"Processing phase: {phase_name}")
-
-                # Use intensity range from phase config if present, else from global
-                intensity_range = phase.get('intensityRange', {'min': min_intensity, 'max': max_intensity})
-                phase_min = intensity_range.get('min', min_intensity)
-                phase_max = intensity_range.get('max', max_intensity)
-
-                # Create mask for pixels within intensity range
-                mask = cv2.inRange(gray, phase_min, phase_max)
-
-                # Apply shape filters if present
-                shape_filters = phase.get('shapeFilters', {})
-                if shape_filters:
-                    mask = apply_shape_filters(mask, shape_filters)
-
-                # Calculate phase area and percentage
-                phase_area = np.sum(mask > 0)
-                phase_percentage = (phase_area / total_pixels) * 100
-
-                print(f"Phase {phase_name} results:")
-                print(f"Area: {phase_area} pixels")
-                print(f"Percentage: {phase_percentage}%")
-
-                # Store results
-                results[phase_name] = {
-                    'percentage': round(phase_percentage, 2),
-                    'area': int(phase_area)
-                }
-
-            except Exception as phase_error:
-                print(f"Error processing phase {phase_name}: {str(phase_error)}")
-                results[phase_name] = {
-                    'error': str(phase_error)
-                }
+        results = measure_phases(gray, configuration, min_intensity, max_intensity)
+        for phase_name, phase_result in results.items():
+            print(f"Phase {phase_name} results: {phase_result}")
 
         return {
             'status': 'success',
@@ -96,6 +59,48 @@ def analyze_phase(image_path, method='area_fraction', configuration=None, min_in
             'message': str(e)
         }
 
+def measure_phases(gray, configuration, min_intensity=0, max_intensity=255):
+    """
+    Area fraction of each configured phase in a grayscale image array.
+    Returns {phase name: {'percentage', 'area'}} (or {'error'} for a failed phase).
+    """
+    total_pixels = gray.shape[0] * gray.shape[1]
+    results = {}
+    for phase in configuration['phases']:
+        phase_name = phase.get('name')
+        try:
+            if not phase_name:
+                continue
+
+            # Use intensity range from phase config if present, else from global
+            intensity_range = phase.get('intensityRange', {'min': min_intensity, 'max': max_intensity})
+            phase_min = intensity_range.get('min', min_intensity)
+            phase_max = intensity_range.get('max', max_intensity)
+
+            # Create mask for pixels within intensity range
+            mask = cv2.inRange(gray, phase_min, phase_max)
+
+            # Apply shape filters if present
+            shape_filters = phase.get('shapeFilters', {})
+            if shape_filters:
+                mask = apply_shape_filters(mask, shape_filters)
+
+            # Calculate phase area and percentage
+            phase_area = cv2.countNonZero(mask)
+            phase_percentage = (phase_area / total_pixels) * 100
+
+            results[phase_name] = {
+                'percentage': round(phase_percentage, 2),
+                'area': int(phase_area)
+            }
+
+        except Exception as phase_error:
+            print(f"Error processing phase {phase_name}: {str(phase_error)}")
+            results[phase_name] = {
+                'error': str(phase_error)
+            }
+    return results
+
 def create_color_mask(img, color_range, color_mode='rgb'):
     """
     Create a mask based on color range
@@ -0,0 +1,168 @@
+import bisect
+import threading
+import time
+
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is open-ended)
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 15, 20, 25, 30, 35, 40, 50, 66, 100, 200, 500, 1000, 2000)
+
+
+class _Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, value)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for i, n in enumerate(other.buckets):
+            self.buckets[i] += n
+
+    def percentile(self, pct):
+        """Estimate by linear interpolation inside the bucket holding the pct-th value"""
+        if not self.count:
+            return None
+        target = pct / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= target:
+                lower = LATENCY_BUCKETS_MS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max
+                value = lower + (upper - lower) * (target - seen) / n
+                return round(min(value, self.max), 3)
+            seen += n
+        return round(self.max, 3)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': round(self.max, 3)
+        }
+
+
+class _Second:
+    """Counters and histograms observed during one wall-clock second"""
+
+    def __init__(self, second):
+        self.second = second
+        self.counters = {}
+        self.histograms = {}
+
+
+class PipelineMetrics:
+    """
+    Counters, latency histograms and gauges for the frame pipeline.
+
+    Totals are kept since start-up; in addition every observation lands in a
+    per-second slot of a 60-slot ring, so a rolling summary over the last
+    minute costs a merge of at most 60 small slots. Histograms use fixed
+    buckets, which keeps observe() O(log buckets) with no per-sample storage.
+    Gauges are callables evaluated when a snapshot is taken.
+    """
+
+    def __init__(self, window=60):
+        self.window = int(window)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._total_histograms = {}
+        self._slots = [None] * self.window
+        self._gauges = {}
+
+    def _slot(self, now):
+        second = int(now)
+        index = second % self.window
+        slot = self._slots[index]
+        if slot is None or slot.second != second:
+            slot = self._slots[index] = _Second(second)
+        return slot
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._totals[name] = self._totals.get(name, 0) + amount
+            counters = self._slot(time.time()).counters
+            counters[name] = counters.get(name, 0) + amount
+
+    def observe(self, name, value_ms):
+        with self._lock:
+            histogram = self._total_histograms.get(name)
+            if histogram is None:
+                histogram = self._total_histograms[name] = _Histogram()
+            histogram.observe(value_ms)
+            histograms = self._slot(time.time()).histograms
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = _Histogram()
+            histogram.observe(value_ms)
+
+    def register_gauge(self, name, fn):
+        self._gauges[name] = fn
+
+    def _gauge_values(self):
+        values = {}
+        for name, fn in self._gauges.items():
+            try:
+                values[name] = fn()
+            except Exception as e:
+                values[name] = None
+                print(f"Error reading gauge {name}: {str(e)}")
+        return values
+
+    def snapshot(self, window=None):
+        """Totals since start-up plus a rolling summary of the last `window` seconds"""
+        window = min(max(1, int(window or self.window)), self.window)
+        now = time.time()
+        oldest = int(now) - window + 1
+        counters = {}
+        histograms = {}
+        with self._lock:
+            for slot in self._slots:
+                if slot is None or slot.second < oldest:
+                    continue
+                for name, value in slot.counters.items():
+                    counters[name] = counters.get(name, 0) + value
+                for name, histogram in slot.histograms.items():
+                    merged = histograms.get(name)
+                    if merged is None:
+                        merged = histograms[name] = _Histogram()
+                    merged.merge(histogram)
+            totals = dict(self._totals)
+            total_histograms = {name: h.summary() for name, h in self._total_histograms.items()}
+
+        # Rates are per second over the part of the window the server has been up
+        elapsed = min(window, max(1.0, now - self.started_at))
+        return {
+            'uptime': round(now - self.started_at, 1),
+            'window_seconds': window,
+            'rolling': {
+                'counters': {name: {'count': value, 'per_second': round(value / elapsed, 3)}
+                             for name, value in counters.items()},
+                'latency_ms': {name: h.summary() for name, h in histograms.items()}
+            },
+            'totals': {
+                'counters': totals,
+                'latency_ms': total_histograms
+            },
+            'gauges': self._gauge_values()
+        }
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._totals = {}
+            self._total_histograms = {}
+            self._slots = [None] * self.window
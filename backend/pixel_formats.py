@@ -0,0 +1,117 @@
+import cv2
+import numpy as np
+
+from PixelType_header import *
+
+
+# OpenCV names Bayer codes after the second row of the pattern, so a GenICam
+# "BayerRG" (RGGB) sensor needs COLOR_BayerBG2BGR and so on.
+_BAYER_CODES = {
+    'RG': cv2.COLOR_BayerBG2BGR,
+    'BG': cv2.COLOR_BayerRG2BGR,
+    'GR': cv2.COLOR_BayerGB2BGR,
+    'GB': cv2.COLOR_BayerGR2BGR,
+}
+
+# pixel type -> (name, layout, significant bits, bayer pattern)
+PIXEL_FORMATS = {
+    PixelType_Gvsp_Mono8: ('Mono8', 'mono', 8, None),
+    PixelType_Gvsp_Mono10: ('Mono10', 'mono', 10, None),
+    PixelType_Gvsp_Mono12: ('Mono12', 'mono', 12, None),
+    PixelType_Gvsp_Mono16: ('Mono16', 'mono', 16, None),
+    PixelType_Gvsp_Mono10_Packed: ('Mono10 Packed', 'packed', 10, None),
+    PixelType_Gvsp_Mono12_Packed: ('Mono12 Packed', 'packed', 12, None),
+    PixelType_Gvsp_RGB8_Packed: ('RGB8', 'rgb', 8, None),
+    PixelType_Gvsp_BGR8_Packed: ('BGR8', 'bgr', 8, None),
+    PixelType_Gvsp_YUV422_Packed: ('YUV422', 'uyvy', 8, None),
+    PixelType_Gvsp_YUV422_YUYV_Packed: ('YUV422 YUYV', 'yuyv', 8, None),
+}
+
+for _pattern in ('GR', 'RG', 'GB', 'BG'):
+    for _bits in (8, 10, 12, 16):
+        PIXEL_FORMATS[globals()[f'PixelType_Gvsp_Bayer{_pattern}{_bits}']] = (
+            f'Bayer{_pattern}{_bits}', 'mono', _bits, _pattern)
+    for _bits in (10, 12):
+        PIXEL_FORMATS[globals()[f'PixelType_Gvsp_Bayer{_pattern}{_bits}_Packed']] = (
+            f'Bayer{_pattern}{_bits} Packed', 'packed', _bits, _pattern)
+
+
+def pixel_format_name(pixel_type):
+    info = PIXEL_FORMATS.get(pixel_type)
+    return info[0] if info else f'Unknown (0x{int(pixel_type):08x})'
+
+
+def unpack_10bit(data, count):
+    """Unpack GVSP Mono10Packed: 2 pixels in 3 bytes, low bits share the middle byte"""
+    groups = (count + 1) // 2
+    b = data[:groups * 3].reshape(-1, 3).astype(np.uint16)
+    out = np.empty((groups, 2), dtype=np.uint16)
+    out[:, 0] = (b[:, 0] << 2) | (b[:, 1] & 0x03)
+    out[:, 1] = (b[:, 2] << 2) | ((b[:, 1] >> 4) & 0x03)
+    return out.reshape(-1)[:count]
+
+
+def unpack_12bit(data, count):
+    """Unpack GVSP Mono12Packed: 2 pixels in 3 bytes, low nibbles share the middle byte"""
+    groups = (count + 1) // 2
+    b = data[:groups * 3].reshape(-1, 3).astype(np.uint16)
+    out = np.empty((groups, 2), dtype=np.uint16)
+    out[:, 0] = (b[:, 0] << 4) | (b[:, 1] & 0x0F)
+    out[:, 1] = (b[:, 2] << 4) | (b[:, 1] >> 4)
+    return out.reshape(-1)[:count]
+
+
+def to_preview(frame):
+    """8-bit copy of a frame for display/JPEG; 16-bit frames are MSB-aligned"""
+    if frame.dtype == np.uint8:
+        return frame
+    return (frame >> 8).astype(np.uint8)
+
+
+def convert_frame(data, width, height, pixel_type):
+    """
+    Convert a raw SDK buffer (flat uint8 array) to a frame.
+
+    Returns (frame, preview). `frame` keeps the sensor's full bit depth:
+    8-bit formats stay uint8, deeper formats become uint16 with the
+    significant bits shifted to the top so 16-bit PNG/TIFF viewers show them
+    correctly. `preview` is an 8-bit BGR or grey image for display.
+    Mono8/BGR8 and unpacked 16-bit mono formats are returned as views of
+    `data` (no copy); packed, Bayer and YUV formats are converted into new arrays.
+    """
+    info = PIXEL_FORMATS.get(pixel_type)
+    if info is None:
+        # Unknown format: fall back to the historic packed 8-bit interpretation
+        frame = data.reshape((height, width, -1))
+        return frame, frame
+
+    name, layout, bits, bayer = info
+    count = width * height
+
+    if layout == 'bgr':
+        frame = data[:count * 3].reshape((height, width, 3))
+        return frame, frame
+    if layout == 'rgb':
+        frame = cv2.cvtColor(data[:count * 3].reshape((height, width, 3)), cv2.COLOR_RGB2BGR)
+        return frame, frame
+    if layout in ('uyvy', 'yuyv'):
+        code = cv2.COLOR_YUV2BGR_UYVY if layout == 'uyvy' else cv2.COLOR_YUV2BGR_YUYV
+        frame = cv2.cvtColor(data[:count * 2].reshape((height, width, 2)), code)
+        return frame, frame
+
+    if layout == 'packed':
+        unpack = unpack_10bit if bits == 10 else unpack_12bit
+        frame = unpack(data, count).reshape((height, width))
+    elif bits == 8:
+        frame = data[:count].reshape((height, width))
+    else:
+        # 10/12/16-bit values in little-endian 16-bit containers
+        frame = data[:count * 2].view('<u2').reshape((height, width))
+
+    if bayer:
+        frame = cv2.cvtColor(frame, _BAYER_CODES[bayer])
+
+    if bits > 8 and bits < 16:
+        np.left_shift(frame, 16 - bits, out=frame)
+
+    return frame, to_preview(frame)
@@ -8,6 +8,7 @@ import matplotlib.pyplot as plt
 from io import BytesIO
 import base64
 import urllib.parse
+from image_cache import image_cache
 
 class PorosityAnalyzer:
     def __init__(self):
@@ -95,149 +96,25 @@ class PorosityAnalyzer:
                 }
 
             # Read and validate image
-            image = cv2.imread(image_path)
+            image = image_cache.read(image_path)
             if image is None:
                 return {
                     'status': 'error',
                     'message': f'Failed to read image: {image_path}'
                 }
 
-            height, width = image.shape[:2]
             original_color = image.copy()  # Always keep the original color image for annotation
-
-            # Prepare grayscale image for intensity calculation
-            gray_for_intensity = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-            all_results = []
-            # --- HSV Color-based Detection for colored circles ---
-            if prep_method == 'color':
-                hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-                lower = np.array([0, 50, 50])
-                upper = np.array([180, 255, 255])
-                mask = cv2.inRange(hsv, lower, upper)
-                kernel = np.ones((5, 5), np.uint8)
-                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-                mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-                contours, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-                for i, contour in enumerate(contours):
-                    try:
-                        area = cv2.contourArea(contour)
-                        perimeter = cv2.arcLength(contour, True)
-                        x, y, w, h = cv2.boundingRect(contour)
-                        image_area = height * width
-                        if area / image_area > 0.90 or area < 50:
-                            continue
-                        M = cv2.moments(contour)
-                        if M["m00"] != 0:
-                            cx = int(M["m10"] / M["m00"])
-                            cy = int(M["m01"] / M["m00"])
-                        else:
-                            cx = x + w//2
-                            cy = y + h//2
-                        center_x = (cx / width) * 100
-                        center_y = (cy / height) * 100
-                        circularity = 4 * np.pi * area / (perimeter * perimeter) if perimeter > 0 else 0
-                        equivalent_diameter = np.sqrt(4 * area / np.pi)
-                        if unit == 'microns':
-                            length = h * self.calibration_factor
-                            width_val = equivalent_diameter * self.calibration_factor
-                            area_val = area * (self.calibration_factor ** 2)
-                            perimeter_val = perimeter * self.calibration_factor
-                        else:
-                            length = h
-                            width_val = equivalent_diameter
-                            area_val = area
-                            perimeter_val = perimeter
-                        mask_pore = np.zeros(gray_for_intensity.shape, np.uint8)
-                        cv2.drawContours(mask_pore, [contour], -1, 255, -1)
-                        mean_intensity = cv2.mean(gray_for_intensity, mask=mask_pore)[0]
-                        all_results.append({
-                            'id': 0,  # will be set after filtering
-                            'length': round(length, 2),
-                            'width': round(width_val, 2),
-                            'area': round(area_val, 2),
-                            'circ': round(circularity, 2),
-                            'per': round(perimeter_val, 2),
-                            'q': 0,
-                            'x': round(center_x, 2),
-                            'y': round(center_y, 2),
-                            'bbox': [x, y, w, h],
-                            'mean_intensity': round(mean_intensity, 2)
-                        })
-                    except Exception as e:
-                        print(f"Error processing color contour {i}: {str(e)}")
-                        continue
-            else:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                if features == 'dark':
-                    gray = 255 - gray
-                _, binary_min = cv2.threshold(gray, min_threshold, 255, cv2.THRESH_BINARY)
-                _, binary_max = cv2.threshold(gray, max_threshold, 255, cv2.THRESH_BINARY_INV)
-                binary = cv2.bitwise_and(binary_min, binary_max)
-                contours, _ = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-                for i, contour in enumerate(contours):
-                    try:
-                        area = cv2.contourArea(contour)
-                        perimeter = cv2.arcLength(contour, True)
-                        x, y, w, h = cv2.boundingRect(contour)
-                        image_area = height * width
-                        if area / image_area > 0.90 or area < 50:
-                            continue
-                        M = cv2.moments(contour)
-                        if M["m00"] != 0:
-                            cx = int(M["m10"] / M["m00"])
-                            cy = int(M["m01"] / M["m00"])
-                        else:
-                            cx = x + w//2
-                            cy = y + h//2
-                        center_x = (cx / width) * 100
-                        center_y = (cy / height) * 100
-                        circularity = 4 * np.pi * area / (perimeter * perimeter) if perimeter > 0 else 0
-                        equivalent_diameter = np.sqrt(4 * area / np.pi)
-                        if unit == 'microns':
-                            length = h * self.calibration_factor
-                            width_val = equivalent_diameter * self.calibration_factor
-                            area_val = area * (self.calibration_factor ** 2)
-                            perimeter_val = perimeter * self.calibration_factor
-                        else:
-                            length = h
-                            width_val = equivalent_diameter
-                            area_val = area
-                            perimeter_val = perimeter
-                        mask_pore = np.zeros(gray_for_intensity.shape, np.uint8)
-                        cv2.drawContours(mask_pore, [contour], -1, 255, -1)
-                        mean_intensity = cv2.mean(gray_for_intensity, mask=mask_pore)[0]
-                        all_results.append({
-                            'id': 0,  # will be set after filtering
-                            'length': round(length, 2),
-                            'width': round(width_val, 2),
-                            'area': round(area_val, 2),
-                            'circ': round(circularity, 2),
-                            'per': round(perimeter_val, 2),
-                            'q': 0,
-                            'x': round(center_x, 2),
-                            'y': round(center_y, 2),
-                            'bbox': [x, y, w, h],
-                            'mean_intensity': round(mean_intensity, 2)
-                        })
-                    except Exception as e:
-                        print(f"Error processing contour {i}: {str(e)}")
-                        continue
-
-            # Now filter all_results by intensity and filter_settings
-            filtered_results = []
-            for pore in all_results:
-                # Intensity threshold
-                if not (min_threshold <= pore['mean_intensity'] <= max_threshold):
-                    continue
-                # Other filters
-                if filter_settings:
-                    if not self._validate_pore_against_filters(pore['length'], pore['width'], pore['area'], pore['circ'], filter_settings):
-                        continue
-                filtered_results.append(pore)
-            # Re-assign IDs
-            for idx, pore in enumerate(filtered_results):
-                pore['id'] = idx + 1
+            filtered_results = self.detect_pores(
+                image,
+                unit=unit,
+                features=features,
+                filter_settings=filter_settings,
+                min_threshold=min_threshold,
+                max_threshold=max_threshold,
+                prep_method=prep_method,
+                gray=image_cache.gray(image_path),
+                hsv=image_cache.hsv(image_path) if prep_method == 'color' else None
+            )
 
             if not filtered_results:
                 return {
@@ -270,6 +147,100 @@ class PorosityAnalyzer:
                 'message': f'Error analyzing image: {str(e)}'
             }
 
+    def detect_pores(self, image, unit='microns', features='dark', filter_settings=None, min_threshold=0, max_threshold=255, prep_method=None, min_area=50, pixel_scale=1.0,
+                     gray=None, hsv=None):
+        """
+        Detect and measure pores in a BGR image array.
+        min_area is in pixels of this image; pixel_scale is the number of
+        original pixels per image pixel, so measurements on a downscaled copy
+        stay in original units. gray/hsv are conversions of `image` the caller
+        already has (e.g. from the image cache). Returns the filtered pores
+        with ids assigned.
+        """
+        height, width = image.shape[:2]
+
+        # Prepare grayscale image for intensity calculation
+        gray_for_intensity = gray if gray is not None else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        # --- HSV Color-based Detection for colored circles ---
+        if prep_method == 'color':
+            if hsv is None:
+                hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            lower = np.array([0, 50, 50])
+            upper = np.array([180, 255, 255])
+            mask = cv2.inRange(hsv, lower, upper)
+            kernel = np.ones((5, 5), np.uint8)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+            contour_label = 'color contour'
+        else:
+            gray = gray_for_intensity
+            if features == 'dark':
+                gray = 255 - gray
+            _, binary_min = cv2.threshold(gray, min_threshold, 255, cv2.THRESH_BINARY)
+            _, binary_max = cv2.threshold(gray, max_threshold, 255, cv2.THRESH_BINARY_INV)
+            mask = cv2.bitwise_and(binary_min, binary_max)
+            contour_label = 'contour'
+        contours, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+        scale = self.calibration_factor * pixel_scale if unit == 'microns' else pixel_scale
+        image_area = height * width
+        all_results = []
+        for i, contour in enumerate(contours):
+            try:
+                area = cv2.contourArea(contour)
+                perimeter = cv2.arcLength(contour, True)
+                x, y, w, h = cv2.boundingRect(contour)
+                if area / image_area > 0.90 or area < min_area:
+                    continue
+                M = cv2.moments(contour)
+                if M["m00"] != 0:
+                    cx = int(M["m10"] / M["m00"])
+                    cy = int(M["m01"] / M["m00"])
+                else:
+                    cx = x + w//2
+                    cy = y + h//2
+                center_x = (cx / width) * 100
+                center_y = (cy / height) * 100
+                circularity = 4 * np.pi * area / (perimeter * perimeter) if perimeter > 0 else 0
+                equivalent_diameter = np.sqrt(4 * area / np.pi)
+                # Mean intensity over the pore, masked within its bounding box only
+                mask_pore = np.zeros((h, w), np.uint8)
+                cv2.drawContours(mask_pore, [contour], -1, 255, -1, offset=(-x, -y))
+                mean_intensity = cv2.mean(gray_for_intensity[y:y + h, x:x + w], mask=mask_pore)[0]
+                all_results.append({
+                    'id': 0,  # will be set after filtering
+                    'length': round(h * scale, 2),
+                    'width': round(equivalent_diameter * scale, 2),
+                    'area': round(area * scale ** 2, 2),
+                    'circ': round(circularity, 2),
+                    'per': round(perimeter * scale, 2),
+                    'q': 0,
+                    'x': round(center_x, 2),
+                    'y': round(center_y, 2),
+                    'bbox': [x, y, w, h],
+                    'mean_intensity': round(mean_intensity, 2)
+                })
+            except Exception as e:
+                print(f"Error processing {contour_label} {i}: {str(e)}")
+                continue
+
+        # Now filter all_results by intensity and filter_settings
+        filtered_results = []
+        for pore in all_results:
+            # Intensity threshold
+            if not (min_threshold <= pore['mean_intensity'] <= max_threshold):
+                continue
+            # Other filters
+            if filter_settings:
+                if not self._validate_pore_against_filters(pore['length'], pore['width'], pore['area'], pore['circ'], filter_settings):
+                    continue
+            filtered_results.append(pore)
+        # Re-assign IDs
+        for idx, pore in enumerate(filtered_results):
+            pore['id'] = idx + 1
+        return filtered_results
+
     def _validate_pore_against_filters(self, length, width, area, circularity, filter_settings):
         """Validate a pore against the provided filter settings"""
         try:
@@ -335,7 +306,7 @@ class PorosityAnalyzer:
         """
         try:
             # Read image
-            img = cv2.imread(image_path)
+            img = image_cache.read(image_path)
             if img is None:
                 return {
                     'status': 'error',
@@ -344,17 +315,17 @@ class PorosityAnalyzer:
 
             # Apply selected preparation method
             if prep_option == 'threshold':
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                gray = image_cache.gray(image_path)
                 processed = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
             elif prep_option == 'edge_detect':
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                gray = image_cache.gray(image_path)
                 processed = cv2.Canny(gray, 100, 200)
             elif prep_option == 'adaptive':
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                gray = image_cache.gray(image_path)
                 processed = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
                                                cv2.THRESH_BINARY, 11, 2)
             elif prep_option == 'morphological':
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                gray = image_cache.gray(image_path)
                 _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
                 kernel = np.ones((3,3), np.uint8)
                 processed = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
@@ -496,10 +467,10 @@ class PorosityAnalyzer:
     def get_image_histogram_data(self, image_path):
         """Generate histogram data for a given image's grayscale intensity."""
         try:
-            img = cv2.imread(image_path)
+            img = image_cache.read(image_path)
             if img is None:
                 return {'status': 'error', 'message': 'Failed to read image'}
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = image_cache.gray(image_path)
             hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
             return {
                 'status': 'success',
@@ -512,11 +483,11 @@ class PorosityAnalyzer:
     def apply_intensity_threshold(self, image_path, min_threshold, max_threshold, features='dark'):
         """Apply intensity thresholding to an image and return the processed image (binary mask)."""
         try:
-            img = cv2.imread(image_path)
+            img = image_cache.read(image_path)
             if img is None:
                 return {'status': 'error', 'message': 'Failed to read image'}
             
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = image_cache.gray(image_path)
             if features == 'dark':
                 gray = 255 - gray # Invert for dark features
 
@@ -0,0 +1,329 @@
+import json
+import mmap
+import os
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from PixelType_header import *
+from pixel_formats import PIXEL_FORMATS, convert_frame, pixel_format_name
+
+
+# One fixed-size record per frame in index.bin
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('segment', '<u4'),
+    ('nbytes', '<u4'),
+    ('offset', '<u8'),
+    ('width', '<u4'),
+    ('height', '<u4'),
+    ('pixel_type', '<u4'),
+    ('reserved', '<u4')
+])
+# Frames start on page boundaries so reader views are aligned
+FRAME_ALIGNMENT = 4096
+
+
+def frame_pixel_type(frame):
+    """Pixel type for a decoded frame from a webcam or the virtual camera"""
+    if frame.ndim == 3:
+        return PixelType_Gvsp_BGR8_Packed
+    return PixelType_Gvsp_Mono16 if frame.dtype == np.uint16 else PixelType_Gvsp_Mono8
+
+
+class RawRecorder:
+    """
+    Appends uncompressed frames to preallocated, memory-mapped segment files.
+
+    Each frame is one memcpy into the mapped segment, with no encoding and no
+    write() system call on the capture thread; the OS writes dirty pages back
+    in the background. When a segment is full it is trimmed to its used size
+    and the next one is preallocated. index.bin gets a fixed-size record per
+    frame (segment, offset, size, dimensions, pixel type, timestamp), so a
+    reader can map any frame without scanning the data. The index is flushed
+    at every segment change and at least once a second, so a crash loses at
+    most the last second of index records.
+    """
+
+    def __init__(self, directory, segment_bytes=1 << 30, max_bytes=None):
+        self.directory = directory
+        self.segment_bytes = int(segment_bytes)
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.frames = 0
+        # Gaps in the camera's frame numbers (frames the SDK never delivered)
+        self.skipped = 0
+        self._last_frame_number = None
+        self.bytes_written = 0
+        self.started_at = time.time()
+        self.stopped_at = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._segment = -1
+        self._file = None
+        self._map = None
+        self._view = None
+        self._offset = 0
+        self._index_flushed_at = time.time()
+
+        os.makedirs(directory, exist_ok=True)
+        self._index = open(os.path.join(directory, 'index.bin'), 'wb')
+        self._write_metadata()
+
+    @property
+    def active(self):
+        return self.stopped_at is None
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment_{segment:04d}.raw")
+
+    def _open_segment(self, size):
+        self._close_segment()
+        self._flush_index()
+        self._segment += 1
+        self._file = open(self._segment_path(self._segment), 'w+b')
+        size = max(self.segment_bytes, size)
+        if hasattr(os, 'posix_fallocate'):
+            # Reserve the blocks now rather than on first touch of each page
+            os.posix_fallocate(self._file.fileno(), 0, size)
+        else:
+            self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._view = np.frombuffer(self._map, dtype=np.uint8)
+        self._offset = 0
+
+    def _close_segment(self):
+        if self._map is None:
+            return
+        self._view = None
+        self._map.flush()
+        self._map.close()
+        # Drop the unused preallocated tail
+        self._file.truncate(self._offset)
+        self._file.close()
+        self._map = None
+        self._file = None
+
+    def append(self, data, width, height, pixel_type, timestamp, frame_number=None):
+        """Copy one frame (SDK buffer or decoded array) into the current segment"""
+        with self._lock:
+            if not self.active:
+                return False
+            if frame_number is not None:
+                if self._last_frame_number is not None and frame_number > self._last_frame_number + 1:
+                    self.skipped += frame_number - self._last_frame_number - 1
+                self._last_frame_number = frame_number
+            nbytes = int(data.nbytes)
+            if self.max_bytes and self.bytes_written + nbytes > self.max_bytes:
+                self._stop('Recording size limit reached')
+                return False
+            try:
+                if self._map is None or self._offset + nbytes > len(self._map):
+                    self._open_segment(nbytes)
+                offset = self._offset
+                target = self._view[offset:offset + nbytes]
+                if data.flags.c_contiguous:
+                    target[:] = data.reshape(-1).view(np.uint8)
+                else:
+                    # Strided ROI views are gathered straight into the map
+                    np.copyto(target.view(data.dtype).reshape(data.shape), data)
+                record = np.zeros(1, dtype=INDEX_DTYPE)
+                record[0] = (timestamp, self._segment, nbytes, offset, width, height, pixel_type, 0)
+                self._index.write(record.tobytes())
+                self._offset = offset + (nbytes + FRAME_ALIGNMENT - 1) // FRAME_ALIGNMENT * FRAME_ALIGNMENT
+                self.frames += 1
+                self.bytes_written += nbytes
+                if time.time() - self._index_flushed_at >= 1.0:
+                    self._flush_index()
+                return True
+            except Exception as e:
+                print(f"Error writing raw frame: {str(e)}")
+                self._stop(str(e))
+                return False
+
+    def _flush_index(self):
+        self._index.flush()
+        self._index_flushed_at = time.time()
+
+    def _write_metadata(self):
+        metadata = {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'stopped_at': datetime.fromtimestamp(self.stopped_at).isoformat() if self.stopped_at else None,
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'bytes': self.bytes_written,
+            'segments': self._segment + 1,
+            'error': self.error
+        }
+        with open(os.path.join(self.directory, 'recording.json'), 'w') as f:
+            json.dump(metadata, f, indent=4)
+
+    def _stop(self, error=None):
+        if not self.active:
+            return
+        self.error = error
+        self.stopped_at = time.time()
+        self._close_segment()
+        self._index.close()
+        self._write_metadata()
+
+    def stop(self):
+        with self._lock:
+            self._stop()
+
+    def get_status(self):
+        with self._lock:
+            elapsed = (self.stopped_at or time.time()) - self.started_at
+            return {
+                'directory': self.directory,
+                'active': self.active,
+                'frames': self.frames,
+                'skipped': self.skipped,
+                'bytes': self.bytes_written,
+                'segments': self._segment + 1,
+                'elapsed': round(elapsed, 2),
+                'fps': round(self.frames / elapsed, 2) if elapsed > 0 else 0.0,
+                'mb_per_second': round(self.bytes_written / elapsed / 1e6, 2) if elapsed > 0 else 0.0,
+                'error': self.error
+            }
+
+
+class RawRecording:
+    """
+    Read access to a recording written by RawRecorder.
+
+    Segments are memory-mapped read-only, so frame(i) is a zero-copy NumPy
+    view of the stored bytes (shaped as an image for Mono8/Mono16/BGR8,
+    flat for packed, Bayer and YUV formats). decode(i) converts any stored
+    format to a full-bit-depth frame with the live pipeline's converter.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        index_path = os.path.join(directory, 'index.bin')
+        if not os.path.exists(index_path):
+            raise ValueError(f"Not a raw recording: {directory}")
+        self.index = np.fromfile(index_path, dtype=INDEX_DTYPE)
+        self._segments = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def timestamps(self):
+        return self.index['timestamp']
+
+    def _segment(self, segment):
+        data = self._segments.get(segment)
+        if data is None:
+            path = os.path.join(self.directory, f"segment_{segment:04d}.raw")
+            data = self._segments[segment] = np.memmap(path, dtype=np.uint8, mode='r')
+        return data
+
+    def raw(self, i):
+        """Flat uint8 view of frame i exactly as recorded"""
+        entry = self.index[i]
+        offset = int(entry['offset'])
+        return self._segment(int(entry['segment']))[offset:offset + int(entry['nbytes'])]
+
+    def frame(self, i):
+        """Zero-copy view of frame i, image-shaped where the format allows it"""
+        entry = self.index[i]
+        data = self.raw(i)
+        width, height, pixel_type = int(entry['width']), int(entry['height']), int(entry['pixel_type'])
+        if pixel_type == PixelType_Gvsp_BGR8_Packed:
+            return data.reshape((height, width, 3))
+        if pixel_type == PixelType_Gvsp_Mono8:
+            return data.reshape((height, width))
+        if pixel_type == PixelType_Gvsp_Mono16:
+            return data.view('<u2').reshape((height, width))
+        return data
+
+    def decode(self, i):
+        """Frame i converted to BGR/grey at full bit depth (a copy unless already image-shaped)"""
+        entry = self.index[i]
+        pixel_type = int(entry['pixel_type'])
+        data = self.raw(i)
+        info = PIXEL_FORMATS.get(pixel_type)
+        if info and info[1] == 'mono' and 8 < info[2] < 16 and not info[3]:
+            # The converter shifts unpacked 10/12-bit data in place
+            data = data.copy()
+        frame, _ = convert_frame(data, int(entry['width']), int(entry['height']), pixel_type)
+        return frame
+
+    def get_info(self):
+        info = {'directory': self.directory, 'frames': len(self)}
+        if len(self):
+            first, last = self.index[0], self.index[-1]
+            duration = float(last['timestamp'] - first['timestamp'])
+            info.update({
+                'width': int(first['width']),
+                'height': int(first['height']),
+                'pixel_format': pixel_format_name(int(first['pixel_type'])),
+                'duration': round(duration, 3),
+                'fps': round((len(self) - 1) / duration, 2) if duration > 0 else None,
+                'bytes': int(self.index['nbytes'].sum())
+            })
+        metadata_path = os.path.join(self.directory, 'recording.json')
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                info['metadata'] = json.load(f)
+        return info
+
+    def _range(self, start, stop):
+        start = max(0, int(start or 0))
+        stop = min(len(self), int(stop)) if stop else len(self)
+        return range(start, stop)
+
+    def export_avi(self, path, start=0, stop=None, fps=None):
+        """
+        Write frames [start, stop) to an MJPG AVI at the recorded (or given)
+        rate. VideoWriter silently drops frames of another size, so a range
+        spanning a size change (ROI, binning) is refused up front.
+        """
+        frames = self._range(start, stop)
+        if not len(frames):
+            raise ValueError('No frames in the requested range')
+        entries = self.index[frames.start:frames.stop]
+        changes = np.flatnonzero((entries['width'][1:] != entries['width'][:-1])
+                                 | (entries['height'][1:] != entries['height'][:-1]))
+        if len(changes):
+            first = frames.start + int(changes[0]) + 1
+            before, after = entries[changes[0]], entries[changes[0] + 1]
+            raise ValueError(f"Frame size changes at frame {first} ({before['width']}x{before['height']} "
+                             f"to {after['width']}x{after['height']}); export [{frames.start}, {first}) "
+                             f"and [{first}, {frames.stop}) separately")
+        if not fps:
+            duration = float(self.timestamps[frames[-1]] - self.timestamps[frames[0]])
+            fps = (len(frames) - 1) / duration if duration > 0 else 30.0
+        writer = None
+        try:
+            for i in frames:
+                frame = self.decode(i)
+                if frame.dtype != np.uint8:
+                    frame = (frame >> 8).astype(np.uint8)
+                if frame.ndim == 2:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), float(fps), (width, height))
+                    if not writer.isOpened():
+                        raise ValueError(f"Failed to open video writer: {path}")
+                writer.write(frame)
+        finally:
+            if writer is not None:
+                writer.release()
+        return len(frames)
+
+    def export_png(self, directory, start=0, stop=None):
+        """Write frames [start, stop) as lossless PNGs (16-bit where recorded deeper than 8 bits)"""
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for i in self._range(start, stop):
+            path = os.path.join(directory, f"frame_{i:06d}.png")
+            if not cv2.imwrite(path, self.decode(i), [cv2.IMWRITE_PNG_COMPRESSION, 1]):
+                raise ValueError(f"Failed to write {path}")
+            files.append(path)
+        return files
@@ -0,0 +1,126 @@
+from MvCameraControl_class import *
+
+
+class SensorROI:
+    """
+    Programs a region of interest and binning/decimation on a HIKROBOT camera.
+
+    Reading out only part of the sensor (and combining pixels on the camera)
+    cuts link bandwidth and host CPU in proportion to the pixel count, and on
+    most sensors raises the maximum frame rate. Width/Height/Offset can only
+    be changed while the camera is not grabbing, so callers stop grabbing
+    around apply() and reset().
+
+    Regions are given in full-resolution sensor pixels; with binning or
+    decimation they are divided by the factor before being written.
+    """
+
+    BINNING_MODES = ('binning', 'decimation')
+
+    def __init__(self, camera):
+        self.camera = camera
+
+    def _get_int(self, key):
+        value = MVCC_INTVALUE()
+        ret = self.camera.MV_CC_GetIntValue(key, value)
+        return value if ret == 0 else None
+
+    def _set_int(self, key, value):
+        ret = self.camera.MV_CC_SetIntValue(key, int(value))
+        if ret != 0:
+            print(f"Failed to set {key}={value} (error code: {ret})")
+        return ret == 0
+
+    @staticmethod
+    def _align(value, info):
+        """Clamp value to the node's range and round down to its increment"""
+        value = min(max(int(value), info.nMin), info.nMax)
+        step = max(1, info.nInc)
+        return info.nMin + (value - info.nMin) // step * step
+
+    def get_frame_rate(self):
+        """Frame rate the camera can deliver with its current settings"""
+        for key in ('ResultingFrameRate', 'AcquisitionFrameRate'):
+            value = MVCC_FLOATVALUE()
+            if self.camera.MV_CC_GetFloatValue(key, value) == 0 and value.fCurValue > 0:
+                return float(value.fCurValue)
+        return None
+
+    def get_binning(self, mode='binning'):
+        key = f"{mode.capitalize()}Horizontal"
+        value = MVCC_ENUMVALUE()
+        if self.camera.MV_CC_GetEnumValue(key, value) == 0:
+            return int(value.nCurValue)
+        info = self._get_int(key)
+        return int(info.nCurValue) if info else 1
+
+    def set_binning(self, factor, mode='binning'):
+        """Set horizontal and vertical binning/decimation, returns True if the camera accepted both"""
+        if mode not in self.BINNING_MODES:
+            raise ValueError(f"Unsupported binning mode: {mode}")
+        for axis in ('Horizontal', 'Vertical'):
+            key = f"{mode.capitalize()}{axis}"
+            # HIKROBOT exposes these as enums on most models, integers on some
+            if self.camera.MV_CC_SetEnumValue(key, int(factor)) == 0:
+                continue
+            if not self._set_int(key, factor):
+                return False
+        return True
+
+    def get_region(self):
+        """Current sensor readout region, or None if the camera does not expose it"""
+        values = {}
+        for key in ('OffsetX', 'OffsetY', 'Width', 'Height'):
+            info = self._get_int(key)
+            if info is None:
+                return None
+            values[key] = int(info.nCurValue)
+        width_max = self._get_int('WidthMax')
+        height_max = self._get_int('HeightMax')
+        return {
+            'x': values['OffsetX'],
+            'y': values['OffsetY'],
+            'width': values['Width'],
+            'height': values['Height'],
+            'width_max': int(width_max.nCurValue) if width_max else None,
+            'height_max': int(height_max.nCurValue) if height_max else None
+        }
+
+    def apply(self, x, y, width, height, binning=1, mode='binning'):
+        """
+        Program the readout region. Returns the region the camera actually
+        accepted (values are snapped to the sensor's increments), or None if
+        the camera rejected it.
+        """
+        binning = max(1, int(binning or 1))
+        if binning > 1 or self.get_binning(mode) != 1:
+            # Binning changes the sensor's width/height range, so set it first
+            if not self.set_binning(binning, mode):
+                return None
+
+        # Clear the offsets so the new size is always within range
+        if not (self._set_int('OffsetX', 0) and self._set_int('OffsetY', 0)):
+            return None
+
+        for key, value in (('Width', width), ('Height', height), ('OffsetX', x), ('OffsetY', y)):
+            info = self._get_int(key)
+            if info is None or not self._set_int(key, self._align(int(value) // binning, info)):
+                return None
+
+        return self.get_region()
+
+    def reset(self, mode='binning'):
+        """Return to full-sensor readout without binning"""
+        try:
+            if self.get_binning(mode) != 1:
+                self.set_binning(1, mode)
+            self._set_int('OffsetX', 0)
+            self._set_int('OffsetY', 0)
+            for key in ('Width', 'Height'):
+                info = self._get_int(key)
+                if info is not None:
+                    self._set_int(key, self._align(info.nMax, info))
+            return True
+        except Exception as e:
+            print(f"Error resetting sensor ROI: {str(e)}")
+            return False
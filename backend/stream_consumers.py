@@ -0,0 +1,66 @@
+import itertools
+import threading
+import time
+
+
+class StreamConsumer:
+    """One connected live-stream client"""
+
+    def __init__(self, consumer_id, transport, remote_addr=None, tier=None):
+        self.id = consumer_id
+        self.transport = transport
+        self.remote_addr = remote_addr
+        self.tier = tier or {}
+        self.connected_at = time.time()
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.frames_dropped = 0
+        self.last_ack = 0
+        self.in_flight = 0
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'transport': self.transport,
+            'remote_addr': self.remote_addr,
+            'tier': self.tier,
+            'connected_for': round(time.time() - self.connected_at, 1),
+            'frames_sent': self.frames_sent,
+            'bytes_sent': self.bytes_sent,
+            'frames_dropped': self.frames_dropped,
+            'last_ack': self.last_ack,
+            'in_flight': self.in_flight
+        }
+
+
+class ConsumerRegistry:
+    """
+    Tracks the clients currently reading the live stream.
+
+    Stream handlers register on connect and unregister in a finally block,
+    so the list reflects live consumers exactly, including clients that
+    vanished without closing cleanly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._consumers = {}
+        self._ids = itertools.count(1)
+
+    def register(self, transport, remote_addr=None, tier=None):
+        with self._lock:
+            consumer = StreamConsumer(next(self._ids), transport, remote_addr, tier)
+            self._consumers[consumer.id] = consumer
+            return consumer
+
+    def unregister(self, consumer):
+        with self._lock:
+            self._consumers.pop(consumer.id, None)
+
+    def count(self):
+        with self._lock:
+            return len(self._consumers)
+
+    def list(self):
+        with self._lock:
+            return [c.to_dict() for c in self._consumers.values()]
@@ -0,0 +1,69 @@
+import numpy as np
+
+from frame_hub import FrameBufferPool
+
+
+def test_buffers_are_reused_round_robin():
+    pool = FrameBufferPool(2)
+    first = pool.acquire(100)
+    pool.acquire(100)
+    assert pool.acquire(100).ctypes.data == first.ctypes.data
+    assert pool.get_stats()['hits'] == 1
+
+
+def test_pinned_buffer_is_detached_until_every_pin_is_released():
+    pool = FrameBufferPool(2)
+    frame = pool.acquire(100)
+    assert pool.pin(frame)
+    assert pool.pin(frame)
+    pool.unpin(frame)
+
+    # One pin is still held: the slot must get a new buffer
+    pool.acquire(100)
+    replacement = pool.acquire(100)
+    assert replacement.ctypes.data != frame.ctypes.data
+    assert pool.get_stats()['pinned'] == 1
+    assert pool.get_stats()['pin_evictions'] == 1
+
+    pool.unpin(frame)
+    assert pool.get_stats()['pinned'] == 0
+
+
+def test_unpinned_buffer_returns_to_the_pool():
+    pool = FrameBufferPool(2)
+    frame = pool.acquire(100)
+    pool.pin(frame)
+    pool.unpin(frame)
+    pool.acquire(100)
+    assert pool.acquire(100).ctypes.data == frame.ctypes.data
+
+
+def test_cropped_view_pins_its_buffer():
+    pool = FrameBufferPool(2)
+    crop = pool.acquire(100).reshape(10, 10)[2:5, 3:7]
+    assert pool.pin(crop)
+    pool.acquire(100)
+    assert pool.acquire(100).ctypes.data != crop.base.ctypes.data
+    pool.unpin(crop)
+    assert pool.get_stats()['pinned'] == 0
+
+
+def test_foreign_array_is_not_pinned():
+    pool = FrameBufferPool(2)
+    pool.acquire(100)
+    assert not pool.pin(np.zeros(100, dtype=np.uint8))
+
+
+def test_resize_keeps_outstanding_pins():
+    pool = FrameBufferPool(2)
+    frame = pool.acquire(100)
+    pool.pin(frame)
+    pool.resize(4)
+    assert pool.get_stats()['pinned'] == 1
+    # The old buffer can still be pinned again and released pin by pin
+    assert pool.pin(frame)
+    pool.unpin(frame)
+    assert pool.get_stats()['pinned'] == 1
+    pool.unpin(frame)
+    assert pool.get_stats()['pinned'] == 0
+    assert all(pool.acquire(100).ctypes.data != frame.ctypes.data for _ in range(4))
@@ -0,0 +1,107 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from image_cache import ImageCache
+
+
+def _write(path, value, size=(40, 60)):
+    cv2.imwrite(str(path), np.full(size + (3,), value, dtype=np.uint8))
+
+
+def test_repeated_reads_hit_the_cache(tmp_path):
+    path = tmp_path / 'a.png'
+    _write(path, 10)
+    cache = ImageCache()
+    first = cache.read(str(path))
+    assert cache.read(str(path)) is first
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_rewritten_file_is_decoded_again(tmp_path):
+    path = tmp_path / 'a.png'
+    _write(path, 10)
+    cache = ImageCache()
+    assert cache.read(str(path))[0, 0, 0] == 10
+
+    _write(path, 200)
+    stat = os.stat(path)
+    # Make sure the modification time moves even on coarse-grained filesystems
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.read(str(path))[0, 0, 0] == 200
+    stats = cache.get_stats()
+    assert stats['misses'] == 2
+    # The stale decode is dropped rather than kept alongside
+    assert stats['entries'] == 1
+
+
+def test_cached_arrays_are_read_only(tmp_path):
+    path = tmp_path / 'a.png'
+    _write(path, 10)
+    cache = ImageCache()
+    image = cache.read(str(path))
+    gray = cache.gray(str(path))
+    for array in (image, gray):
+        with pytest.raises(ValueError):
+            array[0, 0] = 0
+
+
+def test_memory_cap_evicts_least_recently_used(tmp_path):
+    paths = [str(tmp_path / f'{i}.png') for i in range(3)]
+    for i, path in enumerate(paths):
+        _write(path, i)
+    nbytes = 40 * 60 * 3
+    cache = ImageCache(max_bytes=nbytes * 2)
+    cache.read(paths[0])
+    cache.read(paths[1])
+    cache.read(paths[0])
+    cache.read(paths[2])
+
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] <= nbytes * 2
+    # paths[1] was least recently used
+    cache.reset_stats()
+    cache.read(paths[0])
+    cache.read(paths[1])
+    assert (cache.get_stats()['hits'], cache.get_stats()['misses']) == (1, 1)
+
+
+def test_image_larger_than_cap_is_not_cached(tmp_path):
+    path = tmp_path / 'a.png'
+    _write(path, 10)
+    cache = ImageCache(max_bytes=100)
+    assert cache.read(str(path)) is not None
+    assert cache.get_stats()['entries'] == 0
+
+
+def test_derived_lookups_do_not_count_as_reads(tmp_path):
+    path = tmp_path / 'a.png'
+    _write(path, 10)
+    cache = ImageCache()
+    cache.read(str(path))
+    cache.gray(str(path))
+    cache.gray(str(path))
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (0, 1)
+    assert (stats['derived_hits'], stats['derived_misses']) == (1, 1)
+
+
+def test_invalidate_drops_the_file(tmp_path):
+    path = tmp_path / 'a.png'
+    _write(path, 10)
+    cache = ImageCache()
+    cache.read(str(path))
+    cache.gray(str(path))
+    cache.invalidate(str(path))
+    stats = cache.get_stats()
+    assert (stats['entries'], stats['bytes']) == (0, 0)
+
+
+def test_missing_file_returns_none(tmp_path):
+    cache = ImageCache()
+    assert cache.read(str(tmp_path / 'missing.png')) is None
+    assert cache.gray(str(tmp_path / 'missing.png')) is None
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from PixelType_header import *
+from pixel_formats import convert_frame, to_preview, unpack_10bit, unpack_12bit
+
+
+def _bytes(*values):
+    return np.array(values, dtype=np.uint8)
+
+
+def test_unpack_mono10_packed():
+    # 0x2AB and 0x155: high 8 bits in bytes 0 and 2, low 2 bits in bits 0-1 / 4-5 of byte 1
+    data = _bytes(0xAA, 0x13, 0x55)
+    assert unpack_10bit(data, 2).tolist() == [0x2AB, 0x155]
+
+
+def test_unpack_mono12_packed():
+    # 0xABC and 0x123: high 8 bits in bytes 0 and 2, low nibbles in byte 1
+    data = _bytes(0xAB, 0x3C, 0x12)
+    assert unpack_12bit(data, 2).tolist() == [0xABC, 0x123]
+
+
+def test_unpack_odd_pixel_count():
+    data = _bytes(0xAB, 0x3C, 0x12, 0xFF, 0x0F, 0x00)
+    assert unpack_12bit(data, 3).tolist() == [0xABC, 0x123, 0xFFF]
+
+
+def test_convert_mono12_packed_is_msb_aligned():
+    data = _bytes(0xAB, 0x3C, 0x12, 0xFF, 0x0F, 0x00)
+    frame, preview = convert_frame(data, 2, 2, PixelType_Gvsp_Mono12_Packed)
+    assert frame.dtype == np.uint16
+    assert frame.tolist() == [[0xABC0, 0x1230], [0xFFF0, 0x0000]]
+    assert preview.tolist() == [[0xAB, 0x12], [0xFF, 0x00]]
+
+
+def test_convert_mono10_packed_is_msb_aligned():
+    data = _bytes(0xAA, 0x13, 0x55)
+    frame, _ = convert_frame(data, 2, 1, PixelType_Gvsp_Mono10_Packed)
+    assert frame.tolist() == [[0x2AB << 6, 0x155 << 6]]
+
+
+def test_convert_mono10_unpacked_is_msb_aligned():
+    data = np.array([0x3FF, 0x001], dtype='<u2').view(np.uint8)
+    frame, _ = convert_frame(data, 2, 1, PixelType_Gvsp_Mono10)
+    assert frame.tolist() == [[0xFFC0, 0x0040]]
+
+
+def test_convert_mono8_is_a_view():
+    data = np.arange(6, dtype=np.uint8)
+    frame, preview = convert_frame(data, 3, 2, PixelType_Gvsp_Mono8)
+    assert frame.base is data or frame.base is data.base
+    assert preview is frame
+
+
+# GenICam 2x2 tiles, first row then second row
+BAYER_TILES = {
+    'RG': 'RGGB',
+    'GR': 'GRBG',
+    'GB': 'GBRG',
+    'BG': 'BGGR',
+}
+
+
+@pytest.mark.parametrize('pattern', sorted(BAYER_TILES))
+def test_bayer_pattern_colours(pattern):
+    # Uniform scene: red 200, green 100, blue 50
+    values = {'R': 200, 'G': 100, 'B': 50}
+    tile = np.array([values[c] for c in BAYER_TILES[pattern]], dtype=np.uint8).reshape(2, 2)
+    raw = np.tile(tile, (4, 4))
+    frame, _ = convert_frame(raw.reshape(-1), 8, 8, globals()[f'PixelType_Gvsp_Bayer{pattern}8'])
+    assert frame.shape == (8, 8, 3)
+    # BGR order, checked away from the border
+    assert frame[3:5, 3:5].reshape(-1, 3).tolist() == [[50, 100, 200]] * 4
+
+
+def test_to_preview_drops_low_byte():
+    frame = np.array([[0xABCD]], dtype=np.uint16)
+    assert to_preview(frame).tolist() == [[0xAB]]
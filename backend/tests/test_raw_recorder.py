@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+import pytest
+
+from PixelType_header import *
+from raw_recorder import RawRecorder, RawRecording
+
+
+def _record(directory, frames, **kwargs):
+    recorder = RawRecorder(str(directory), **kwargs)
+    for i, frame in enumerate(frames):
+        recorder.append(frame, frame.shape[1], frame.shape[0], PixelType_Gvsp_Mono8, time.time() + i * 0.01, i)
+    return recorder
+
+
+def test_frames_round_trip(tmp_path):
+    frames = [np.full((30, 40), i, dtype=np.uint8) for i in range(5)]
+    _record(tmp_path / 'rec', frames, segment_bytes=3 * 4096).stop()
+    recording = RawRecording(str(tmp_path / 'rec'))
+    assert len(recording) == 5
+    for i, frame in enumerate(frames):
+        assert np.array_equal(recording.frame(i), frame)
+
+
+def test_index_is_readable_before_stop(tmp_path):
+    frames = [np.zeros((30, 40), dtype=np.uint8)] * 4
+    # One frame per segment: every append after the first rolls over and flushes the index
+    recorder = _record(tmp_path / 'rec', frames, segment_bytes=4096)
+    assert len(RawRecording(str(tmp_path / 'rec'))) >= 3
+    recorder.stop()
+    assert len(RawRecording(str(tmp_path / 'rec'))) == 4
+
+
+def test_frame_number_gaps_are_counted(tmp_path):
+    recorder = RawRecorder(str(tmp_path / 'rec'))
+    frame = np.zeros((4, 4), dtype=np.uint8)
+    for number in (1, 2, 5, 6):
+        recorder.append(frame, 4, 4, PixelType_Gvsp_Mono8, time.time(), number)
+    recorder.stop()
+    assert recorder.get_status()['skipped'] == 2
+
+
+def test_avi_export_refuses_a_size_change(tmp_path):
+    frames = [np.zeros((32, 48), dtype=np.uint8)] * 3 + [np.zeros((16, 48), dtype=np.uint8)] * 2
+    _record(tmp_path / 'rec', frames).stop()
+    recording = RawRecording(str(tmp_path / 'rec'))
+    with pytest.raises(ValueError, match='frame 3'):
+        recording.export_avi(str(tmp_path / 'out.avi'))
+    assert recording.export_avi(str(tmp_path / 'a.avi'), 0, 3) == 3
+    assert recording.export_avi(str(tmp_path / 'b.avi'), 3) == 2
@@ -0,0 +1,192 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from pixel_formats import to_preview
+
+
+# FourCC -> container extension
+VIDEO_CODECS = {
+    'MJPG': 'avi',
+    'XVID': 'avi',
+    'mp4v': 'mp4',
+    'avc1': 'mp4',
+    'H264': 'mp4'
+}
+
+
+class VideoRecorder:
+    """
+    Records the live view to a video file with cv2.VideoWriter.
+
+    A feeder thread samples the frame hub at the target FPS and puts frames
+    on a bounded queue; a separate encoder thread owns the VideoWriter. The
+    feeder never blocks: when the encoder falls behind, frames are dropped
+    and counted, so recording can't stall capture, the live preview or
+    analysis requests, and memory stays bounded by the queue size. When the
+    camera delivers fewer frames than the target FPS the last frame is
+    repeated, which keeps playback at real time.
+    """
+
+    def __init__(self, frame_hub, frame_pool, path, codec='MJPG', fps=30.0, scale=1.0, source='preview', max_queue=32):
+        if codec not in VIDEO_CODECS:
+            raise ValueError(f"Unsupported codec: {codec}. Use: {', '.join(VIDEO_CODECS)}")
+        if source not in ('preview', 'raw'):
+            raise ValueError(f"Unsupported recording source: {source}")
+        self.frame_hub = frame_hub
+        self.frame_pool = frame_pool
+        self.path = path
+        self.codec = codec
+        self.fps = min(max(float(fps or 30.0), 1.0), 120.0)
+        self.scale = min(max(float(scale or 1.0), 0.05), 1.0)
+        self.source = source
+
+        self.state = 'pending'
+        self.error = None
+        self.queued = 0
+        self.encoded = 0
+        self.dropped = 0
+        self.repeated = 0
+        self.encode_ms = 0.0
+        self.size = None
+        self.started_at = None
+        self.finished_at = None
+
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._stop_event = threading.Event()
+        self._feeder = None
+        self._encoder = None
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.state = 'recording'
+        self.started_at = time.time()
+        self._encoder = threading.Thread(target=self._encode, name='video-encoder', daemon=True)
+        self._feeder = threading.Thread(target=self._feed, name='video-feeder', daemon=True)
+        self._encoder.start()
+        self._feeder.start()
+
+    def is_running(self):
+        return self.state == 'recording'
+
+    def stop(self, timeout=10.0):
+        """Stop sampling, let the encoder drain the queue and close the file"""
+        self._stop_event.set()
+        if self._feeder is not None:
+            self._feeder.join(timeout=2.0)
+        if self._encoder is not None:
+            self._encoder.join(timeout=timeout)
+        return self.get_status()
+
+    def _prepare(self, packet):
+        """Copy (and scale) the frame so the queue never holds hub or pool buffers"""
+        frame = packet.raw if self.source == 'raw' else packet.frame
+        # Pinned so the capture thread can't reuse the buffer mid-copy
+        pinned = self.frame_pool.pin(packet.raw)
+        try:
+            frame = to_preview(frame)
+            if self.scale < 1.0:
+                return cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+            return frame.copy()
+        finally:
+            if pinned:
+                self.frame_pool.unpin(packet.raw)
+
+    def _feed(self):
+        period = 1.0 / self.fps
+        next_due = time.perf_counter()
+        last_sequence = 0
+        frame = None
+        try:
+            while not self._stop_event.is_set():
+                if self._stop_event.wait(max(0.0, next_due - time.perf_counter())):
+                    break
+                next_due += period
+                if time.perf_counter() - next_due > period * 5:
+                    # Fell far behind (e.g. a paused machine): resynchronise
+                    next_due = time.perf_counter() + period
+
+                packet = self.frame_hub.latest()
+                if packet is None:
+                    continue
+                if packet.sequence != last_sequence:
+                    last_sequence = packet.sequence
+                    frame = self._prepare(packet)
+                else:
+                    self.repeated += 1
+                try:
+                    self._queue.put_nowait(frame)
+                    self.queued += 1
+                except queue.Full:
+                    self.dropped += 1
+        except Exception as e:
+            print(f"Error feeding video recorder: {str(e)}")
+            self.error = str(e)
+        finally:
+            # Sentinel: the encoder finishes what is queued, then closes the file
+            self._queue.put(None)
+
+    def _encode(self):
+        writer = None
+        opened_shape = None
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    break
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    self.size = [width, height]
+                    opened_shape = frame.shape
+                    writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.codec), self.fps,
+                                             (width, height), frame.ndim == 3)
+                    if not writer.isOpened():
+                        raise RuntimeError(f"Failed to open video writer for {self.path} ({self.codec})")
+                elif frame.shape != opened_shape:
+                    # VideoWriter silently drops frames of another size, e.g. after an ROI,
+                    # binning or resolution change, so end the recording instead
+                    raise RuntimeError(f"Frame size changed from {opened_shape[1]}x{opened_shape[0]} to "
+                                       f"{frame.shape[1]}x{frame.shape[0]}; recording stopped")
+                start = time.perf_counter()
+                writer.write(frame)
+                elapsed = (time.perf_counter() - start) * 1000
+                # Smoothed so the status reflects current encoder load
+                self.encode_ms = elapsed if not self.encoded else self.encode_ms * 0.9 + elapsed * 0.1
+                self.encoded += 1
+        except Exception as e:
+            print(f"Error encoding video: {str(e)}")
+            self.error = str(e)
+            self._stop_event.set()
+            # Unblock the feeder's final put
+            while not self._queue.empty():
+                self._queue.get_nowait()
+        finally:
+            if writer is not None:
+                writer.release()
+            self.finished_at = time.time()
+            self.state = 'failed' if self.error else 'finished'
+
+    def get_status(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            'state': self.state,
+            'path': self.path,
+            'codec': self.codec,
+            'fps': self.fps,
+            'scale': self.scale,
+            'source': self.source,
+            'size': self.size,
+            'queued': self.queued,
+            'encoded': self.encoded,
+            'dropped': self.dropped,
+            'repeated': self.repeated,
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'encode_ms': round(self.encode_ms, 2),
+            'elapsed': round(elapsed, 2),
+            'file_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            'error': self.error
+        }
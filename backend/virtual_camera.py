@@ -0,0 +1,168 @@
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+
+
+class VirtualCamera:
+    """
+    Hardware-free camera that replays micrographs or a video file.
+
+    Implements the subset of the cv2.VideoCapture interface WebcamManager uses
+    (isOpened/read/get/release), so the streaming and snapshot paths can be
+    profiled on machines without a microscope. Frames are delivered at the
+    configured frame rate with optional timing jitter and dropped frames.
+    """
+
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+    PIXEL_FORMATS = ('BGR8', 'Mono8', 'Mono16')
+
+    def __init__(self, source=None, width=None, height=None, fps=30.0, pixel_format='BGR8',
+                 jitter_ms=0.0, drop_rate=0.0, max_frames=200):
+        if pixel_format not in self.PIXEL_FORMATS:
+            raise ValueError(f"Unsupported pixel format: {pixel_format}. Use: {', '.join(self.PIXEL_FORMATS)}")
+
+        self.source = source
+        self.width = int(width) if width else None
+        self.height = int(height) if height else None
+        self.fps = float(fps) if fps and float(fps) > 0 else 30.0
+        self.pixel_format = pixel_format
+        self.jitter_ms = max(0.0, float(jitter_ms or 0.0))
+        self.drop_rate = min(max(0.0, float(drop_rate or 0.0)), 0.99)
+        self.max_frames = max(1, int(max_frames))
+
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+        self._frames = []
+        self._video = None
+        self._index = 0
+        self._next_time = None
+        self._opened = False
+
+        self._open_source()
+
+    def _open_source(self):
+        """Preload still images (or a synthetic pattern) or open a video file"""
+        if self.source and os.path.isdir(self.source):
+            names = sorted(f for f in os.listdir(self.source) if f.lower().endswith(self.IMAGE_EXTENSIONS))
+            for name in names[:self.max_frames]:
+                img = cv2.imread(os.path.join(self.source, name), cv2.IMREAD_COLOR)
+                if img is not None:
+                    self._frames.append(self._prepare(img))
+            if not self._frames:
+                raise ValueError(f"No readable images found in: {self.source}")
+        elif self.source and os.path.isfile(self.source):
+            self._video = cv2.VideoCapture(self.source)
+            if not self._video.isOpened():
+                raise ValueError(f"Failed to open video file: {self.source}")
+        elif self.source:
+            raise ValueError(f"Virtual camera source not found: {self.source}")
+        else:
+            self._frames = self._synthetic_frames()
+
+        self._opened = True
+
+    def _synthetic_frames(self, count=30):
+        """Generate a drifting textured pattern when no source is configured"""
+        width = self.width or 1920
+        height = self.height or 1080
+        rng = np.random.default_rng(0)
+        texture = rng.integers(0, 256, (height // 8 + 1, width // 8 + 1), dtype=np.uint8)
+        texture = cv2.resize(texture, (width + 2 * count, height), interpolation=cv2.INTER_CUBIC)
+        texture = cv2.GaussianBlur(texture, (0, 0), 3)
+
+        frames = []
+        for i in range(count):
+            gray = np.ascontiguousarray(texture[:, 2 * i:2 * i + width])
+            frames.append(self._prepare(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)))
+        return frames
+
+    def _prepare(self, img):
+        """Resize a BGR image to the configured resolution and convert its pixel format"""
+        if self.width and self.height and (img.shape[1], img.shape[0]) != (self.width, self.height):
+            img = cv2.resize(img, (self.width, self.height), interpolation=cv2.INTER_AREA)
+
+        if self.pixel_format == 'BGR8':
+            return img
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if self.pixel_format == 'Mono16':
+            return gray.astype(np.uint16) << 8
+        return gray
+
+    def _next_frame(self):
+        if self._video is None:
+            frame = self._frames[self._index % len(self._frames)]
+            self._index += 1
+            return frame.copy()
+
+        success, img = self._video.read()
+        if not success:
+            # Loop the video
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, img = self._video.read()
+            if not success:
+                return None
+        return self._prepare(img)
+
+    def _wait_for_slot(self):
+        """Sleep until the next frame is due, applying jitter"""
+        period = 1.0 / self.fps
+        now = time.perf_counter()
+        if self._next_time is None or now - self._next_time > period:
+            # First frame, or the reader fell behind: resynchronise instead of bursting
+            self._next_time = now
+        delay = self._next_time - now
+        if self.jitter_ms:
+            delay += random.uniform(0, self.jitter_ms) / 1000.0
+        if delay > 0:
+            time.sleep(delay)
+        self._next_time += period
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        """Block until the next frame is due and return (success, frame)"""
+        if not self._opened:
+            return False, None
+
+        while True:
+            self._wait_for_slot()
+            frame = self._next_frame()
+            if frame is None:
+                return False, None
+            if self.drop_rate and random.random() < self.drop_rate:
+                # Simulate a frame lost on the link: its slot passes without delivery
+                self.frames_dropped += 1
+                continue
+            self.frames_delivered += 1
+            return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if self._video is not None and not (self.width and self.height):
+            return self._video.get(prop)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width or (self._frames[0].shape[1] if self._frames else 0)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height or (self._frames[0].shape[0] if self._frames else 0)
+        return 0
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+        self._frames = []
+        self._opened = False
+
+    def get_stats(self):
+        return {
+            'source': self.source or 'synthetic',
+            'fps': self.fps,
+            'pixel_format': self.pixel_format,
+            'frames_delivered': self.frames_delivered,
+            'frames_dropped': self.frames_dropped
+        }